@@ -0,0 +1,24 @@
+"""
+Access to the cache shared by every process of the deployment.
+
+Client profiles and token revocations are invalidated by whichever process
+handles the write, so caching them is only correct when every process reads
+the same cache. Django's default LocMemCache is private to each process;
+with it (or DummyCache) shared_cache() returns None and callers skip
+caching instead of serving stale entries.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+# Backends whose entries are not visible to other processes
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache():
+    """Return the default cache if all processes share it, else None"""
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_BACKENDS:
+        return None
+    return cache
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UploadedDataset
+from .models import UploadedDataset, PredictionJob
 
 # Register your models here.
 
@@ -7,3 +7,9 @@ from .models import UploadedDataset
 class UploadedDatasetAdmin(admin.ModelAdmin):
     list_display = ('id', 'staff', 'filename', 'upload_date', 'status')
     search_fields = ('filename', 'staff__name', 'staff__staff_id')
+
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'upload', 'status', 'created_at', 'started_at', 'finished_at', 'worker', 'attempts')
+    list_filter = ('status',)
+    list_select_related = ('upload',)
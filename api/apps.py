@@ -1,6 +1,63 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
+# Management commands that serve predictions; other commands skip the model preload
+SERVING_COMMANDS = ('runserver', 'run_prediction_workers')
+DEFAULT_SERVERS = ('gunicorn', 'uwsgi', 'daphne', 'uvicorn')
+
+
+def _program(path):
+    """Name of the program in argv[0]; `python -m pkg` runs pkg/__main__.py"""
+    name = os.path.basename(path)
+    if name == '__main__.py':
+        name = os.path.basename(os.path.dirname(path))
+    return name.removesuffix('.py')
+
+
+def is_serving(argv, servers=DEFAULT_SERVERS):
+    """
+    Whether this process serves predictions: one of the given servers
+    (e.g. gunicorn), or manage.py/django-admin running one of SERVING_COMMANDS.
+    Anything else (tests, scripts, benchmarks, other commands) does not.
+    """
+    if not argv:
+        return False
+    program = _program(argv[0])
+    if program in servers:
+        return True
+    if program not in ('manage', 'django-admin', 'django'):
+        return False
+    command = argv[1] if len(argv) > 1 else None
+    if command == 'runserver' and '--noreload' not in argv and os.environ.get('RUN_MAIN') != 'true':
+        # The autoreloader's parent process only watches files
+        return False
+    return command in SERVING_COMMANDS
+
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from ml_utils.registry import model_registry
+        from TeleChurn_Project.database import configure_sqlite
+        from . import signals  # noqa: F401
+        from .cache import get_prediction_cache
+
+        def _drop_stale_predictions(predictor):
+            cache = get_prediction_cache()
+            if cache is not None:
+                cache.retain_version(predictor.version)
+
+        if settings.SQLITE_TUNING:
+            connection_created.connect(configure_sqlite, dispatch_uid='sqlite_tuning')
+
+        # Load the churn model once per process instead of once per request
+        model_registry.configure(settings.ML_MODEL_PATH, settings.ML_DECISION_THRESHOLD)
+        model_registry.add_load_listener(_drop_stale_predictions)
+        if settings.ML_PRELOAD_MODEL and is_serving(sys.argv, settings.ML_PRELOAD_SERVERS):
+            model_registry.preload()
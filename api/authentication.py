@@ -1,8 +1,142 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 import jwt
 from django.conf import settings
 from clients.models import Staff, Client
+from .tokens import decode_token, is_revoked
+
+
+class TokenCache:
+    """
+    Bounded, per-process cache of verified tokens and the principal they resolve to.
+
+    Entries live for at most AUTH_TOKEN_CACHE_TTL seconds and never past the
+    token's own expiry. Saving or deleting a Staff or Client drops the entries
+    of that principal (see api.signals); other processes pick up the change
+    once their entries expire. Revocation is not cached here: callers check
+    is_revoked() on every hit, since a token may be revoked by another process.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # (kind, pk) -> cache keys that depend on that principal
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind, token):
+        """Return (principal, jti) of a cached token, or None"""
+        key = (kind, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Callers may modify request.user; never hand out the cached instance
+                return copy.copy(entry[0]), entry[3]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, kind, token, principal, owners, expires_at=None, jti=None):
+        """
+        Cache a verified principal.
+
+        Args:
+            kind (str): 'staff' or 'client'
+            token (str): The raw bearer token
+            principal: The Staff or Client instance
+            owners (list): (kind, pk) pairs whose changes invalidate the entry
+            expires_at (float): The token's exp claim (Unix time)
+            jti (str): The token's jti claim, for revocation checks on hits
+        """
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        key = (kind, token)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (copy.copy(principal), time.monotonic() + ttl, owners, jti)
+            for owner in owners:
+                self._owners.setdefault(owner, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, kind, pk):
+        """Drop every entry that depends on the given principal"""
+        with self._lock:
+            for key in list(self._owners.get((kind, pk), ())):
+                self._remove(key)
+
+    def discard(self, token):
+        """Drop a single token, e.g. after it was revoked"""
+        with self._lock:
+            for kind in ('staff', 'client'):
+                self._remove((kind, token))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for owner in entry[2]:
+            keys = self._owners.get(owner)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._owners[owner]
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+
+def get_token_principal(kind, token):
+    """
+    Verify an access token and return its Staff (with client loaded) or Client.
+
+    Raises:
+        jwt.InvalidTokenError: If the token is invalid, expired, revoked or
+            not an access token
+        Staff.DoesNotExist / Client.DoesNotExist: If the principal is gone
+    """
+    cached = token_cache.get(kind, token)
+    if cached is not None:
+        principal, jti = cached
+        # The token may have been revoked by another process since it was cached
+        if is_revoked(jti):
+            token_cache.discard(token)
+            raise jwt.InvalidTokenError("Token has been revoked")
+        return principal
+
+    payload = decode_token(token)
+    if kind == 'staff':
+        principal = Staff.objects.select_related('client').get(staff_id=payload.get('staff_id'))
+        owners = [('staff', principal.pk), ('client', principal.client_id)]
+    else:
+        principal = Client.objects.get(company_id=payload.get('company_id'))
+        owners = [('client', principal.pk)]
+    token_cache.set(kind, token, principal, owners, expires_at=payload.get('exp'), jti=payload['jti'])
+    return principal
+
 
 class StaffJWTAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -11,11 +145,9 @@ class StaffJWTAuthentication(BaseAuthentication):
             return None
         token = auth_header.split(' ')[1]
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            staff_id = payload.get('staff_id')
-            staff = Staff.objects.get(staff_id=staff_id)
+            staff = get_token_principal('staff', token)
             return (staff, None)
-        except (jwt.ExpiredSignatureError, jwt.DecodeError, Staff.DoesNotExist):
+        except (jwt.InvalidTokenError, Staff.DoesNotExist):
             raise exceptions.AuthenticationFailed('Invalid or expired staff token')
 
 class ClientJWTAuthentication(BaseAuthentication):
@@ -25,9 +157,7 @@ class ClientJWTAuthentication(BaseAuthentication):
             return None
         token = auth_header.split(' ')[1]
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            company_id = payload.get('company_id')
-            client = Client.objects.get(company_id=company_id)
+            client = get_token_principal('client', token)
             return (client, None)
-        except (jwt.ExpiredSignatureError, jwt.DecodeError, Client.DoesNotExist):
-            raise exceptions.AuthenticationFailed('Invalid or expired client token') 
\ No newline at end of file
+        except (jwt.InvalidTokenError, Client.DoesNotExist):
+            raise exceptions.AuthenticationFailed('Invalid or expired client token')
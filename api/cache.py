@@ -0,0 +1,247 @@
+"""
+Cache of model output for stored datasets.
+
+Entries are keyed by the model version plus a checksum of the stored dataset,
+so re-running the same data against the same model skips preprocessing and
+inference, and deploying a new model can never serve stale scores. Only the
+churn probabilities are cached; classes and risk levels are derived from them
+with the current thresholds.
+
+The backend is chosen with the PREDICTION_CACHE setting:
+
+    PREDICTION_CACHE = {
+        'BACKEND': 'lru',          # 'lru', 'filesystem', 'django' or None
+        'MAX_BYTES': 256 * 1024 * 1024,
+        'LOCATION': ...,           # directory (filesystem) or cache alias (django)
+        'TIMEOUT': None,           # seconds, django backend only
+    }
+"""
+import io
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class BasePredictionCache:
+    """Interface shared by the cache backends; also tracks hits and misses"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_version, data_hash):
+        """Return the cached probabilities array, or None"""
+        value = self._get(model_version, data_hash)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, model_version, data_hash, probabilities):
+        self._set(model_version, data_hash, np.asarray(probabilities, dtype=float))
+
+    def retain_version(self, model_version):
+        """Drop entries of every other model version (called when a model is loaded)"""
+
+    def stats(self):
+        return {'backend': self.name, 'hits': self.hits, 'misses': self.misses}
+
+    def _get(self, model_version, data_hash):
+        raise NotImplementedError
+
+    def _set(self, model_version, data_hash, probabilities):
+        raise NotImplementedError
+
+
+class LRUPredictionCache(BasePredictionCache):
+    """In-process cache evicting the least recently used entries past max_bytes"""
+    name = 'lru'
+
+    def __init__(self, max_bytes):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, model_version, data_hash):
+        key = (model_version, data_hash)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _set(self, model_version, data_hash, probabilities):
+        if probabilities.nbytes > self.max_bytes:
+            return
+        key = (model_version, data_hash)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.nbytes
+            self._entries[key] = probabilities
+            self.size += probabilities.nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.nbytes
+
+    def retain_version(self, model_version):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] != model_version]:
+                self.size -= self._entries.pop(key).nbytes
+
+    def stats(self):
+        return {**super().stats(), 'entries': len(self._entries), 'bytes': self.size}
+
+
+class FileSystemPredictionCache(BasePredictionCache):
+    """
+    Cache shared by every process on a host, stored as <location>/<version>/<hash>.npy.
+
+    Files are touched on every hit and the oldest are evicted once the
+    directory grows past max_bytes.
+    """
+    name = 'filesystem'
+
+    def __init__(self, location, max_bytes):
+        super().__init__()
+        self.location = location
+        self.max_bytes = max_bytes
+
+    def _path(self, model_version, data_hash):
+        return os.path.join(self.location, model_version, f"{data_hash}.npy")
+
+    def _get(self, model_version, data_hash):
+        path = self._path(model_version, data_hash)
+        try:
+            value = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def _set(self, model_version, data_hash, probabilities):
+        if probabilities.nbytes > self.max_bytes:
+            return
+        path = self._path(model_version, data_hash)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, probabilities, allow_pickle=False)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Could not write prediction cache entry: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        files = []
+        for dirpath, _, filenames in os.walk(self.location):
+            for filename in filenames:
+                if filename.endswith('.npy'):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        info = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def retain_version(self, model_version):
+        try:
+            versions = os.listdir(self.location)
+        except OSError:
+            return
+        for version in versions:
+            if version != model_version:
+                shutil.rmtree(os.path.join(self.location, version), ignore_errors=True)
+
+
+class DjangoPredictionCache(BasePredictionCache):
+    """
+    Cache stored in one of the CACHES aliases (e.g. Redis or Memcached).
+
+    Entries larger than max_bytes are not cached; the backend itself handles
+    expiry and eviction. Old model versions simply stop being read.
+    """
+    name = 'django'
+
+    def __init__(self, alias, max_bytes, timeout=None):
+        super().__init__()
+        self.alias = alias
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+    def _key(self, model_version, data_hash):
+        return f"prediction:{model_version}:{data_hash}"
+
+    def _get(self, model_version, data_hash):
+        payload = caches[self.alias].get(self._key(model_version, data_hash))
+        if payload is None:
+            return None
+        return np.load(io.BytesIO(payload), allow_pickle=False)
+
+    def _set(self, model_version, data_hash, probabilities):
+        if probabilities.nbytes > self.max_bytes:
+            return
+        buffer = io.BytesIO()
+        np.save(buffer, probabilities, allow_pickle=False)
+        caches[self.alias].set(self._key(model_version, data_hash), buffer.getvalue(), self.timeout)
+
+
+def build_cache(config):
+    """
+    Create a cache backend from a PREDICTION_CACHE style dict.
+
+    Returns:
+        BasePredictionCache: The backend, or None if caching is disabled
+    """
+    config = config or {}
+    backend = config.get('BACKEND')
+    if not backend:
+        return None
+    max_bytes = config.get('MAX_BYTES', 256 * 1024 * 1024)
+    if backend == 'lru':
+        return LRUPredictionCache(max_bytes)
+    if backend == 'filesystem':
+        location = config.get('LOCATION') or os.path.join(settings.DATASET_STORAGE_ROOT, 'prediction-cache')
+        return FileSystemPredictionCache(location, max_bytes)
+    if backend == 'django':
+        return DjangoPredictionCache(config.get('LOCATION') or 'default', max_bytes, config.get('TIMEOUT'))
+    raise ValueError(f"Unknown prediction cache backend: {backend}")
+
+
+def get_prediction_cache():
+    """Return the process-wide prediction cache configured by PREDICTION_CACHE, or None"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = build_cache(settings.PREDICTION_CACHE) or False
+    return _cache or None
@@ -0,0 +1,203 @@
+"""
+Streaming export of stored prediction results.
+
+Results are read from their Parquet file one batch at a time and encoded as
+they go out, so memory stays flat and the first bytes are sent immediately,
+whatever the size of the upload.
+
+Besides the formatted CSV, results can be exported for data pipelines as
+NDJSON, Parquet or Arrow IPC with typed columns: churn_probability is a
+float between 0 and 1 and the label columns are dictionary-encoded.
+"""
+import csv
+import io
+import logging
+import zlib
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import storage
+from .prediction import PREDICTED_CLASSES, RECOMMENDATIONS, RISK_LEVELS, frame_to_columns
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows read from storage per chunk
+EXPORT_CHUNK_ROWS = 10000
+
+_LABEL = pa.dictionary(pa.int8(), pa.string())
+EXPORT_SCHEMA = pa.schema([
+    ('customerID', pa.string()),
+    ('predicted_class', _LABEL),
+    ('churn_probability', pa.float64()),
+    ('risk_level', _LABEL),
+    ('recommendation', _LABEL),
+])
+_LABEL_CATEGORIES = {
+    'predicted_class': PREDICTED_CLASSES,
+    'risk_level': RISK_LEVELS,
+    'recommendation': RECOMMENDATIONS,
+}
+
+# format: (content type, file extension, already compressed)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', False),
+    'ndjson': ('application/x-ndjson', 'ndjson', False),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', True),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow', False),
+}
+
+# (result column, CSV header)
+CSV_COLUMNS = [
+    ('customerID', 'Customer ID'),
+    ('predicted_class', 'Predicted Class'),
+    ('churn_probability', 'Churn Probability'),
+    ('risk_level', 'Risk Level'),
+    ('recommendation', 'Recommendation'),
+]
+
+
+def iter_csv(upload, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield the upload's results as encoded CSV chunks, header first.
+
+    Raises:
+        DatasetStorageError: If the results file cannot be read
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header in CSV_COLUMNS])
+    yield buffer.getvalue().encode()
+
+    for frame in storage.iter_frames(upload.results_file, batch_size=chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        values = frame_to_columns(frame)
+        missing = ['N/A'] * len(frame)
+        writer.writerows(zip(*(values.get(col, missing) for col, _ in CSV_COLUMNS)))
+        yield buffer.getvalue().encode()
+
+
+def typed_tables(upload, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yield the upload's results as Arrow tables with EXPORT_SCHEMA.
+
+    Every table carries the same label dictionaries, so they can be written
+    to a single Arrow IPC file.
+    """
+    for frame in storage.iter_frames(upload.results_file, batch_size=chunk_rows):
+        typed = pd.DataFrame(index=frame.index)
+        if 'customerID' in frame.columns:
+            typed['customerID'] = frame['customerID'].astype(str)
+        else:
+            typed['customerID'] = None
+        for col in ('predicted_class', 'churn_probability', 'risk_level', 'recommendation'):
+            values = frame[col] if col in frame.columns else pd.Series(None, index=frame.index)
+            if col == 'churn_probability':
+                if not pd.api.types.is_numeric_dtype(values):
+                    # Older result files store '12.3%'
+                    values = pd.to_numeric(values.astype(str).str.rstrip('%'), errors='coerce')
+                typed[col] = values.astype(float) / 100
+            else:
+                typed[col] = pd.Categorical(values.astype(object), categories=_LABEL_CATEGORIES[col])
+        yield pa.Table.from_pandas(typed, schema=EXPORT_SCHEMA, preserve_index=False)
+
+
+def iter_ndjson(upload, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the upload's typed results as newline-delimited JSON chunks"""
+    for table in typed_tables(upload, chunk_rows):
+        frame = table.to_pandas()
+        for col in _LABEL_CATEGORIES:
+            frame[col] = frame[col].astype(object)
+        data = frame.to_json(orient='records', lines=True, double_precision=15)
+        yield data.encode() if data.endswith('\n') else f"{data}\n".encode()
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are handed out as they are written"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _iter_binary(upload, open_writer, chunk_rows):
+    """Drive a sequential Arrow/Parquet writer, yielding bytes after each chunk"""
+    sink = _ChunkSink()
+    writer = open_writer(pa.PythonFile(sink, mode='w'))
+    try:
+        for table in typed_tables(upload, chunk_rows):
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_parquet(upload, chunk_rows=EXPORT_CHUNK_ROWS * 10):
+    """Yield the upload's typed results as a zstd-compressed Parquet file"""
+    return _iter_binary(upload, lambda sink: pq.ParquetWriter(sink, EXPORT_SCHEMA, compression='zstd'), chunk_rows)
+
+
+def iter_arrow(upload, chunk_rows=EXPORT_CHUNK_ROWS * 10):
+    """Yield the upload's typed results as an Arrow IPC file"""
+    return _iter_binary(upload, lambda sink: pa.ipc.new_file(sink, EXPORT_SCHEMA), chunk_rows)
+
+
+EXPORT_WRITERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+    'parquet': iter_parquet,
+    'arrow': iter_arrow,
+}
+
+
+def gzip_stream(chunks, level=6):
+    """Compress a stream of byte chunks into a single gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def log_stream_errors(chunks, upload_id):
+    """Log failures that happen after the response headers were already sent"""
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.error(f"Export of upload {upload_id} failed mid-stream: {str(e)}")
+        raise
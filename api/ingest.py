@@ -0,0 +1,211 @@
+"""
+CSV ingestion for uploaded datasets.
+
+Uploads are stored as the raw customer features, minus rows with missing
+values; the model's fitted preprocessing is applied when they are scored, the
+same way as for the real-time scoring endpoint.
+
+ingest_csv() processes the whole file in memory. ingest_csv_streaming() gives
+the same result while holding only one chunk of rows at a time: column types
+are settled in a first pass that spills the rows to a scratch Parquet file,
+and a second pass re-reads them to write the final dataset.
+"""
+import logging
+
+import pandas as pd
+
+from . import storage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PREVIEW_ROWS = 5
+
+
+class DataIngestionError(Exception):
+    """Custom exception for CSV files that cannot be read or processed"""
+    pass
+
+
+def _parse_numeric(values):
+    """Parse a text column as floats; unparseable values become NaN"""
+    try:
+        # Fast path for columns that are entirely numeric
+        return values.astype(float)
+    except (TypeError, ValueError):
+        return pd.to_numeric(values, errors='coerce')
+
+
+def _preview(df, customer_ids):
+    preview_data = df.head(PREVIEW_ROWS).to_dict(orient='records')
+    if customer_ids is None:
+        return preview_data
+    return [{'customerID': customer_ids[i], **row} for i, row in enumerate(preview_data)]
+
+
+def stored_preview(data_file, columns, has_customer_ids):
+    """Build the upload preview from an already stored dataset"""
+    read_columns = list(columns) + ([storage.CUSTOMER_ID_COLUMN] if has_customer_ids else [])
+    head = next(storage.iter_frames(data_file, batch_size=PREVIEW_ROWS, columns=read_columns), None)
+    if head is None:
+        return []
+    head = head.head(PREVIEW_ROWS)
+    customer_ids = head.pop(storage.CUSTOMER_ID_COLUMN).tolist() if has_customer_ids else None
+    return _preview(head, customer_ids)
+
+
+def _result(data_file, df_head, columns, row_count, customer_ids_head):
+    return {
+        'data_file': data_file,
+        'columns': columns,
+        'row_count': row_count,
+        'has_customer_ids': customer_ids_head is not None,
+        'preview': _preview(df_head, customer_ids_head),
+    }
+
+
+def ingest_csv(file_obj):
+    """
+    Read, preprocess and store an uploaded CSV in one pass, in memory.
+
+    Args:
+        file_obj: Uploaded file
+
+    Returns:
+        dict: data_file, columns, row_count, has_customer_ids and preview
+
+    Raises:
+        DataIngestionError: If the CSV cannot be read or preprocessed
+        DatasetStorageError: If the processed data cannot be stored
+    """
+    try:
+        df = pd.read_csv(file_obj)
+    except Exception as e:
+        raise DataIngestionError(f'Error reading CSV: {str(e)}')
+
+    try:
+        # Store customerID separately if it exists
+        customer_ids = None
+        if storage.CUSTOMER_ID_COLUMN in df.columns:
+            customer_ids = df.pop(storage.CUSTOMER_ID_COLUMN)
+
+        # Rows with missing values are not scored
+        df = df.dropna()
+        if customer_ids is not None:
+            # Keep the IDs aligned with the rows that survived dropna
+            customer_ids = customer_ids.loc[df.index].astype(str).tolist()
+        df = df.reset_index(drop=True)
+    except Exception as e:
+        raise DataIngestionError(f'Error preprocessing data: {str(e)}')
+
+    data_file = storage.write_dataset(df, customer_ids)
+    head_ids = customer_ids[:PREVIEW_ROWS] if customer_ids is not None else None
+    return _result(data_file, df.head(PREVIEW_ROWS), list(df.columns), len(df), head_ids)
+
+
+def ingest_csv_streaming(file_obj, chunk_rows):
+    """
+    Read, preprocess and store an uploaded CSV chunk by chunk.
+
+    Produces the same stored data as ingest_csv() while peak memory is bounded
+    by chunk_rows.
+
+    Args:
+        file_obj: Uploaded file
+        chunk_rows (int): Rows per chunk
+
+    Returns:
+        dict: data_file, columns, row_count, has_customer_ids and preview
+
+    Raises:
+        DataIngestionError: If the CSV cannot be read or preprocessed
+        DatasetStorageError: If the processed data cannot be stored
+    """
+    columns = None
+    has_customer_ids = False
+    numeric = {}
+    # Numeric columns whose values are all whole numbers are stored as
+    # integers, matching the dtypes pd.read_csv infers for the whole file
+    integral = {}
+
+    spill = storage.FrameWriter(storage.SCRATCH_DIR)
+    try:
+        # Pass 1: infer column types and spill the complete rows
+        try:
+            # Read everything as text so each chunk has the same schema; a
+            # column is numeric only if every value in the file parses
+            reader = pd.read_csv(file_obj, dtype=str, chunksize=chunk_rows)
+            for chunk in reader:
+                if columns is None:
+                    has_customer_ids = storage.CUSTOMER_ID_COLUMN in chunk.columns
+                    columns = [c for c in chunk.columns if c != storage.CUSTOMER_ID_COLUMN]
+                    numeric = {col: True for col in columns}
+                    integral = {col: True for col in columns}
+
+                values = chunk[columns]
+                for col in columns:
+                    if not numeric[col]:
+                        continue
+                    parsed = _parse_numeric(values[col])
+                    if (parsed.isna() & values[col].notna()).any():
+                        numeric[col] = False
+                    elif integral[col]:
+                        parsed = parsed.dropna()
+                        integral[col] = bool((parsed == parsed.round()).all())
+
+                spill.write(chunk[values.notna().all(axis=1)])
+        except storage.DatasetStorageError:
+            raise
+        except Exception as e:
+            raise DataIngestionError(f'Error reading CSV: {str(e)}')
+
+        if columns is None:
+            raise DataIngestionError('Error reading CSV: No columns to parse from file')
+        scratch_file = spill.close(empty=pd.DataFrame(columns=columns, dtype=str))
+    except Exception:
+        spill.abort()
+        raise
+
+    try:
+        dtypes = {
+            col: ('int64' if integral[col] else float) if numeric[col] else object
+            for col in columns
+        }
+
+        # Pass 2: parse the numeric columns and write the final dataset
+        preview_df = None
+        preview_ids = None
+        with storage.FrameWriter(storage.DATASETS_DIR) as writer:
+            for frame in storage.iter_frames(scratch_file, chunk_rows):
+                out = pd.DataFrame(index=frame.index)
+                for col in columns:
+                    if numeric[col]:
+                        out[col] = _parse_numeric(frame[col]).astype(dtypes[col])
+                    else:
+                        out[col] = frame[col]
+                if preview_df is None:
+                    preview_df = out.head(PREVIEW_ROWS)
+                    if has_customer_ids:
+                        preview_ids = frame[storage.CUSTOMER_ID_COLUMN].head(PREVIEW_ROWS).tolist()
+                if has_customer_ids:
+                    out[storage.CUSTOMER_ID_COLUMN] = frame[storage.CUSTOMER_ID_COLUMN].astype(str)
+                writer.write(out)
+
+            empty = pd.DataFrame({col: pd.Series(dtype=dtypes[col]) for col in columns})
+            if has_customer_ids:
+                empty[storage.CUSTOMER_ID_COLUMN] = pd.Series(dtype=str)
+            data_file = writer.close(empty=empty)
+            row_count = writer.rows
+    except storage.DatasetStorageError:
+        raise
+    except Exception as e:
+        raise DataIngestionError(f'Error preprocessing data: {str(e)}')
+    finally:
+        storage.delete_file(scratch_file)
+
+    if preview_df is None:
+        preview_df = empty.drop(columns=[storage.CUSTOMER_ID_COLUMN], errors='ignore')
+        preview_ids = [] if has_customer_ids else None
+    logger.info(f"Streamed {row_count} rows into {data_file}")
+    return _result(data_file, preview_df, columns, row_count, preview_ids)
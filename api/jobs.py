@@ -0,0 +1,237 @@
+"""
+Database-backed queue for asynchronous prediction jobs.
+
+PredictView enqueues a PredictionJob and returns immediately; worker processes
+started with `manage.py run_prediction_workers` claim queued jobs with an
+atomic conditional UPDATE, so no external broker is needed and two workers
+can never run the same job. While a job runs, its worker refreshes the job's
+heartbeat; jobs whose heartbeat stops are requeued.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ml_utils.predictor import ModelPredictionError
+from ml_utils.registry import model_registry
+from .models import PredictionJob, UploadedDataset
+from .prediction import run_prediction
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How many queued jobs a worker looks at when trying to claim one
+CLAIM_BATCH = 10
+
+
+def enqueue_prediction(upload):
+    """
+    Queue a scoring run for an upload, reusing an unfinished job if there is one.
+
+    Returns:
+        PredictionJob: The queued (or already running) job
+    """
+    job = upload.jobs.filter(status__in=PredictionJob.ACTIVE_STATUSES).first()
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            job = PredictionJob.objects.create(upload=upload)
+            UploadedDataset.objects.filter(id=upload.id).update(status='queued')
+    except IntegrityError:
+        # A concurrent request queued it first (api_job_one_active_per_upload)
+        return upload.jobs.get(status__in=PredictionJob.ACTIVE_STATUSES)
+    logger.info(f"Queued job {job.id} for upload {upload.id}")
+    return job
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically take the oldest queued job.
+
+    Returns:
+        PredictionJob: The claimed job, or None if the queue is empty
+    """
+    candidates = (PredictionJob.objects.filter(status='queued')
+                  .order_by('created_at', 'id')
+                  .values_list('id', flat=True)[:CLAIM_BATCH])
+    for job_id in list(candidates):
+        now = timezone.now()
+        claimed = PredictionJob.objects.filter(id=job_id, status='queued').update(
+            status='processing',
+            started_at=now,
+            heartbeat_at=now,
+            worker=worker_id,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            job = PredictionJob.objects.select_related('upload').get(id=job_id)
+            UploadedDataset.objects.filter(id=job.upload_id).update(status='processing')
+            return job
+    return None
+
+
+def _owned(job):
+    """
+    The job, as long as this claim of it is still running.
+
+    A job requeued as stale may be claimed again, even by the same worker;
+    the attempt number tells the claims apart.
+    """
+    return PredictionJob.objects.filter(id=job.id, status='processing', worker=job.worker, attempts=job.attempts)
+
+
+def touch_job(job):
+    """Refresh the heartbeat of a job this worker is running"""
+    return _owned(job).update(heartbeat_at=timezone.now())
+
+
+def _heartbeat(job, stop):
+    """Refresh the job's heartbeat until stop is set"""
+    try:
+        while not stop.wait(settings.PREDICTION_JOB_HEARTBEAT):
+            touch_job(job)
+    except Exception as e:
+        logger.error(f"Heartbeat of job {job.id} failed: {str(e)}")
+    finally:
+        # Database connections are per thread
+        connections.close_all()
+
+
+def process_job(job):
+    """Run a claimed job and record its outcome on the job and the upload"""
+    logger.info(f"Worker {job.worker} processing job {job.id} (upload {job.upload_id})")
+    # Keeps the job from being requeued as stale however long it runs
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job, stop), name=f"job-{job.id}-heartbeat", daemon=True)
+    heartbeat.start()
+    try:
+        predictor = model_registry.get_predictor()
+        run_prediction(job.upload, predictor)
+    except Exception as e:
+        logger.error(f"Job {job.id} failed: {str(e)}")
+        if _owned(job).update(status='failed', finished_at=timezone.now(), error=str(e)):
+            UploadedDataset.objects.filter(id=job.upload_id).update(status='failed')
+        else:
+            logger.warning(f"Job {job.id} was requeued while running; leaving its status alone")
+        return False
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if _owned(job).update(status='processed', finished_at=timezone.now()):
+        logger.info(f"Job {job.id} processed")
+    else:
+        logger.warning(f"Job {job.id} was requeued while running; leaving its status alone")
+    return True
+
+
+def requeue_stale_jobs():
+    """
+    Put jobs whose worker died mid-run (no heartbeat for PREDICTION_JOB_TIMEOUT
+    seconds) back on the queue, or fail them once they have used up
+    PREDICTION_JOB_MAX_ATTEMPTS.
+
+    Returns:
+        int: Number of jobs requeued or failed
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.PREDICTION_JOB_TIMEOUT)
+    stale = PredictionJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status='processing',
+    )
+    failed_uploads = list(stale.filter(attempts__gte=settings.PREDICTION_JOB_MAX_ATTEMPTS)
+                          .values_list('upload_id', flat=True))
+    failed = stale.filter(attempts__gte=settings.PREDICTION_JOB_MAX_ATTEMPTS).update(
+        status='failed', finished_at=timezone.now(), error='Job timed out'
+    )
+    if failed_uploads:
+        UploadedDataset.objects.filter(id__in=failed_uploads).update(status='failed')
+    requeued_uploads = list(stale.values_list('upload_id', flat=True))
+    requeued = stale.update(status='queued', worker='')
+    if requeued_uploads:
+        UploadedDataset.objects.filter(id__in=requeued_uploads).update(status='queued')
+    if failed or requeued:
+        logger.warning(f"Stale jobs: {requeued} requeued, {failed} failed")
+    return failed + requeued
+
+
+def run_worker(worker_id=None, poll_interval=1.0, once=False):
+    """
+    Claim and process jobs until stopped with SIGTERM/SIGINT. SIGHUP reloads
+    the model between jobs.
+
+    Args:
+        worker_id (str): Name recorded on claimed jobs
+        poll_interval (float): Seconds to sleep when the queue is empty
+        once (bool): Exit as soon as the queue is empty
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stopping = []
+
+    def _stop(signum, frame):
+        # Finish the current job, then exit
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    reloads = []
+
+    def _reload(signum, frame):
+        # Load the model again from disk before the next job
+        reloads.append(signum)
+
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, _reload)
+
+    # Load the model before taking work so the first job is not slowed down
+    model_registry.preload()
+    logger.info(f"Prediction worker {worker_id} started")
+
+    last_stale_check = 0.0
+    while not stopping:
+        close_old_connections()
+        if reloads:
+            reloads.clear()
+            try:
+                model_registry.reload()
+            except ModelPredictionError as e:
+                logger.error(f"Model reload failed, keeping the loaded model: {str(e)}")
+        if time.monotonic() - last_stale_check > settings.PREDICTION_JOB_TIMEOUT / 2:
+            requeue_stale_jobs()
+            last_stale_check = time.monotonic()
+
+        job = claim_next_job(worker_id)
+        if job is not None:
+            process_job(job)
+            continue
+        if once:
+            break
+        time.sleep(poll_interval)
+
+    close_old_connections()
+    logger.info(f"Prediction worker {worker_id} stopped")
+
+
+def job_status(job):
+    """Return a JSON-serializable description of a job"""
+    return {
+        'job_id': job.id,
+        'upload_id': job.upload_id,
+        'status': job.status,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'attempts': job.attempts,
+        'error': job.error or None,
+    }
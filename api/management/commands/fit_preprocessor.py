@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_utils.predictor import PREPROCESSOR_FILENAME
+from ml_utils.preprocessor import DataPreprocessor, DataPreprocessingError
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit the preprocessing pipeline (fill values, category vocabularies, scaler) "
+        "on the training CSV and save it next to the model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('training_csv', help='CSV the model was trained on')
+        parser.add_argument(
+            '--output',
+            default=os.path.join(os.path.dirname(settings.ML_MODEL_PATH), PREPROCESSOR_FILENAME),
+            help='Where to write the artifact (default: next to ML_MODEL_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            df = pd.read_csv(options['training_csv'])
+        except Exception as e:
+            raise CommandError(f"Error reading CSV: {str(e)}")
+
+        try:
+            preprocessor = DataPreprocessor().fit(df)
+            preprocessor.save(options['output'])
+        except (DataPreprocessingError, OSError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Fitted preprocessor on {len(df)} rows and saved it to {options['output']}. "
+            "Restart the workers to pick it up."
+        ))
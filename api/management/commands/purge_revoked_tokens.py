@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.tokens import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete revoked-token entries whose tokens have expired. Run it periodically, e.g. daily from cron."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired revoked-token entries."))
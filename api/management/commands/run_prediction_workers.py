@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import run_worker
+from ml_utils.registry import model_registry
+
+
+def _worker_main(worker_id, poll_interval, once):
+    import django
+    # No-op when the process was forked from an already set up parent
+    django.setup()
+    run_worker(worker_id=worker_id, poll_interval=poll_interval, once=once)
+
+
+class Command(BaseCommand):
+    help = "Start a pool of worker processes that run queued prediction jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.PREDICTION_WORKERS,
+            help='Number of worker processes (default: PREDICTION_WORKERS)',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds between queue polls when idle',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        poll_interval = options['poll_interval']
+        once = options['once']
+
+        if workers <= 1:
+            run_worker(poll_interval=poll_interval, once=once)
+            return
+
+        # Load the model once in the parent so forked workers share its pages,
+        # and never hand an open database connection to a child
+        model_registry.preload()
+        connections.close_all()
+
+        processes = []
+        for i in range(workers):
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(None, poll_interval, once),
+                name=f"prediction-worker-{i + 1}",
+            )
+            process.start()
+            processes.append(process)
+        self.stdout.write(f"Started {workers} prediction workers")
+
+        def _forward(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        def _forward_reload(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGHUP)
+
+        signal.signal(signal.SIGTERM, _forward)
+        signal.signal(signal.SIGINT, _forward)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, _forward_reload)
+
+        for process in processes:
+            process.join()
+        self.stdout.write("All prediction workers stopped")
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:29
+
+import logging
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+
+def move_json_to_files(apps, schema_editor):
+    import pandas as pd
+    from api import storage
+
+    UploadedDataset = apps.get_model("api", "UploadedDataset")
+    for upload in UploadedDataset.objects.exclude(data={}).iterator(chunk_size=1):
+        data = upload.data or {}
+        if "processed_data" not in data:
+            continue
+        df = pd.DataFrame(data["processed_data"])
+        customer_ids = data.get("customer_ids")
+        if customer_ids is not None and len(customer_ids) != len(df):
+            # Older uploads stored IDs from before dropna, so which rows they
+            # belong to is unknown; drop them rather than mislabel results
+            logger.warning(
+                f"Upload {upload.id}: {len(customer_ids)} customer IDs for {len(df)} rows; dropping the IDs"
+            )
+            customer_ids = None
+        upload.data_file = storage.write_dataset(df, customer_ids)
+        upload.row_count = len(df)
+        upload.columns = list(df.columns)
+        upload.has_customer_ids = customer_ids is not None
+        if data.get("predictions"):
+            upload.results_file = storage.write_results(data["predictions"])
+        upload.data = {}
+        upload.save()
+
+
+def move_files_to_json(apps, schema_editor):
+    from api import storage
+
+    UploadedDataset = apps.get_model("api", "UploadedDataset")
+    for upload in UploadedDataset.objects.exclude(data_file="").iterator(chunk_size=1):
+        df = storage.read_frame(upload.data_file)
+        customer_ids = None
+        if upload.has_customer_ids:
+            customer_ids = df.pop(storage.CUSTOMER_ID_COLUMN).tolist()
+        data = {
+            "processed_data": df.to_dict(orient="records"),
+            "customer_ids": customer_ids,
+        }
+        if upload.results_file:
+            data["predictions"] = storage.read_frame(upload.results_file).to_dict(orient="records")
+        upload.data = data
+        upload.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_remove_uploadeddataset_user_uploadeddataset_status_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="columns",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="data_file",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="has_customer_ids",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="results_file",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="row_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="uploadeddataset",
+            name="data",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(move_json_to_files, move_files_to_json),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_uploadeddataset_columnar_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PredictionJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("status", models.CharField(choices=[("queued", "Queued"), ("processing", "Processing"), ("processed", "Processed"), ("failed", "Failed")], default="queued", max_length=20)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("worker", models.CharField(blank=True, default="", max_length=100)),
+                ("attempts", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True, default="")),
+                ("upload", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="jobs", to="api.uploadeddataset")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["status", "created_at"], name="api_predict_status_23922d_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_predictionjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="data_checksum",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="results_key",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_uploadeddataset_prediction_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, default="", max_length=64),
+        ),
+    ]
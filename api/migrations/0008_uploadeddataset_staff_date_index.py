@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_uploadeddataset_content_hash"),
+        ("clients", "0005_staff_password"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="uploadeddataset",
+            index=models.Index(fields=["staff", "upload_date", "id"], name="api_upload_staff_date_idx"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:23
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # Keep the oldest unfinished job of each upload so the constraint can be created
+    PredictionJob = apps.get_model("api", "PredictionJob")
+    active = PredictionJob.objects.filter(status__in=["queued", "processing"]).order_by("upload_id", "created_at", "id")
+    seen = set()
+    duplicates = []
+    for job_id, upload_id in active.values_list("id", "upload_id"):
+        if upload_id in seen:
+            duplicates.append(job_id)
+        seen.add(upload_id)
+    PredictionJob.objects.filter(id__in=duplicates).update(
+        status="failed", finished_at=timezone.now(), error="Duplicate of an earlier job for this upload"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_predictionjob_heartbeat_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="predictionjob",
+            constraint=models.UniqueConstraint(condition=models.Q(("status__in", ["queued", "processing"])), fields=("upload",), name="api_job_one_active_per_upload"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_predictionjob_one_active_per_upload"),
+    ]
+
+    operations = [
+        # Uploads stored so far hold encoded and scaled features
+        migrations.AddField(
+            model_name="uploadeddataset",
+            name="raw_features",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name="uploadeddataset",
+            name="raw_features",
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from clients.models import Staff
+from . import storage
 
 # Create your models here.
 
@@ -7,8 +8,162 @@ class UploadedDataset(models.Model):
     staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
     upload_date = models.DateTimeField(auto_now_add=True)
     filename = models.CharField(max_length=255)
-    data = models.JSONField()
+    # Legacy JSON blob; rows and predictions now live in data_file/results_file
+    data = models.JSONField(default=dict, blank=True)
     status = models.CharField(max_length=20, default='pending')
+    data_file = models.CharField(max_length=255, blank=True, default='')
+    results_file = models.CharField(max_length=255, blank=True, default='')
+    row_count = models.IntegerField(default=0)
+    columns = models.JSONField(default=list, blank=True)
+    has_customer_ids = models.BooleanField(default=False)
+    # False for uploads stored before ingestion kept the raw features; their
+    # data_file is already encoded and scaled and must not be transformed again
+    raw_features = models.BooleanField(default=True)
+    # SHA-256 of the raw uploaded file; identical uploads share data_file
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    # SHA-256 of data_file, the prediction cache key
+    data_checksum = models.CharField(max_length=64, blank=True, default='')
+    # Model version, dataset checksum and thresholds the stored results were computed with
+    results_key = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        # Serves the per-staff history listing and its keyset pagination
+        indexes = [models.Index(fields=['staff', 'upload_date', 'id'], name='api_upload_staff_date_idx')]
 
     def __str__(self):
         return f"{self.filename} ({self.upload_date})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Whether results were already stored, so api.signals counts each predicted upload once
+        instance._had_results = bool(instance.__dict__.get('results_file'))
+        return instance
+
+    @property
+    def has_results(self):
+        return bool(self.results_file)
+
+    def store_data(self, df, customer_ids=None):
+        """Write the rows to columnar storage and record their metadata"""
+        self.data_file = storage.write_dataset(df, customer_ids)
+        self.row_count = len(df)
+        self.columns = list(df.columns)
+        self.has_customer_ids = customer_ids is not None
+
+    @classmethod
+    def find_duplicate(cls, staff, content_hash):
+        """
+        Return the newest upload by this staff member with the same raw file, if any.
+
+        Only the staff member's own uploads are matched: a hash must not give
+        access to a dataset uploaded by someone else.
+        """
+        if not content_hash:
+            return None
+        return (cls.objects.filter(staff=staff, content_hash=content_hash)
+                .exclude(data_file='').order_by('-upload_date').first())
+
+    @classmethod
+    def file_in_use(cls, relpath, exclude_pk=None):
+        """Whether any upload still references a stored data or results file"""
+        uploads = cls.objects.filter(models.Q(data_file=relpath) | models.Q(results_file=relpath))
+        if exclude_pk is not None:
+            uploads = uploads.exclude(pk=exclude_pk)
+        return uploads.exists()
+
+    def reuse_stored_data(self, source, model_version=None):
+        """
+        Point this upload at the stored data of an identical earlier upload.
+
+        Results are shared as well when they were computed by model_version.
+        """
+        self.content_hash = source.content_hash
+        self.data_file = source.data_file
+        self.data_checksum = source.data_checksum
+        self.row_count = source.row_count
+        self.columns = list(source.columns)
+        self.has_customer_ids = source.has_customer_ids
+        self.raw_features = source.raw_features
+        if model_version and source.has_results and source.results_key.startswith(f"{model_version}:"):
+            self.results_file = source.results_file
+            self.results_key = source.results_key
+            self.status = 'processed'
+
+    def get_data_checksum(self):
+        """Return the checksum of the stored data, computing and saving it on first use"""
+        if not self.data_checksum:
+            self.data_checksum = storage.file_checksum(self.data_file)
+            if self.pk:
+                UploadedDataset.objects.filter(pk=self.pk).update(data_checksum=self.data_checksum)
+        return self.data_checksum
+
+    def store_results(self, results):
+        """Write prediction results to columnar storage, replacing any previous run"""
+        previous = self.results_file
+        self.results_file = storage.write_results(results)
+        if previous and previous != self.results_file and not self.file_in_use(previous, exclude_pk=self.pk):
+            storage.delete_file(previous)
+
+    def read_data(self, columns=None):
+        """Return the processed rows as a DataFrame (without customer IDs)"""
+        return storage.read_frame(self.data_file, columns=columns or self.columns)
+
+    def read_customer_ids(self):
+        """Return the stored customer IDs, or None if the upload had none"""
+        if not self.has_customer_ids:
+            return None
+        frame = storage.read_frame(self.data_file, columns=[storage.CUSTOMER_ID_COLUMN])
+        return frame[storage.CUSTOMER_ID_COLUMN].tolist()
+
+    def read_results(self, columns=None):
+        """Return stored prediction results as a DataFrame, or None if not predicted yet"""
+        if not self.results_file:
+            return None
+        return storage.read_frame(self.results_file, columns=columns)
+
+
+class PredictionJob(models.Model):
+    """A queued scoring run for an upload, executed by run_prediction_workers"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ('queued', 'processing')
+
+    upload = models.ForeignKey(UploadedDataset, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while it runs the job; see api.jobs.requeue_stale_jobs
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        constraints = [
+            # Concurrent requests cannot queue the same upload twice
+            models.UniqueConstraint(
+                fields=['upload'], condition=models.Q(status__in=['queued', 'processing']),
+                name='api_job_one_active_per_upload',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} for upload {self.upload_id} ({self.status})"
+
+
+class RevokedToken(models.Model):
+    """Denylisted token (by its jti claim), kept until the token would have expired anyway"""
+    jti = models.CharField(max_length=64, unique=True)
+    token_type = models.CharField(max_length=10)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.token_type} {self.jti}"
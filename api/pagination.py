@@ -0,0 +1,69 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+A cursor is an opaque, URL-safe token holding the sort key of the last row
+of a page. The next page is fetched with a WHERE clause on that key instead
+of an OFFSET, so every page costs the same regardless of how deep it is.
+"""
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(Exception):
+    """Custom exception for invalid paging parameters"""
+    pass
+
+
+def encode_cursor(values):
+    """Encode a list of JSON-serializable key values as a cursor token"""
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    """
+    Decode a cursor token produced by encode_cursor().
+
+    Args:
+        token (str): Cursor from the client
+        length (int): Number of key values the cursor must hold
+
+    Raises:
+        PaginationError: If the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != length:
+        raise PaginationError("Invalid cursor.")
+    return values
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a page size query parameter, capped at maximum"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer.")
+    if limit < 1:
+        raise PaginationError("limit must be positive.")
+    return min(limit, maximum)
+
+
+def parse_offset(value):
+    if value in (None, ''):
+        return 0
+    try:
+        offset = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("offset must be an integer.")
+    if offset < 0:
+        raise PaginationError("offset must not be negative.")
+    return offset
@@ -0,0 +1,214 @@
+"""
+Scoring of stored uploads, shared by PredictView and the prediction workers.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from ml_utils.batching import MicroBatcher
+from ml_utils.registry import model_registry
+from .cache import get_prediction_cache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Index positions double as the codes stored in PredictionResults
+PREDICTED_CLASSES = ["Not Churning", "Churn Risk"]
+RISK_LEVELS = ["Low Risk", "Medium Risk", "High Risk"]
+RECOMMENDATIONS = ["Regular monitoring", "Monitor closely", "Immediate action required"]
+LOW_RISK, MEDIUM_RISK, HIGH_RISK = range(3)
+
+RESULT_COLUMNS = ['predicted_class', 'churn_probability', 'risk_level', 'recommendation', 'customerID']
+
+_score_batcher = None
+
+
+class PredictionResults:
+    """
+    Array-backed prediction results.
+
+    Risk levels and recommendations are computed for the whole batch with
+    NumPy; per-customer dicts are only built when serializing.
+    """
+
+    def __init__(self, probabilities, predictions, customer_ids=None, thresholds=None):
+        """
+        Args:
+            probabilities (array-like): Churn probability per customer (0-1)
+            predictions (array-like): Predicted class per customer (0/1)
+            customer_ids (list): Customer IDs aligned with the predictions
+            thresholds (dict): 'high' and 'medium' risk cut-offs in percent.
+                Defaults to PREDICTION_RISK_THRESHOLDS.
+        """
+        thresholds = thresholds or settings.PREDICTION_RISK_THRESHOLDS
+        self.probabilities = np.asarray(probabilities, dtype=float) * 100
+        self.predictions = np.asarray(predictions).astype(np.int8)
+        self.customer_ids = customer_ids
+
+        self.risk_codes = np.select(
+            [self.probabilities >= thresholds['high'], self.probabilities >= thresholds['medium']],
+            [HIGH_RISK, MEDIUM_RISK],
+            default=LOW_RISK,
+        ).astype(np.int8)
+        # Only customers predicted to churn get an escalated recommendation
+        self.recommendation_codes = np.where(self.predictions == 1, self.risk_codes, LOW_RISK).astype(np.int8)
+
+    @classmethod
+    def from_frame(cls, frame, thresholds=None):
+        """Rebuild results from a typed frame written by to_frame()"""
+        predicted = frame['predicted_class']
+        if isinstance(predicted.dtype, pd.CategoricalDtype):
+            predictions = predicted.cat.codes.to_numpy()
+        else:
+            predictions = (predicted == PREDICTED_CLASSES[1]).to_numpy()
+        customer_ids = frame['customerID'].tolist() if 'customerID' in frame.columns else None
+        return cls(frame['churn_probability'].to_numpy() / 100, predictions, customer_ids, thresholds)
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    def summary(self):
+        counts = np.bincount(self.risk_codes, minlength=len(RISK_LEVELS))
+        return {
+            'total_customers': len(self),
+            'high_risk_count': int(counts[HIGH_RISK]),
+            'medium_risk_count': int(counts[MEDIUM_RISK]),
+            'low_risk_count': int(counts[LOW_RISK]),
+        }
+
+    def to_frame(self):
+        """Return the results as a typed DataFrame (the stored representation)"""
+        if self.customer_ids is not None:
+            customer_ids = pd.Series(self.customer_ids, dtype=str)
+        else:
+            customer_ids = 'ID_' + pd.Series(np.arange(len(self))).astype(str)
+        return pd.DataFrame({
+            'predicted_class': pd.Categorical.from_codes(self.predictions, PREDICTED_CLASSES),
+            'churn_probability': self.probabilities,
+            'risk_level': pd.Categorical.from_codes(self.risk_codes, RISK_LEVELS),
+            'recommendation': pd.Categorical.from_codes(self.recommendation_codes, RECOMMENDATIONS),
+            'customerID': customer_ids,
+        })
+
+    def to_records(self):
+        return frame_to_records(self.to_frame())
+
+
+def format_probability(value):
+    """Format a churn probability percentage the way the API has always shown it"""
+    return f"{round(value, 2)}%"
+
+
+def frame_to_records(frame):
+    """
+    Serialize a results DataFrame to the API's list of result dicts.
+
+    Accepts both the typed frames written by PredictionResults and older
+    result files whose churn_probability is already a formatted string.
+    """
+    values = frame_to_columns(frame)
+    columns = list(values)
+    return [dict(zip(columns, row)) for row in zip(*values.values())]
+
+
+def frame_to_columns(frame):
+    """Return the API's formatted values of a results DataFrame as one list per column"""
+    columns = [col for col in RESULT_COLUMNS if col in frame.columns]
+    values = {col: frame[col].tolist() for col in columns}
+    if 'churn_probability' in values and pd.api.types.is_numeric_dtype(frame['churn_probability']):
+        values['churn_probability'] = [format_probability(p) for p in values['churn_probability']]
+    return values
+
+
+def run_prediction(upload, predictor):
+    """
+    Score a stored upload, save the results and mark it processed.
+
+    Stored results computed with the same model version, data and thresholds
+    are returned as they are. Otherwise probabilities are looked up in the
+    prediction cache first, so data that was already scored by the same model
+    version skips inference.
+
+    Args:
+        upload (UploadedDataset): Upload to score
+        predictor (ChurnPredictor): Loaded predictor
+
+    Returns:
+        PredictionResults: The scored results
+
+    Raises:
+        ModelPredictionError: If prediction fails
+        DataPreprocessingError: If preprocessing fails
+        DatasetStorageError: If the stored data cannot be read or written
+    """
+    data_hash = upload.get_data_checksum()
+    risk = settings.PREDICTION_RISK_THRESHOLDS
+    results_key = f"{predictor.version}:{data_hash}:{predictor.threshold}:{risk['high']}:{risk['medium']}"
+    if upload.has_results and upload.results_key == results_key:
+        results = PredictionResults.from_frame(upload.read_results())
+        logger.info(f"Reusing stored predictions for upload {upload.id}")
+        if upload.status != 'processed':
+            upload.status = 'processed'
+            upload.save(update_fields=['status'])
+        return results
+
+    cache = get_prediction_cache()
+    probabilities = cache.get(predictor.version, data_hash) if cache else None
+    if probabilities is None:
+        raw = predictor.predict(upload.read_data(), preprocessed=not upload.raw_features)
+        probabilities = raw['probabilities']
+        if cache:
+            cache.set(predictor.version, data_hash, probabilities)
+    else:
+        logger.info(f"Prediction cache hit for upload {upload.id}")
+
+    predictions = (probabilities >= predictor.threshold).astype(np.int8)
+    results = PredictionResults(probabilities, predictions, upload.read_customer_ids())
+    logger.info(f"Generated {len(results)} predictions for upload {upload.id}")
+
+    upload.store_results(results.to_frame())
+    upload.results_key = results_key
+    upload.status = 'processed'
+    upload.save(update_fields=['status', 'results_file', 'results_key'])
+    return results
+
+
+def score_records(records, predictor, threshold=None):
+    """
+    Score customer records in memory, without storing anything.
+
+    Args:
+        records (list): Customer feature dicts; an optional customerID is
+            echoed back in the results
+        predictor (ChurnPredictor | MicroBatcher): Loaded predictor, or the
+            shared batcher in front of it
+        threshold (float): Overrides the predictor's decision threshold
+
+    Returns:
+        PredictionResults: The scored results
+
+    Raises:
+        ModelPredictionError: If prediction fails
+        DataPreprocessingError: If preprocessing fails
+    """
+    customer_ids = None
+    if any('customerID' in record for record in records):
+        customer_ids = [str(record.get('customerID') or '') for record in records]
+
+    raw = predictor.predict_records(records, threshold=threshold)
+    return PredictionResults(raw['probabilities'], raw['predictions'], customer_ids)
+
+
+def get_score_batcher():
+    """Return the process-wide micro-batcher used for real-time scoring"""
+    global _score_batcher
+    if _score_batcher is None:
+        _score_batcher = MicroBatcher(
+            model_registry.get_predictor,
+            max_batch_size=settings.SCORING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.SCORING_BATCH_MAX_WAIT_MS,
+        )
+    return _score_batcher
@@ -0,0 +1,129 @@
+"""
+Server-side filtering, sorting and paging of an upload's stored rows.
+
+Only the columns needed to pick the rows (risk level, predicted class,
+probability) are scanned; the selected page is then read with
+storage.read_rows(), so a 50 row page of a million row upload never
+materializes the rest.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from . import storage
+from .pagination import PaginationError
+from .prediction import frame_to_records
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DETAIL_FIELDS = ('processed_data', 'customer_ids', 'predictions')
+SORT_FIELDS = ('probability', '-probability')
+
+
+def _probabilities(frame):
+    """Churn probabilities as floats, also for legacy results stored as '12.3%'"""
+    values = frame['churn_probability']
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    return pd.to_numeric(values.astype(str).str.rstrip('%'), errors='coerce').to_numpy(dtype=float)
+
+
+def select_rows(upload, risk_levels=None, predicted_classes=None, sort=None, cursor=None, offset=0, limit=50):
+    """
+    Pick the row positions of one page of an upload.
+
+    Args:
+        upload (UploadedDataset): Upload to read
+        risk_levels (list): Keep only rows with one of these risk levels
+        predicted_classes (list): Keep only rows with one of these classes
+        sort (str): 'probability' or '-probability'; row order if None
+        cursor (list): Sort key of the last row of the previous page, as
+            returned in next_cursor
+        offset (int): Rows to skip (after applying the cursor)
+        limit (int): Page size
+
+    Returns:
+        tuple: (row positions, total matching rows, next cursor key or None)
+
+    Raises:
+        PaginationError: If the parameters cannot be applied to this upload
+        DatasetStorageError: If the stored results cannot be read
+    """
+    needs_results = bool(risk_levels or predicted_classes or sort)
+    if needs_results and not upload.has_results:
+        raise PaginationError("Filtering and sorting need prediction results; run a prediction first.")
+    if sort is not None and sort not in SORT_FIELDS:
+        raise PaginationError(f"sort must be one of {', '.join(SORT_FIELDS)}.")
+
+    rows = np.arange(upload.row_count)
+    probabilities = None
+    if needs_results:
+        columns = [col for col, wanted in (('risk_level', risk_levels),
+                                           ('predicted_class', predicted_classes),
+                                           ('churn_probability', sort)) if wanted]
+        frame = upload.read_results(columns=columns)
+        mask = np.ones(len(frame), dtype=bool)
+        if risk_levels:
+            mask &= frame['risk_level'].isin(risk_levels).to_numpy()
+        if predicted_classes:
+            mask &= frame['predicted_class'].isin(predicted_classes).to_numpy()
+        rows = np.arange(len(frame))[mask]
+        if sort:
+            probabilities = _probabilities(frame)[mask]
+            if sort == 'probability':
+                order = np.lexsort((rows, probabilities))
+            else:
+                order = np.lexsort((-rows, -probabilities))
+            rows = rows[order]
+            probabilities = probabilities[order]
+    total = len(rows)
+
+    if cursor is not None:
+        try:
+            if sort:
+                last_probability, last_row = float(cursor[0]), int(cursor[1])
+                if sort == 'probability':
+                    after = (probabilities > last_probability) | ((probabilities == last_probability) & (rows > last_row))
+                else:
+                    after = (probabilities < last_probability) | ((probabilities == last_probability) & (rows < last_row))
+            else:
+                after = rows > int(cursor[0])
+        except (TypeError, ValueError, IndexError):
+            raise PaginationError("Invalid cursor.")
+        rows = rows[after]
+        if probabilities is not None:
+            probabilities = probabilities[after]
+
+    page = rows[offset:offset + limit]
+    next_cursor = None
+    if offset + limit < len(rows):
+        last = offset + len(page) - 1
+        next_cursor = [float(probabilities[last]), int(rows[last])] if sort else [int(rows[last])]
+    return page, total, next_cursor
+
+
+def read_page(upload, rows, fields=DETAIL_FIELDS):
+    """
+    Read the requested fields for the given row positions.
+
+    Returns:
+        dict: Any of processed_data, customer_ids and predictions, aligned with rows
+    """
+    data = {}
+    if 'processed_data' in fields or 'customer_ids' in fields:
+        columns = []
+        if 'processed_data' in fields:
+            columns += list(upload.columns)
+        if 'customer_ids' in fields and upload.has_customer_ids:
+            columns.append(storage.CUSTOMER_ID_COLUMN)
+        frame = storage.read_rows(upload.data_file, rows, columns=columns) if columns else None
+        if 'customer_ids' in fields:
+            data['customer_ids'] = frame.pop(storage.CUSTOMER_ID_COLUMN).tolist() if upload.has_customer_ids else None
+        if 'processed_data' in fields:
+            data['processed_data'] = frame.to_dict(orient='records')
+    if 'predictions' in fields and upload.has_results:
+        data['predictions'] = frame_to_records(storage.read_rows(upload.results_file, rows))
+    return data
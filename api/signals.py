@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from clients.models import Client, ClientCounters, Staff
+from . import storage
+from .authentication import token_cache
+from .models import UploadedDataset
+
+
+@receiver(post_delete, sender=UploadedDataset)
+def delete_dataset_files(sender, instance, **kwargs):
+    # Also runs for cascades and queryset deletes, unlike Model.delete().
+    # Files are shared between identical uploads, so keep them while referenced.
+    for relpath in (instance.data_file, instance.results_file):
+        if relpath and not UploadedDataset.file_in_use(relpath):
+            storage.delete_file(relpath)
+
+
+@receiver(post_save, sender=UploadedDataset)
+def count_upload(sender, instance, created, **kwargs):
+    had_results = getattr(instance, '_had_results', False)
+    instance._had_results = instance.has_results
+    if created or had_results != instance.has_results:
+        ClientCounters.adjust(
+            instance.staff.client_id,
+            upload_count=1 if created else 0,
+            prediction_count=int(instance.has_results) - int(had_results),
+        )
+
+
+@receiver(post_delete, sender=UploadedDataset)
+def uncount_upload(sender, instance, **kwargs):
+    client_id = Staff.objects.filter(pk=instance.staff_id).values_list('client_id', flat=True).first()
+    if client_id is not None:
+        ClientCounters.adjust(client_id, upload_count=-1, prediction_count=-int(instance.has_results))
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_staff_tokens(sender, instance, **kwargs):
+    token_cache.invalidate('staff', instance.pk)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_client_tokens(sender, instance, **kwargs):
+    # Also drops the client's staff, whose cached client would be stale
+    token_cache.invalidate('client', instance.pk)
@@ -0,0 +1,309 @@
+"""
+Columnar on-disk storage for uploaded datasets and prediction results.
+
+Datasets are written as Parquet files under DATASET_STORAGE_ROOT and read back
+with memory mapping, so the database only keeps metadata and a relative path.
+"""
+import hashlib
+import logging
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CUSTOMER_ID_COLUMN = 'customerID'
+DATASETS_DIR = 'datasets'
+RESULTS_DIR = 'results'
+SCRATCH_DIR = 'tmp'
+# Small row groups let read_rows() decode only the part of a file a page needs
+ROW_GROUP_SIZE = 64 * 1024
+
+
+class DatasetStorageError(Exception):
+    """Custom exception for dataset storage errors"""
+    pass
+
+
+def storage_root():
+    return settings.DATASET_STORAGE_ROOT
+
+
+def absolute_path(relpath):
+    """Resolve a stored relative path, refusing anything outside the storage root"""
+    root = os.path.abspath(storage_root())
+    path = os.path.abspath(os.path.join(root, relpath))
+    if os.path.commonpath([root, path]) != root:
+        raise DatasetStorageError(f"Invalid storage path: {relpath}")
+    return path
+
+
+def write_frame(df, subdir=DATASETS_DIR):
+    """
+    Write a dataframe to a new Parquet file.
+
+    Args:
+        df (pd.DataFrame): Data to store
+        subdir (str): Directory under the storage root
+
+    Returns:
+        str: Path of the file relative to the storage root
+
+    Raises:
+        DatasetStorageError: If the file cannot be written
+    """
+    relpath = os.path.join(subdir, f"{uuid.uuid4().hex}.parquet")
+    path = absolute_path(relpath)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+        # Only expose complete files
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        logger.error(f"Error writing {relpath}: {str(e)}")
+        raise DatasetStorageError(f"Error writing dataset file: {str(e)}")
+    logger.info(f"Wrote {len(df)} rows to {relpath}")
+    return relpath
+
+
+def read_frame(relpath, columns=None):
+    """
+    Read a stored Parquet file (memory-mapped) into a dataframe.
+
+    Args:
+        relpath (str): Path relative to the storage root
+        columns (list): Optional subset of columns to read
+
+    Returns:
+        pd.DataFrame: The stored data
+
+    Raises:
+        DatasetStorageError: If the file is missing or unreadable
+    """
+    try:
+        table = pq.read_table(absolute_path(relpath), columns=columns, memory_map=True)
+    except DatasetStorageError:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading {relpath}: {str(e)}")
+        raise DatasetStorageError(f"Error reading dataset file: {str(e)}")
+    return table.to_pandas()
+
+
+def read_rows(relpath, rows, columns=None):
+    """
+    Read selected rows of a stored Parquet file, in the order given.
+
+    Only the row groups containing those rows are decoded.
+
+    Args:
+        relpath (str): Path relative to the storage root
+        rows (array-like): Row positions to read
+        columns (list): Optional subset of columns to read
+
+    Returns:
+        pd.DataFrame: The requested rows, with a fresh index
+
+    Raises:
+        DatasetStorageError: If the file is missing or unreadable
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    try:
+        parquet_file = pq.ParquetFile(absolute_path(relpath), memory_map=True)
+        metadata = parquet_file.metadata
+        bounds = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+        if len(rows) and (rows.min() < 0 or rows.max() >= bounds[-1]):
+            raise DatasetStorageError(f"Row out of range for {relpath}")
+        groups = np.searchsorted(bounds, rows, side='right') - 1
+        tables = []
+        positions = []
+        for group in np.unique(groups):
+            selected = rows[groups == group]
+            table = parquet_file.read_row_group(int(group), columns=columns)
+            tables.append(table.take(pa.array(selected - bounds[group])))
+            positions.append(np.flatnonzero(groups == group))
+        if not tables:
+            return parquet_file.schema_arrow.empty_table().select(columns or parquet_file.schema_arrow.names).to_pandas()
+        table = pa.concat_tables(tables)
+        # Back to the requested order
+        order = np.argsort(np.concatenate(positions), kind='stable')
+        return table.take(pa.array(order)).to_pandas()
+    except DatasetStorageError:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading {relpath}: {str(e)}")
+        raise DatasetStorageError(f"Error reading dataset file: {str(e)}")
+
+
+class FrameWriter:
+    """
+    Write a Parquet file incrementally, one dataframe chunk per row group.
+
+    The file only appears under its final name once close() succeeds.
+    """
+
+    def __init__(self, subdir=DATASETS_DIR):
+        self.relpath = os.path.join(subdir, f"{uuid.uuid4().hex}.parquet")
+        self.path = absolute_path(self.relpath)
+        self.tmp_path = f"{self.path}.tmp"
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        """Append a chunk; every chunk must have the same columns and dtypes"""
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            else:
+                table = table.cast(self._writer.schema)
+            self._writer.write_table(table)
+        except Exception as e:
+            self.abort()
+            logger.error(f"Error writing {self.relpath}: {str(e)}")
+            raise DatasetStorageError(f"Error writing dataset file: {str(e)}")
+        self.rows += len(df)
+
+    def close(self, empty=None):
+        """
+        Finish the file.
+
+        Args:
+            empty (pd.DataFrame): Written as-is if no chunk was written, so the
+                file still carries the column schema
+
+        Returns:
+            str: Path of the file relative to the storage root
+        """
+        if self._writer is None:
+            if empty is None:
+                raise DatasetStorageError("No data was written")
+            self.write(empty)
+        try:
+            self._writer.close()
+            os.replace(self.tmp_path, self.path)
+        except Exception as e:
+            self.abort()
+            raise DatasetStorageError(f"Error writing dataset file: {str(e)}")
+        self._writer = None
+        logger.info(f"Wrote {self.rows} rows to {self.relpath}")
+        return self.relpath
+
+    def abort(self):
+        """Discard a partially written file"""
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+def iter_frames(relpath, batch_size=65536, columns=None):
+    """
+    Yield a stored Parquet file as a sequence of dataframes.
+
+    Only one batch is materialized at a time, so memory stays bounded.
+    """
+    try:
+        parquet_file = pq.ParquetFile(absolute_path(relpath), memory_map=True)
+    except DatasetStorageError:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading {relpath}: {str(e)}")
+        raise DatasetStorageError(f"Error reading dataset file: {str(e)}")
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas()
+
+
+def file_checksum(relpath):
+    """
+    Return the SHA-256 hex digest of a stored file, read in blocks.
+
+    Raises:
+        DatasetStorageError: If the file is missing or unreadable
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(absolute_path(relpath), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    except OSError as e:
+        logger.error(f"Error reading {relpath}: {str(e)}")
+        raise DatasetStorageError(f"Error reading dataset file: {str(e)}")
+    return digest.hexdigest()
+
+
+def content_hash(file_obj):
+    """
+    Return the SHA-256 hex digest of an uploaded file, streamed in chunks.
+
+    The file is rewound afterwards so it can still be parsed.
+    """
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def delete_file(relpath):
+    """Remove a stored file, ignoring files that are already gone"""
+    if not relpath:
+        return
+    try:
+        os.remove(absolute_path(relpath))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not delete {relpath}: {str(e)}")
+
+
+def write_dataset(df, customer_ids=None):
+    """
+    Store processed upload data, keeping customer IDs as their own column.
+
+    Returns:
+        str: Path of the file relative to the storage root
+    """
+    if customer_ids is not None:
+        df = df.copy()
+        df[CUSTOMER_ID_COLUMN] = pd.Series(customer_ids, index=df.index).astype(str)
+    return write_frame(df, DATASETS_DIR)
+
+
+def write_results(results):
+    """
+    Store prediction results.
+
+    Args:
+        results (pd.DataFrame | list): Result rows
+
+    Returns:
+        str: Path of the file relative to the storage root
+    """
+    if not isinstance(results, pd.DataFrame):
+        results = pd.DataFrame(results)
+    return write_frame(results, RESULTS_DIR)
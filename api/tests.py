@@ -1,3 +1,1061 @@
-from django.test import TestCase
+import copy
+import gzip
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from sklearn.linear_model import LogisticRegression
+
+from clients.models import Client, Staff
+from ml_utils.batching import MicroBatcher
+from ml_utils.predictor import PREPROCESSOR_FILENAME, ChurnPredictor, ModelPredictionError
+from ml_utils.preprocessor import DataPreprocessor
+from ml_utils.registry import model_registry
+from .apps import is_serving
+from .authentication import get_token_principal, token_cache
+from .cache import DjangoPredictionCache, FileSystemPredictionCache, LRUPredictionCache, build_cache
+from .jobs import claim_next_job, enqueue_prediction, process_job, requeue_stale_jobs, touch_job
+from .models import PredictionJob, RevokedToken, UploadedDataset
+from . import storage
+from .export import EXPORT_SCHEMA, iter_arrow, iter_csv, iter_ndjson
+from .prediction import RESULT_COLUMNS, RISK_LEVELS, PredictionResults, format_probability, run_prediction
+from .tokens import decode_token, revoke
+
+PASSWORD = 'pw123456'
+CONTRACTS = ['Month-to-month', 'One year', 'Two year']
+PAYMENT_METHODS = ['Electronic check', 'Mailed check', 'Bank transfer (automatic)', 'Credit card (automatic)']
+
+
+def customer(n):
+    """A deterministic Telco customer record"""
+    tenure = (n * 7) % 73
+    monthly = 20.0 + (n * 13) % 100
+    yes_no = lambda flag: 'Yes' if flag else 'No'
+    return {
+        'customerID': f"{n:04d}-TEST",
+        'SeniorCitizen': yes_no(n % 7 == 0),
+        'Partner': yes_no(n % 2),
+        'Dependents': yes_no(n % 3 == 0),
+        'tenure': tenure,
+        'OnlineSecurity': yes_no(n % 5 == 0),
+        'OnlineBackup': yes_no(n % 4 == 0),
+        'DeviceProtection': yes_no(n % 6 == 0),
+        'TechSupport': yes_no(n % 8 == 0),
+        'Contract': CONTRACTS[n % 3],
+        'PaperlessBilling': yes_no(n % 4),
+        'PaymentMethod': PAYMENT_METHODS[n % 4],
+        'MonthlyCharges': monthly,
+        # Blank for new customers, as in the Telco dataset
+        'TotalCharges': str(round(monthly * tenure, 2)) if tenure else ' ',
+    }
+
+
+def customers(count, start=0):
+    return pd.DataFrame([customer(n) for n in range(start, start + count)])
+
+
+def build_model(directory):
+    """Fit a small model and preprocessor artifact; returns the model path"""
+    training = customers(200)
+    preprocessor = DataPreprocessor().fit(training)
+    churn = (training['Contract'] == 'Month-to-month') & (training['tenure'] < 24)
+    model = LogisticRegression().fit(preprocessor.transform(training), churn.astype(int))
+    model_path = os.path.join(directory, 'model.pkl')
+    with open(model_path, 'wb') as f:
+        pickle.dump(model, f)
+    preprocessor.save(os.path.join(directory, PREPROCESSOR_FILENAME))
+    return model_path
+
+
+def make_staff(company_id=1, staff_id='s1'):
+    client, _ = Client.objects.get_or_create(company_id=company_id, defaults={
+        'company_name': f"Client {company_id}", 'company_address': '-', 'company_contact_no': '0',
+        'company_email': f"client{company_id}@example.com", 'password': make_password(PASSWORD),
+    })
+    return Staff.objects.create(
+        staff_id=staff_id, client=client, name=staff_id, email=f"{staff_id}@example.com",
+        password=make_password(PASSWORD),
+    )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ApiTestCase(TestCase):
+    """Logs in a staff member; self.api sends requests with their access token"""
+
+    def setUp(self):
+        self.staff = make_staff()
+        self.tokens = self.login()
+        self.api = self.client_for(self.tokens['token'])
+
+    def login(self, staff_id='s1'):
+        response = self.client.post('/api/staff/login/', {'staff_id': staff_id, 'password': PASSWORD},
+                                    content_type='application/json', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def client_for(self, token):
+        return self.client_class(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def assertRejected(self, response):
+        # The JWT authentication classes send no WWW-Authenticate header, so DRF answers 403
+        self.assertEqual(response.status_code, 403)
+
+
+class PredictionTestCase(ApiTestCase):
+    """ApiTestCase with a small fitted model and a temporary dataset storage root"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.workdir = tempfile.mkdtemp()
+        cls.storage = override_settings(DATASET_STORAGE_ROOT=os.path.join(cls.workdir, 'datasets'))
+        cls.storage.enable()
+        cls.model_path = build_model(cls.workdir)
+        model_registry.configure(cls.model_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        model_registry.configure(settings.ML_MODEL_PATH, settings.ML_DECISION_THRESHOLD)
+        cls.storage.disable()
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def upload(self, count=50, start=0):
+        """Upload count customers as a CSV; returns the UploadedDataset"""
+        return self.upload_frame(customers(count, start))
+
+    def upload_frame(self, frame, **data):
+        """Upload a DataFrame as a CSV with extra form fields; returns the UploadedDataset"""
+        csv = frame.to_csv(index=False).encode()
+        data['file'] = SimpleUploadedFile('customers.csv', csv, 'text/csv')
+        response = self.api.post('/api/staff/upload/', data)
+        self.assertEqual(response.status_code, 200, response.content)
+        return UploadedDataset.objects.get(id=response.json()['upload_id'])
+
+
+class TokenTests(ApiTestCase):
+    def refresh(self, refresh_token):
+        return self.client.post('/api/auth/refresh/', {'refresh': refresh_token},
+                                content_type='application/json', HTTP_HOST='localhost')
+
+    def test_access_token_authenticates(self):
+        self.assertEqual(self.api.get('/api/staff/history/').status_code, 200)
+
+    def test_refresh_rotates_the_pair(self):
+        response = self.refresh(self.tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()
+        self.assertNotEqual(rotated['refresh'], self.tokens['refresh'])
+        self.assertEqual(self.client_for(rotated['token']).get('/api/staff/history/').status_code, 200)
+        # The new refresh token works once as well
+        self.assertEqual(self.refresh(rotated['refresh']).status_code, 200)
+
+    def test_refresh_token_reuse_is_rejected(self):
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 200)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+    def test_access_token_cannot_refresh(self):
+        self.assertEqual(self.refresh(self.tokens['token']).status_code, 401)
+
+    def test_refresh_token_cannot_authenticate(self):
+        self.assertRejected(self.client_for(self.tokens['refresh']).get('/api/staff/history/'))
+
+    def test_logout_revokes_both_tokens(self):
+        response = self.api.post('/api/auth/logout/', {'refresh': self.tokens['refresh']}, content_type='application/json')
+        self.assertEqual(response.json(), {'revoked': 2})
+        self.assertRejected(self.api.get('/api/staff/history/'))
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+    def test_purge_revoked_tokens(self):
+        now = datetime.now(timezone.utc)
+        RevokedToken.objects.create(jti='expired', token_type='access', expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', token_type='access', expires_at=now + timedelta(minutes=1))
+        call_command('purge_revoked_tokens', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+class TokenCacheTests(ApiTestCase):
+    def test_repeated_requests_use_the_cache(self):
+        self.api.get('/api/staff/history/')
+        hits = token_cache.stats()['hits']
+        self.assertEqual(self.api.get('/api/staff/history/').status_code, 200)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+    def test_repeated_authentication_skips_the_database(self):
+        get_token_principal('staff', self.tokens['token'])
+        with self.assertNumQueries(0):
+            get_token_principal('staff', self.tokens['token'])
+
+    def test_cached_token_revoked_elsewhere_is_rejected(self):
+        self.assertEqual(self.api.get('/api/staff/history/').status_code, 200)
+        # Revoked by another process: only the denylist row exists, this process's cache is untouched
+        payload = decode_token(self.tokens['token'])
+        RevokedToken.objects.create(
+            jti=payload['jti'], token_type='access',
+            expires_at=datetime.fromtimestamp(payload['exp'], tz=timezone.utc),
+        )
+        # Rejected once this process's "not revoked" answer has expired
+        later = time.monotonic() + settings.AUTH_REVOCATION_CHECK_TTL + 1
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertRejected(self.api.get('/api/staff/history/'))
+
+    def test_token_revoked_in_this_process_is_rejected_at_once(self):
+        self.assertEqual(self.api.get('/api/staff/history/').status_code, 200)
+        revoke(decode_token(self.tokens['token']))
+        self.assertRejected(self.api.get('/api/staff/history/'))
+
+
+class JobQueueTests(PredictionTestCase):
+    def age(self, job, **fields):
+        """Move a job's timestamps into the past"""
+        past = datetime.now(timezone.utc) - timedelta(hours=1)
+        PredictionJob.objects.filter(id=job.id).update(**{field: past for field in fields})
+
+    def test_job_lifecycle(self):
+        upload = self.upload()
+        job = enqueue_prediction(upload)
+        self.assertEqual((job.status, UploadedDataset.objects.get(id=upload.id).status), ('queued', 'queued'))
+
+        claimed = claim_next_job('worker-1')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), ('processing', 'worker-1', 1))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertIsNone(claim_next_job('worker-2'))
+
+        self.assertTrue(process_job(claimed))
+        job.refresh_from_db()
+        upload.refresh_from_db()
+        self.assertEqual((job.status, upload.status), ('processed', 'processed'))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(len(upload.read_results()), 50)
+
+    def test_enqueue_reuses_the_active_job(self):
+        upload = self.upload()
+        job = enqueue_prediction(upload)
+        self.assertEqual(enqueue_prediction(upload).id, job.id)
+        claim_next_job('worker-1')
+        self.assertEqual(enqueue_prediction(upload).id, job.id)
+        self.assertEqual(upload.jobs.count(), 1)
+
+    def test_only_one_active_job_per_upload(self):
+        upload = self.upload()
+        enqueue_prediction(upload)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PredictionJob.objects.create(upload=upload)
+
+    def test_enqueue_losing_a_race_returns_the_winner(self):
+        upload = self.upload()
+        winner = PredictionJob.objects.create(upload=upload)
+        # As if the active-job lookup ran just before the concurrent insert committed
+        with mock.patch('django.db.models.query.QuerySet.first', return_value=None):
+            self.assertEqual(enqueue_prediction(upload).id, winner.id)
+        self.assertEqual(upload.jobs.count(), 1)
+
+    def test_failed_job(self):
+        upload = self.upload()
+        enqueue_prediction(upload)
+        UploadedDataset.objects.filter(id=upload.id).update(data_file='datasets/missing.parquet', data_checksum='x')
+        job = claim_next_job('worker-1')
+        self.assertFalse(process_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error)
+        self.assertEqual(UploadedDataset.objects.get(id=upload.id).status, 'failed')
+
+    def test_long_running_job_with_heartbeat_is_not_requeued(self):
+        enqueue_prediction(self.upload())
+        job = claim_next_job('worker-1')
+        self.age(job, started_at=True, heartbeat_at=True)
+        touch_job(job)
+        self.assertEqual(requeue_stale_jobs(), 0)
+        self.assertEqual(PredictionJob.objects.get(id=job.id).status, 'processing')
+
+    def test_heartbeat_only_from_the_owning_worker(self):
+        enqueue_prediction(self.upload())
+        job = claim_next_job('worker-1')
+        job.worker = 'worker-2'
+        self.assertEqual(touch_job(job), 0)
+
+    def test_requeued_job_finished_by_the_original_worker(self):
+        for new_worker in ('worker-2', 'worker-1'):
+            with self.subTest(new_worker=new_worker):
+                enqueue_prediction(self.upload())
+                original = claim_next_job('worker-1')
+                self.age(original, heartbeat_at=True)
+                self.assertEqual(requeue_stale_jobs(), 1)
+                rerun = claim_next_job(new_worker)
+
+                # The original run completes after losing the job
+                self.assertTrue(process_job(original))
+                rerun.refresh_from_db()
+                self.assertEqual((rerun.status, rerun.worker, rerun.finished_at), ('processing', new_worker, None))
+                self.assertEqual(touch_job(rerun), 1)
+                self.assertTrue(process_job(rerun))
+                rerun.refresh_from_db()
+                self.assertEqual(rerun.status, 'processed')
+
+    def test_stale_job_is_requeued_then_failed(self):
+        upload = self.upload()
+        enqueue_prediction(upload)
+        with self.settings(PREDICTION_JOB_MAX_ATTEMPTS=2):
+            for attempt in (1, 2):
+                job = claim_next_job(f"worker-{attempt}")
+                self.assertEqual(job.attempts, attempt)
+                self.age(job, heartbeat_at=True)
+                self.assertEqual(requeue_stale_jobs(), 1)
+            job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'Job timed out'))
+        self.assertEqual(UploadedDataset.objects.get(id=upload.id).status, 'failed')
+
+    def test_async_predict_endpoint(self):
+        upload = self.upload()
+        response = self.api.post('/api/staff/predict/', {'upload_id': upload.id, 'async': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        process_job(claim_next_job('worker-1'))
+        status = self.api.get(f"/api/staff/jobs/{job_id}/").json()
+        self.assertEqual(status['status'], 'processed')
+        self.assertIn('results_url', status)
+
+
+class ModelRegistryTests(PredictionTestCase):
+    def test_preload_only_in_serving_processes(self):
+        self.assertTrue(is_serving(['/usr/bin/gunicorn', 'TeleChurn_Project.wsgi']))
+        self.assertTrue(is_serving(['/venv/lib/python3.11/site-packages/uvicorn/__main__.py', 'TeleChurn_Project.asgi:application']))
+        self.assertTrue(is_serving(['hypercorn', 'TeleChurn_Project.asgi:application'], servers=['hypercorn']))
+        self.assertTrue(is_serving(['manage.py', 'run_prediction_workers']))
+        self.assertTrue(is_serving(['manage.py', 'runserver', '--noreload']))
+        self.assertFalse(is_serving(['manage.py', 'migrate']))
+        self.assertFalse(is_serving(['/usr/bin/django-admin', 'test']))
+        self.assertFalse(is_serving(['/venv/bin/pytest', '-q']))
+        self.assertFalse(is_serving(['/venv/lib/python3.11/site-packages/pytest/__main__.py']))
+        self.assertFalse(is_serving(['benchmarks/run.py', '--sizes', '1000']))
+        self.assertFalse(is_serving(['/venv/bin/celery', '-A', 'TeleChurn_Project', 'worker']))
+        self.assertFalse(is_serving(['']))
+        with mock.patch.dict(os.environ, {'RUN_MAIN': 'true'}):
+            self.assertTrue(is_serving(['manage.py', 'runserver']))
+        with mock.patch.dict(os.environ, {'RUN_MAIN': ''}):
+            self.assertFalse(is_serving(['manage.py', 'runserver']))
+
+    def test_health_does_not_expose_paths(self):
+        response = self.client.get('/api/health/model/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('model_path', response.json())
+
+        model_registry.configure(os.path.join(self.workdir, 'missing.pkl'))
+        try:
+            response = self.client.get('/api/health/model/')
+        finally:
+            model_registry.configure(self.model_path)
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn(self.workdir, response.content.decode())
+
+    def test_failed_reload_keeps_the_loaded_model(self):
+        predictor = model_registry.get_predictor()
+        os.rename(self.model_path, self.model_path + '.moved')
+        try:
+            with self.assertRaises(ModelPredictionError):
+                model_registry.reload()
+        finally:
+            os.rename(self.model_path + '.moved', self.model_path)
+        self.assertIs(model_registry.get_predictor(), predictor)
+        self.assertIsNot(model_registry.reload(), predictor)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def probabilities(self, value, size=8):
+        return np.full(size, value, dtype=float)
+
+    def assertCached(self, cache, version, data_hash, value):
+        np.testing.assert_array_equal(cache.get(version, data_hash), self.probabilities(value))
+
+    def test_lru_evicts_the_least_recently_used(self):
+        # Room for three 64-byte entries
+        cache = LRUPredictionCache(max_bytes=3 * 64)
+        for n, data_hash in enumerate('abc'):
+            cache.set('v1', data_hash, self.probabilities(n))
+        self.assertCached(cache, 'v1', 'a', 0)
+        cache.set('v1', 'd', self.probabilities(3))
+        self.assertIsNone(cache.get('v1', 'b'))
+        for data_hash, value in (('a', 0), ('c', 2), ('d', 3)):
+            self.assertCached(cache, 'v1', data_hash, value)
+        self.assertEqual(cache.stats(), {'backend': 'lru', 'hits': 4, 'misses': 1, 'entries': 3, 'bytes': 3 * 64})
+
+        # Larger than the whole cache: not stored, nothing evicted
+        cache.set('v1', 'e', self.probabilities(4, size=100))
+        self.assertIsNone(cache.get('v1', 'e'))
+        self.assertEqual(cache.stats()['entries'], 3)
+
+    def test_lru_replaces_an_entry_and_retains_one_version(self):
+        cache = LRUPredictionCache(max_bytes=1024)
+        cache.set('v1', 'a', self.probabilities(1))
+        cache.set('v1', 'a', self.probabilities(2))
+        cache.set('v2', 'a', self.probabilities(3))
+        self.assertEqual(cache.stats()['bytes'], 2 * 64)
+        self.assertCached(cache, 'v1', 'a', 2)
+        cache.retain_version('v2')
+        self.assertIsNone(cache.get('v1', 'a'))
+        self.assertCached(cache, 'v2', 'a', 3)
+        self.assertEqual(cache.stats()['bytes'], 64)
+
+    def test_filesystem_round_trip_and_eviction(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        # An .npy file is a 128-byte header plus the data
+        cache = FileSystemPredictionCache(location, max_bytes=2 * (128 + 64))
+        cache.set('v1', 'a', self.probabilities(1))
+        cache.set('v1', 'b', self.probabilities(2))
+        self.assertCached(cache, 'v1', 'a', 1)
+        # Another process on the host sees the same entries
+        self.assertCached(FileSystemPredictionCache(location, cache.max_bytes), 'v1', 'b', 2)
+        self.assertIsNone(cache.get('v2', 'a'))
+
+        # 'b' was used least recently
+        past = time.time() - 60
+        os.utime(cache._path('v1', 'b'), (past, past))
+        cache.set('v1', 'c', self.probabilities(3))
+        self.assertIsNone(cache.get('v1', 'b'))
+        self.assertCached(cache, 'v1', 'c', 3)
+
+        cache.set('v2', 'a', self.probabilities(4))
+        cache.retain_version('v2')
+        self.assertEqual(os.listdir(location), ['v2'])
+        self.assertCached(cache, 'v2', 'a', 4)
+
+    def test_django_backend(self):
+        cache = build_cache({'BACKEND': 'django', 'MAX_BYTES': 1024})
+        self.assertIsInstance(cache, DjangoPredictionCache)
+        self.addCleanup(caches['default'].clear)
+        cache.set('v1', 'a', self.probabilities(1))
+        self.assertCached(cache, 'v1', 'a', 1)
+        self.assertIsNone(cache.get('v2', 'a'))
+        cache.set('v1', 'big', self.probabilities(1, size=1000))
+        self.assertIsNone(cache.get('v1', 'big'))
+
+    def test_build_cache(self):
+        self.assertIsNone(build_cache({'BACKEND': None}))
+        self.assertIsInstance(build_cache({'BACKEND': 'lru'}), LRUPredictionCache)
+        with self.assertRaises(ValueError):
+            build_cache({'BACKEND': 'redis'})
+
+
+class StubModel:
+    """Picklable stand-in for a classifier; returns fixed churn probabilities"""
+
+    def __init__(self, probabilities):
+        self.probabilities = np.asarray(probabilities, dtype=float)
+
+    def predict(self, features):
+        return (self.predict_proba(features)[:, 1] >= 0.5).astype(int)
+
+    def predict_proba(self, features):
+        self.features = features
+        churn = self.probabilities[:len(features)]
+        return np.column_stack([1 - churn, churn])
+
+
+class ChurnPredictorTests(SimpleTestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        self.model_path = os.path.join(self.workdir, 'model.pkl')
+        self.preprocessor_path = os.path.join(self.workdir, PREPROCESSOR_FILENAME)
+        self.write_model([0.2, 0.5, 0.7])
+        DataPreprocessor().fit(customers(50)).save(self.preprocessor_path)
+        self.frame = customers(3, start=100)
+
+    def write_model(self, probabilities):
+        with open(self.model_path, 'wb') as f:
+            pickle.dump(StubModel(probabilities), f)
+
+    def test_decision_threshold(self):
+        predictor = ChurnPredictor(self.model_path)
+        result = predictor.predict(self.frame)
+        np.testing.assert_allclose(result['probabilities'], [0.2, 0.5, 0.7])
+        self.assertEqual(result['predictions'].tolist(), [0, 1, 1])
+        self.assertEqual(predictor.predict(self.frame, threshold=0.7)['predictions'].tolist(), [0, 0, 1])
+        self.assertEqual(ChurnPredictor(self.model_path, threshold=0.6).predict(self.frame)['predictions'].tolist(), [0, 0, 1])
+        for invalid in (0, 1.5):
+            with self.assertRaises(ModelPredictionError):
+                predictor.predict(self.frame, threshold=invalid)
+            with self.assertRaises(ModelPredictionError):
+                ChurnPredictor(self.model_path, threshold=invalid)
+
+    def test_return_processed(self):
+        predictor = ChurnPredictor(self.model_path)
+        self.assertNotIn('processed_data', predictor.predict(self.frame))
+        processed = predictor.predict(self.frame, return_processed=True)['processed_data']
+        pd.testing.assert_frame_equal(processed, predictor.preprocessor.transform(self.frame))
+        # The model was given exactly those features
+        self.assertIs(predictor.model.features, processed)
+
+    def test_preprocessed_input_is_not_transformed_again(self):
+        predictor = ChurnPredictor(self.model_path)
+        features = predictor.preprocessor.transform(self.frame)
+        processed = predictor.predict(features, preprocessed=True, return_processed=True)['processed_data']
+        pd.testing.assert_frame_equal(processed, features)
+
+    def test_model_output_of_the_wrong_length(self):
+        self.write_model([0.2, 0.5])
+        with self.assertRaises(ModelPredictionError):
+            ChurnPredictor(self.model_path).predict(self.frame)
+
+    def test_version_follows_the_artifacts(self):
+        version = ChurnPredictor(self.model_path).version
+        self.assertEqual(ChurnPredictor(self.model_path).version, version)
+
+        self.write_model([0.2, 0.5, 0.8])
+        retrained = ChurnPredictor(self.model_path).version
+        self.assertNotEqual(retrained, version)
+
+        DataPreprocessor().fit(customers(50, start=50)).save(self.preprocessor_path)
+        refitted = ChurnPredictor(self.model_path).version
+        self.assertNotIn(refitted, (version, retrained))
+
+        os.remove(self.preprocessor_path)
+        self.assertNotIn(ChurnPredictor(self.model_path).version, (version, retrained, refitted))
+
+
+@override_settings(PREDICTION_RISK_THRESHOLDS={'high': 75, 'medium': 50})
+class PredictionResultsTests(SimpleTestCase):
+    def test_risk_levels_at_the_thresholds(self):
+        probabilities = [0.0, 0.4999, 0.5, 0.7499, 0.75, 1.0]
+        results = PredictionResults(probabilities, [1] * 6, [f"C{n}" for n in range(6)])
+        levels = ['Low Risk', 'Low Risk', 'Medium Risk', 'Medium Risk', 'High Risk', 'High Risk']
+        self.assertEqual([RISK_LEVELS[code] for code in results.risk_codes], levels)
+        self.assertEqual(results.to_frame()['risk_level'].tolist(), levels)
+
+        custom = PredictionResults(probabilities, [1] * 6, thresholds={'high': 50, 'medium': 0.0})
+        self.assertEqual(custom.risk_codes.tolist(), [1, 1, 2, 2, 2, 2])
+
+    def test_recommendations_follow_the_predicted_class(self):
+        results = PredictionResults([0.9, 0.9, 0.6, 0.6, 0.1], [1, 0, 1, 0, 1])
+        self.assertEqual(
+            [row['recommendation'] for row in results.to_records()],
+            ['Immediate action required', 'Regular monitoring', 'Monitor closely', 'Regular monitoring', 'Regular monitoring'],
+        )
+        self.assertEqual([row['customerID'] for row in results.to_records()], [f"ID_{n}" for n in range(5)])
+
+    def test_summary_counts(self):
+        results = PredictionResults([0.8, 0.9, 0.75, 0.2, 0.6], [1, 1, 0, 0, 1])
+        self.assertEqual(results.summary(), {
+            'total_customers': 5, 'high_risk_count': 3, 'medium_risk_count': 1, 'low_risk_count': 1,
+        })
+        # Levels nobody falls into are still reported
+        self.assertEqual(PredictionResults([0.1, 0.2], [0, 0]).summary(), {
+            'total_customers': 2, 'high_risk_count': 0, 'medium_risk_count': 0, 'low_risk_count': 2,
+        })
+
+    def test_empty_results(self):
+        results = PredictionResults([], [], [])
+        self.assertEqual(len(results), 0)
+        self.assertEqual(results.summary(), {
+            'total_customers': 0, 'high_risk_count': 0, 'medium_risk_count': 0, 'low_risk_count': 0,
+        })
+        frame = results.to_frame()
+        self.assertEqual(list(frame.columns), RESULT_COLUMNS)
+        self.assertEqual(len(frame), 0)
+        self.assertEqual(results.to_records(), [])
+        self.assertEqual(len(PredictionResults.from_frame(frame)), 0)
+
+    def test_frame_round_trip(self):
+        results = PredictionResults([0.8, 0.55, 0.1], [1, 1, 0], ['A', 'B', 'C'])
+        restored = PredictionResults.from_frame(results.to_frame())
+        np.testing.assert_allclose(restored.probabilities, results.probabilities)
+        self.assertEqual(restored.to_records(), results.to_records())
+        self.assertEqual(results.to_records()[0], {
+            'predicted_class': 'Churn Risk', 'churn_probability': '80.0%', 'risk_level': 'High Risk',
+            'recommendation': 'Immediate action required', 'customerID': 'A',
+        })
+
+
+class UploadDeduplicationTests(PredictionTestCase):
+    def test_reupload_by_the_same_staff_member_reuses_the_data(self):
+        upload = self.upload()
+        response = self.api.post('/api/staff/upload/', {'sha256': upload.content_hash, 'filename': 'again.csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['deduplicated'])
+        self.assertEqual(UploadedDataset.objects.get(id=response.json()['upload_id']).data_file, upload.data_file)
+
+    def test_uploads_of_other_staff_are_not_matched(self):
+        upload = self.upload()
+        make_staff(staff_id='s2')
+        colleague = self.client_for(self.login('s2')['token'])
+
+        response = colleague.get('/api/staff/upload/exists/', {'sha256': upload.content_hash})
+        self.assertEqual(response.json(), {'exists': False})
+        response = colleague.post('/api/staff/upload/', {'sha256': upload.content_hash, 'filename': 'theirs.csv'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(UploadedDataset.objects.count(), 1)
+
+
+
+class ScoreViewTests(PredictionTestCase):
+    def score(self, body):
+        return self.api.post('/api/staff/score/', body, content_type='application/json')
+
+    def test_scores_one_or_more_records(self):
+        response = self.score(customer(1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+        response = self.score([customer(n) for n in range(3)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['customerID'] for r in response.json()['results']], ['0000-TEST', '0001-TEST', '0002-TEST'])
+        self.assertEqual(response.json()['summary']['total_customers'], 3)
+
+    def test_matches_the_batch_predictor(self):
+        records = [customer(n) for n in range(5)]
+        expected = model_registry.get_predictor().predict(pd.DataFrame(records))['probabilities']
+        results = self.score({'records': records}).json()['results']
+        self.assertEqual([r['churn_probability'] for r in results], [format_probability(p * 100) for p in expected])
+
+    def test_threshold(self):
+        low = self.score({'records': [customer(1)], 'threshold': 0.01}).json()['results'][0]
+        self.assertEqual(low['predicted_class'], 'Churn Risk')
+        for threshold in (0, 1.5, 'high'):
+            self.assertEqual(self.score({'records': [customer(1)], 'threshold': threshold}).status_code, 400)
+
+    def test_rejects_malformed_bodies(self):
+        for body in ([], {'records': []}, {'records': {}}, [customer(1), 'x']):
+            self.assertEqual(self.score(body).status_code, 400, body)
+        with self.settings(SCORING_MAX_RECORDS=2):
+            self.assertEqual(self.score([customer(n) for n in range(3)]).status_code, 400)
+
+    def test_reports_missing_fields(self):
+        record = customer(1)
+        del record['tenure']
+        response = self.score([customer(0), record])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['missing'], {'1': ['tenure']})
+
+    def test_micro_batched_scoring_gives_the_same_results(self):
+        records = [customer(n) for n in range(4)]
+        direct = self.score(records).json()
+        with self.settings(SCORING_MICRO_BATCH=True):
+            batched = self.score(records).json()
+        self.assertEqual(batched, direct)
+
+
+class GatedPredictor:
+    """
+    Wraps a predictor; the first call waits until released, so later requests
+    queue up. Batches containing a record with a 'fail' key raise.
+    """
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.threshold = predictor.threshold
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def predict_records(self, records, threshold=None):
+        self.calls.append(len(records))
+        self.entered.set()
+        self.release.wait(5)
+        if any('fail' in record for record in records):
+            raise ModelPredictionError("Bad record")
+        return self.predictor.predict_records(records, threshold)
+
+
+class MicroBatcherTests(PredictionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.predictor = model_registry.get_predictor()
+        self.gated = GatedPredictor(self.predictor)
+        self.batcher = MicroBatcher(lambda: self.gated, max_batch_size=64, max_wait_ms=0)
+        self.addCleanup(self.batcher.close)
+
+    def score_concurrently(self, requests):
+        """Score (records, threshold) pairs; all but the first are queued while the first is scored"""
+        with ThreadPoolExecutor(len(requests)) as pool:
+            futures = [pool.submit(self.batcher.predict_records, *requests[0])]
+            self.gated.entered.wait(5)
+            futures += [pool.submit(self.batcher.predict_records, *request) for request in requests[1:]]
+            while self.batcher._queue.qsize() < len(requests) - 1:
+                time.sleep(0.001)
+            self.gated.release.set()
+            return [future.exception(5) or future.result() for future in futures]
+
+    def test_queued_requests_share_one_model_call(self):
+        requests = [([customer(0)], None), ([customer(1), customer(2)], None), ([customer(3)], 0.01)]
+        results = self.score_concurrently(requests)
+        self.assertEqual(self.gated.calls, [1, 3])
+        for (records, threshold), result in zip(requests, results):
+            expected = self.predictor.predict_records(records, threshold)
+            np.testing.assert_allclose(result['probabilities'], expected['probabilities'])
+            np.testing.assert_array_equal(result['predictions'], expected['predictions'])
+        self.assertEqual(results[2]['predictions'].tolist(), [1])
+        self.assertEqual(self.batcher.metrics()['batches'], 2)
+
+    def test_a_bad_request_does_not_fail_its_batch(self):
+        bad = dict(customer(2), fail=True)
+        results = self.score_concurrently([([customer(0)], None), ([customer(1)], None), ([bad], None)])
+        self.assertEqual(self.gated.calls, [1, 2, 1, 1])
+        self.assertEqual(len(results[1]['probabilities']), 1)
+        self.assertIsInstance(results[2], ModelPredictionError)
+
+
+class DatasetStorageTests(PredictionTestCase):
+    def test_rows_are_stored_in_columnar_files(self):
+        frame = customers(20)
+        frame.loc[3, 'MonthlyCharges'] = None
+        upload = self.upload_frame(frame)
+        self.assertEqual(upload.data, {})
+        self.assertTrue(os.path.exists(storage.absolute_path(upload.data_file)))
+        self.assertEqual((upload.row_count, len(upload.read_data())), (19, 19))
+        self.assertEqual(upload.columns, [c for c in frame.columns if c != 'customerID'])
+        # The row dropped for its missing value takes its customer ID with it
+        self.assertEqual(upload.read_customer_ids(), [customer(n)['customerID'] for n in range(20) if n != 3])
+
+    def test_results_are_stored_next_to_the_data(self):
+        upload = self.upload(10)
+        self.api.post('/api/staff/predict/', {'upload_id': upload.id}, content_type='application/json')
+        upload.refresh_from_db()
+        self.assertEqual(len(upload.read_results()), 10)
+        self.assertEqual(upload.read_results(columns=['customerID'])['customerID'].tolist(), upload.read_customer_ids())
+
+    def test_files_are_deleted_with_their_last_upload(self):
+        first = self.upload(10)
+        second = self.upload(10)  # identical file, shares the stored data
+        path = storage.absolute_path(first.data_file)
+        self.assertEqual(second.data_file, first.data_file)
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+
+
+def make_legacy_staff(apps):
+    """A staff member created through the historical models of a migration state"""
+    client = apps.get_model('clients', 'Client').objects.create(
+        company_id=1, company_name='Client 1', company_address='-', company_contact_no='0',
+        company_email='client1@example.com', password='-',
+    )
+    return apps.get_model('clients', 'Staff').objects.create(
+        staff_id='s1', client=client, name='s1', email='s1@example.com', password='-',
+    )
+
+
+class ColumnarStorageMigrationTests(TransactionTestCase):
+    clients = ('clients', '0009_feedbackrollup')
+    before = [('api', '0003_remove_uploadeddataset_user_uploadeddataset_status_and_more'), clients]
+    after = [('api', '0004_uploadeddataset_columnar_storage'), clients]
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        storage_root = override_settings(DATASET_STORAGE_ROOT=self.workdir)
+        storage_root.enable()
+        self.addCleanup(storage_root.disable)
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_json_data_moves_to_files(self):
+        apps = self.migrate(self.before)
+        staff = make_legacy_staff(apps)
+        UploadedDataset = apps.get_model('api', 'UploadedDataset')
+        rows = [{'tenure': 1.0}, {'tenure': 2.0}]
+        aligned = UploadedDataset.objects.create(staff=staff, filename='a.csv', data={
+            'processed_data': rows, 'customer_ids': ['A', 'B'],
+        })
+        misaligned = UploadedDataset.objects.create(staff=staff, filename='b.csv', data={
+            'processed_data': rows, 'customer_ids': ['A', 'B', 'C'],
+        })
+
+        UploadedDataset = self.migrate(self.after).get_model('api', 'UploadedDataset')
+        aligned = UploadedDataset.objects.get(id=aligned.id)
+        self.assertEqual((aligned.data, aligned.row_count, aligned.has_customer_ids), ({}, 2, True))
+        self.assertEqual(storage.read_frame(aligned.data_file)[storage.CUSTOMER_ID_COLUMN].tolist(), ['A', 'B'])
+        # Which rows the IDs belonged to is unknown, so none are kept
+        misaligned = UploadedDataset.objects.get(id=misaligned.id)
+        self.assertEqual((misaligned.row_count, misaligned.has_customer_ids), (2, False))
+        self.assertNotIn(storage.CUSTOMER_ID_COLUMN, storage.read_frame(misaligned.data_file).columns)
+
+
+
+class StreamingIngestionTests(PredictionTestCase):
+    def assertSameStoredData(self, frame):
+        in_memory = self.upload_frame(frame, mode='memory')
+        with self.settings(UPLOAD_CHUNK_ROWS=7):
+            streamed = self.upload_frame(frame, mode='stream')
+        self.assertEqual(streamed.columns, in_memory.columns)
+        self.assertEqual(streamed.read_customer_ids(), in_memory.read_customer_ids())
+        pd.testing.assert_frame_equal(streamed.read_data(), in_memory.read_data(), check_dtype=False)
+
+    def test_streaming_matches_in_memory_ingestion(self):
+        frame = customers(40, start=1)
+        frame.loc[[5, 30], 'MonthlyCharges'] = None
+        self.assertSameStoredData(frame)
+
+    def test_column_found_to_be_text_in_a_later_chunk(self):
+        # Customer 73 is the first with a blank TotalCharges, well past the first chunk
+        frame = customers(80, start=1)
+        self.assertSameStoredData(frame)
+
+    def test_file_without_rows(self):
+        response = self.api.post('/api/staff/upload/', {
+            'file': SimpleUploadedFile('empty.csv', b'', 'text/csv'), 'mode': 'stream',
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class UploadScoringTests(PredictionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.predictor = model_registry.get_predictor()
+        self.frame = customers(30, start=1)
+        self.frame.loc[[4, 12], 'MonthlyCharges'] = None
+        # Uploads drop rows with missing values before scoring
+        self.expected = self.predictor.predict(self.frame.dropna().drop(columns=['customerID']))
+
+    def assertScoredLikeTheRawCsv(self, upload):
+        results = run_prediction(upload, self.predictor)
+        np.testing.assert_allclose(results.probabilities, self.expected['probabilities'] * 100)
+        np.testing.assert_array_equal(results.predictions, self.expected['predictions'])
+
+    def test_upload_is_scored_like_the_raw_csv(self):
+        self.assertScoredLikeTheRawCsv(self.upload_frame(self.frame, mode='memory'))
+
+    def test_streamed_upload_is_scored_like_the_raw_csv(self):
+        with self.settings(UPLOAD_CHUNK_ROWS=7):
+            self.assertScoredLikeTheRawCsv(self.upload_frame(self.frame, mode='stream'))
+
+    def test_legacy_preprocessed_upload_is_not_transformed_again(self):
+        raw = self.frame.dropna().reset_index(drop=True)
+        ids = raw.pop('customerID').tolist()
+        upload = UploadedDataset(staff=self.staff, filename='legacy.csv', raw_features=False)
+        upload.store_data(self.predictor.preprocessor.transform(raw), ids)
+        upload.save()
+        self.assertScoredLikeTheRawCsv(upload)
+
+    def test_new_model_version_misses_the_prediction_cache(self):
+        upload = self.upload_frame(self.frame)
+        cache = LRUPredictionCache(max_bytes=1024 * 1024)
+        retrained = copy.copy(self.predictor)
+        retrained.version = 'retrained'
+        with mock.patch('api.prediction.get_prediction_cache', return_value=cache), \
+                mock.patch.object(ChurnPredictor, 'predict', autospec=True, side_effect=ChurnPredictor.predict) as predict:
+            run_prediction(upload, self.predictor)
+            run_prediction(UploadedDataset.objects.get(id=upload.id), self.predictor)
+            self.assertEqual((predict.call_count, cache.hits), (1, 0))
+            # Stored results are keyed by model version too, so the cache is consulted
+            UploadedDataset.objects.filter(id=upload.id).update(results_key='')
+            run_prediction(UploadedDataset.objects.get(id=upload.id), self.predictor)
+            self.assertEqual((predict.call_count, cache.hits), (1, 1))
+            run_prediction(UploadedDataset.objects.get(id=upload.id), retrained)
+            self.assertEqual((predict.call_count, cache.misses), (2, 2))
+
+
+class PreprocessorArtifactTests(TestCase):
+    def test_save_and_load_round_trip(self):
+        training = customers(200)
+        fitted = DataPreprocessor().fit(training)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, PREPROCESSOR_FILENAME)
+            fitted.save(path)
+            loaded = DataPreprocessor.load(path)
+        self.assertTrue(loaded.is_fitted)
+        self.assertEqual(loaded.to_dict(), fitted.to_dict())
+        batch = customers(20, start=300)
+        pd.testing.assert_frame_equal(loaded.transform(batch), fitted.transform(batch))
+
+
+class HistoryListTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        moments = [datetime(2026, 1, day, 12, tzinfo=timezone.utc) for day in (1, 2, 2, 2, 3)]
+        self.uploads = []
+        for n, moment in enumerate(moments):
+            upload = UploadedDataset.objects.create(staff=self.staff, filename=f"{n}.csv", status='processed' if n % 2 else 'pending')
+            UploadedDataset.objects.filter(id=upload.id).update(upload_date=moment)
+            self.uploads.append(upload.id)
+        # Newest first, the higher id first within the same moment
+        self.expected = [self.uploads[4], self.uploads[3], self.uploads[2], self.uploads[1], self.uploads[0]]
+        UploadedDataset.objects.create(staff=make_staff(staff_id='s2'), filename='other.csv')
+
+    def ids(self, rows):
+        return [row['id'] for row in rows]
+
+    def test_cursor_pages_cover_every_upload_once(self):
+        seen = []
+        params = {'limit': 2}
+        while True:
+            page = self.api.get('/api/staff/history/', params).json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen += self.ids(page['results'])
+            if not page['next_cursor']:
+                break
+            params = {'limit': 2, 'cursor': page['next_cursor']}
+        self.assertEqual(seen, self.expected)
+
+    def test_unpaged_list_and_filters(self):
+        self.assertEqual(self.ids(self.api.get('/api/staff/history/').json()), self.expected)
+        processed = self.api.get('/api/staff/history/', {'status': 'processed'}).json()
+        self.assertEqual(self.ids(processed), [self.uploads[3], self.uploads[1]])
+        # A bare date_to includes that whole day
+        until = self.api.get('/api/staff/history/', {'date_from': '2026-01-02', 'date_to': '2026-01-02'}).json()
+        self.assertEqual(self.ids(until), self.expected[1:4])
+        self.assertEqual(set(processed[0]), {'id', 'filename', 'upload_date', 'status'})
+
+    def test_invalid_parameters(self):
+        for params in ({'cursor': 'garbage'}, {'limit': 'x'}, {'date_from': 'yesterday'}):
+            self.assertEqual(self.api.get('/api/staff/history/', params).status_code, 400, params)
+
+
+class HistoryDetailTests(PredictionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload_row = self.upload(30)
+        self.api.post('/api/staff/predict/', {'upload_id': self.upload_row.id}, content_type='application/json')
+        self.upload_row.refresh_from_db()
+        self.results = self.upload_row.read_results()
+        self.url = f"/api/staff/history/{self.upload_row.id}/"
+
+    def test_full_detail(self):
+        data = self.api.get(self.url).json()['data']
+        self.assertEqual([len(data[field]) for field in ('processed_data', 'customer_ids', 'predictions')], [30, 30, 30])
+
+    def test_sorted_cursor_pages(self):
+        rows = []
+        params = {'sort': '-probability', 'limit': 7}
+        while True:
+            body = self.api.get(self.url, params).json()
+            self.assertEqual(body['page']['total'], 30)
+            self.assertEqual(body['data']['customer_ids'],
+                             [customer(row)['customerID'] for row in body['page']['rows']])
+            rows += body['page']['rows']
+            if not body['page']['next_cursor']:
+                break
+            params = {'sort': '-probability', 'limit': 7, 'cursor': body['page']['next_cursor']}
+        probabilities = self.results['churn_probability'].to_numpy()
+        self.assertEqual(sorted(rows), list(range(30)))
+        self.assertTrue((np.diff(probabilities[rows]) <= 0).all())
+
+    def test_filters_and_fields(self):
+        expected = self.results.index[self.results['risk_level'] == 'Low Risk'].tolist()
+        body = self.api.get(self.url, {'risk_level': 'Low Risk', 'fields': 'predictions', 'limit': 500}).json()
+        self.assertEqual(body['page']['rows'], expected)
+        self.assertEqual(set(body['data']), {'predictions'})
+        self.assertTrue(all(row['risk_level'] == 'Low Risk' for row in body['data']['predictions']))
+
+    def test_offset_pages(self):
+        body = self.api.get(self.url, {'offset': 25, 'limit': 10}).json()
+        self.assertEqual(body['page']['rows'], list(range(25, 30)))
+        self.assertIsNone(body['page']['next_cursor'])
+
+    def test_invalid_parameters(self):
+        for params in ({'sort': 'tenure'}, {'fields': 'everything'}, {'cursor': 'garbage'}, {'offset': -1}):
+            self.assertEqual(self.api.get(self.url, params).status_code, 400, params)
+        unscored = self.upload(5, start=100)
+        response = self.api.get(f"/api/staff/history/{unscored.id}/", {'sort': 'probability'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTestCase(PredictionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload_row = self.upload(25)
+        self.api.post('/api/staff/predict/', {'upload_id': self.upload_row.id}, content_type='application/json')
+        self.upload_row.refresh_from_db()
+        self.url = f"/api/staff/export/{self.upload_row.id}/"
+
+    def export(self, **params):
+        response = self.api.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+
+class CsvExportTests(ExportTestCase):
+    def test_csv_rows_match_the_results(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="predictions_{self.upload_row.id}.csv"')
+        frame = pd.read_csv(BytesIO(body))
+        self.assertEqual(list(frame.columns), ['Customer ID', 'Predicted Class', 'Churn Probability', 'Risk Level', 'Recommendation'])
+        results = self.upload_row.read_results()
+        self.assertEqual(frame['Customer ID'].tolist(), results['customerID'].tolist())
+        self.assertEqual(frame['Churn Probability'].tolist(), [format_probability(p) for p in results['churn_probability']])
+
+    def test_chunks_join_to_the_same_file(self):
+        _, body = self.export()
+        self.assertEqual(b''.join(iter_csv(self.upload_row, chunk_rows=4)), body)
+
+    def test_gzip(self):
+        _, body = self.export()
+        response, download = self.export(compress='gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(download), body)
+
+        response = self.api.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), body)
+
+    def test_errors(self):
+        unscored = self.upload(5, start=100)
+        self.assertEqual(self.api.get(f"/api/staff/export/{unscored.id}/").status_code, 400)
+        self.assertEqual(self.api.get(self.url, {'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.api.get('/api/staff/export/999999/').status_code, 404)
+
+
+class TypedExportTests(ExportTestCase):
+    def expected(self):
+        results = self.upload_row.read_results()
+        return results['customerID'].tolist(), (results['churn_probability'] / 100).tolist()
+
+    def assertTyped(self, table):
+        self.assertEqual(table.schema.names, EXPORT_SCHEMA.names)
+        self.assertEqual(table.schema.field('churn_probability').type, pa.float64())
+        # Parquet widens the dictionary indices, so only the kind of type is compared
+        self.assertTrue(pa.types.is_dictionary(table.schema.field('risk_level').type))
+        customer_ids, probabilities = self.expected()
+        self.assertEqual(table.column('customerID').to_pylist(), customer_ids)
+        np.testing.assert_allclose(table.column('churn_probability').to_pylist(), probabilities)
+
+    def test_parquet(self):
+        response, body = self.export(format='parquet')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        self.assertTyped(pq.read_table(pa.BufferReader(body)))
+
+    def test_arrow_written_in_several_batches(self):
+        _, body = self.export(format='arrow')
+        self.assertTyped(pa.ipc.open_file(pa.BufferReader(body)).read_all())
+        chunked = b''.join(iter_arrow(self.upload_row, chunk_rows=4))
+        reader = pa.ipc.open_file(pa.BufferReader(chunked))
+        self.assertEqual(reader.num_record_batches, 7)
+        self.assertTyped(reader.read_all())
+
+    def test_ndjson(self):
+        _, body = self.export(format='ndjson')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        customer_ids, probabilities = self.expected()
+        self.assertEqual([row['customerID'] for row in rows], customer_ids)
+        np.testing.assert_allclose([row['churn_probability'] for row in rows], probabilities)
+        self.assertIn(rows[0]['risk_level'], RISK_LEVELS)
+        self.assertEqual(b''.join(iter_ndjson(self.upload_row, chunk_rows=4)), body)
@@ -0,0 +1,237 @@
+"""
+Access and refresh tokens for staff and client logins.
+
+Logins verify the password once and return a short-lived access token plus
+a longer-lived refresh token. POST /api/auth/refresh/ exchanges a refresh
+token for a new pair without checking the password again, so clients never
+need to log in just because their access token expired.
+
+Revoked tokens are denylisted by jti in the RevokedToken table. Lookups are
+cached in the cache shared by all processes (see TeleChurn_Project.caching),
+so a revocation takes effect everywhere at once. Without a shared cache, each
+process remembers "not revoked" answers for AUTH_REVOCATION_CHECK_TTL seconds
+and forgets them when it revokes the token itself. Expired rows are removed by
+`python manage.py purge_revoked_tokens`.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import jwt
+from django.conf import settings
+
+from clients.models import Client, Staff
+from TeleChurn_Project.caching import shared_cache
+from .models import RevokedToken
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+# Claim holding the principal's primary key, per kind
+ID_CLAIMS = {'staff': 'staff_id', 'client': 'company_id'}
+
+
+def _encode(claims, token_type, lifetime):
+    now = datetime.now(timezone.utc)
+    payload = {
+        **claims,
+        'type': token_type,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + lifetime,
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def issue_tokens(kind, claims):
+    """
+    Create an access/refresh token pair.
+
+    Args:
+        kind (str): 'staff' or 'client'
+        claims (dict): Public claims of the principal; must include its ID claim
+
+    Returns:
+        dict: token (access), refresh and expires_in (seconds)
+    """
+    id_claim = ID_CLAIMS[kind]
+    access_lifetime = settings.AUTH_ACCESS_TOKEN_LIFETIME
+    return {
+        'token': _encode(claims, ACCESS, access_lifetime),
+        'refresh': _encode({'kind': kind, id_claim: claims[id_claim]}, REFRESH,
+                           settings.AUTH_REFRESH_TOKEN_LIFETIME),
+        'expires_in': int(access_lifetime.total_seconds()),
+    }
+
+
+def load_claims(kind, pk):
+    """
+    Build the public claims of a staff member or client from the database.
+
+    Raises:
+        jwt.InvalidTokenError: If kind is unknown
+        Staff.DoesNotExist / Client.DoesNotExist: If the principal is gone
+    """
+    if kind == 'staff':
+        staff = Staff.objects.select_related('client').get(staff_id=pk)
+        return {
+            'staff_id': staff.staff_id,
+            'client_id': staff.client.company_id,
+            'name': staff.name,
+            'email': staff.email,
+        }
+    if kind == 'client':
+        client = Client.objects.get(company_id=pk)
+        return {
+            'company_id': client.company_id,
+            'company_name': client.company_name,
+            'company_email': client.company_email,
+        }
+    raise jwt.InvalidTokenError(f"Unknown principal kind: {kind}")
+
+
+def decode_token(token, token_type=ACCESS):
+    """
+    Verify a token's signature, expiry, type and revocation.
+
+    Returns:
+        dict: The token payload
+
+    Raises:
+        jwt.InvalidTokenError: If the token is invalid, expired, of the wrong
+            type or revoked
+    """
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'],
+                         options={'require': ['exp', 'jti']})
+    if payload.get('type') != token_type:
+        raise jwt.InvalidTokenError(f"Expected a {token_type} token")
+    if is_revoked(payload['jti']):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return payload
+
+
+class NotRevokedCache:
+    """
+    Per-process record of jtis recently found not to be revoked.
+
+    Only negative answers are kept, and only briefly: a token revoked by
+    another process is accepted here for at most ttl seconds.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        with self._lock:
+            expires = self._expiry.get(jti)
+            if expires is not None and expires <= time.monotonic():
+                del self._expiry[jti]
+                expires = None
+            return expires is not None
+
+    def add(self, jti):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            if len(self._expiry) >= self.max_size:
+                now = time.monotonic()
+                self._expiry = {k: v for k, v in self._expiry.items() if v > now}
+                if len(self._expiry) >= self.max_size:
+                    # Oldest first, as dicts keep insertion order
+                    del self._expiry[next(iter(self._expiry))]
+            self._expiry[jti] = time.monotonic() + self.ttl
+
+    def discard(self, jti):
+        with self._lock:
+            self._expiry.pop(jti, None)
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+
+
+not_revoked = NotRevokedCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_REVOCATION_CHECK_TTL)
+
+
+def _cache_key(jti):
+    return f"revoked-token:{jti}"
+
+
+def is_revoked(jti):
+    cache = shared_cache()
+    if cache is None:
+        # A per-process cache only remembers "not revoked", and only briefly,
+        # so tokens revoked elsewhere stop working soon after
+        if jti in not_revoked:
+            return False
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        if not revoked:
+            not_revoked.add(jti)
+        return revoked
+    revoked = cache.get(_cache_key(jti))
+    if revoked is None:
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        cache.set(_cache_key(jti), revoked, settings.AUTH_TOKEN_CACHE_TTL)
+    return revoked
+
+
+def revoke(payload):
+    """
+    Denylist a decoded token until it expires.
+
+    Returns:
+        bool: False if the token had already been revoked
+    """
+    expires_at = datetime.fromtimestamp(payload['exp'], tz=timezone.utc)
+    _, created = RevokedToken.objects.get_or_create(
+        jti=payload['jti'],
+        defaults={'token_type': payload.get('type', ''), 'expires_at': expires_at},
+    )
+    not_revoked.discard(payload['jti'])
+    cache = shared_cache()
+    if cache is not None:
+        cache.set(_cache_key(payload['jti']), True, settings.AUTH_TOKEN_CACHE_TTL)
+    return created
+
+
+def purge_expired():
+    """
+    Delete denylist entries of tokens that have expired anyway.
+
+    Returns:
+        int: Number of entries deleted
+    """
+    deleted, _ = RevokedToken.objects.filter(expires_at__lt=datetime.now(timezone.utc)).delete()
+    return deleted
+
+
+def refresh_tokens(refresh_token):
+    """
+    Exchange a refresh token for a new token pair (rotation).
+
+    The old refresh token is revoked, so each one can be used only once.
+
+    Returns:
+        tuple: (kind, claims, tokens)
+
+    Raises:
+        jwt.InvalidTokenError: If the refresh token is invalid, expired or
+            already used
+        Staff.DoesNotExist / Client.DoesNotExist: If the principal is gone
+    """
+    payload = decode_token(refresh_token, REFRESH)
+    kind = payload.get('kind')
+    claims = load_claims(kind, payload.get(ID_CLAIMS.get(kind)))
+    if not revoke(payload):
+        # Lost a race with a concurrent refresh using the same token
+        raise jwt.InvalidTokenError("Token has been revoked")
+    logger.info(f"Refreshed {kind} tokens for {claims[ID_CLAIMS[kind]]}")
+    return kind, claims, issue_tokens(kind, claims)
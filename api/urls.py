@@ -1,8 +1,10 @@
 from django.urls import path
 from .views import (
     RegisterView, DataUploadView, PredictView,
-    HistoryListView, HistoryDetailView, ExportResultsView,
-    staff_register, staff_login, client_login, login_info, client_add_staff
+    HistoryListView, HistoryDetailView, ExportResultsView, ModelHealthView,
+    PredictionJobStatusView, ScoreView, UploadExistsView,
+    staff_register, staff_login, client_login, login_info, client_add_staff,
+    token_refresh, token_logout
 )
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -16,12 +18,18 @@ urlpatterns = [
     path('staff/register/', staff_register, name='staff-register'),
     path('staff/login/', staff_login, name='staff-login'),
     path('staff/upload/', DataUploadView.as_view(), name='staff-upload'),
+    path('staff/upload/exists/', UploadExistsView.as_view(), name='staff-upload-exists'),
     path('staff/predict/', PredictView.as_view(), name='staff-predict'),
+    path('staff/score/', ScoreView.as_view(), name='staff-score'),
+    path('staff/jobs/<int:job_id>/', PredictionJobStatusView.as_view(), name='staff-job-status'),
     path('staff/history/', HistoryListView.as_view(), name='staff-history-list'),
     path('staff/history/<int:id>/', HistoryDetailView.as_view(), name='staff-history-detail'),
     path('staff/export/<int:upload_id>/', ExportResultsView.as_view(), name='staff-export'),
     
     # Common endpoints
     path('login-info/', login_info, name='login-info'),
+    path('health/model/', ModelHealthView.as_view(), name='model-health'),
+    path('auth/refresh/', token_refresh, name='auth-refresh'),
+    path('auth/logout/', token_logout, name='auth-logout'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
 ] 
\ No newline at end of file
@@ -12,18 +12,34 @@ import pandas as pd
 import os
 import logging
 from ml_utils.predictor import ChurnPredictor, ModelPredictionError
+from ml_utils.registry import model_registry
 from ml_utils.preprocessor import DataPreprocessingError
-from .models import UploadedDataset
+from .models import UploadedDataset, PredictionJob
+from .cache import get_prediction_cache
+from .export import EXPORT_FORMATS, EXPORT_WRITERS, gzip_stream, log_stream_errors
+from .jobs import enqueue_prediction, job_status
+from .prediction import frame_to_records, get_score_batcher, run_prediction, score_records
+from . import storage
+from .ingest import DataIngestionError, ingest_csv, ingest_csv_streaming, stored_preview
+from .storage import DatasetStorageError
+from .pagination import PaginationError, decode_cursor, encode_cursor, parse_limit, parse_offset
+from .results import DETAIL_FIELDS, read_page, select_rows
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from clients.models import Client, Subscription, Staff
+from clients.models import Client, ClientCounters, Subscription, Staff, StaffLimitError
 from django.contrib.auth.hashers import make_password, check_password
-from django.http import HttpResponse
-import csv
-from datetime import datetime
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from datetime import datetime, time
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 import jwt
 from django.conf import settings
-from .authentication import StaffJWTAuthentication
+from .authentication import StaffJWTAuthentication, get_token_principal, token_cache
+from TeleChurn_Project.database import ReplicaReadMixin
+from .tokens import ACCESS, REFRESH, decode_token, issue_tokens, refresh_tokens, revoke
 from rest_framework.authentication import BaseAuthentication
+from rest_framework.negotiation import DefaultContentNegotiation
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -94,88 +110,135 @@ class MyTokenObtainPairView(TokenObtainPairView):
 class DataUploadView(APIView):
     authentication_classes = [StaffJWTAuthentication]
     permission_classes = [IsAuthenticated]
-    parser_classes = (MultiPartParser, FormParser)
+    parser_classes = (MultiPartParser, FormParser, JSONParser)
 
     def post(self, request, format=None):
+        """
+        Store an uploaded CSV.
+        Files identical to an earlier upload of the same staff member (by
+        SHA-256) reuse its stored data instead of being parsed again. Clients that
+        already know the hash can send { "sha256": <hex>, "filename": <name> }
+        instead of the file.
+        """
         try:
             file_obj = request.FILES.get('file')
-            if not file_obj:
+            content_hash = str(request.data.get('sha256') or '').lower()
+            if not file_obj and not content_hash:
                 return Response({'error': 'No file provided.'}, status=status.HTTP_400_BAD_REQUEST)
+            if file_obj:
+                content_hash = storage.content_hash(file_obj)
+            
+            duplicate = UploadedDataset.find_duplicate(request.user, content_hash)
+            if duplicate is not None:
+                filename = file_obj.name if file_obj else request.data.get('filename') or duplicate.filename
+                return self._reuse_upload(request, duplicate, filename)
+            if not file_obj:
+                return Response({'error': 'No upload with this hash; send the file.'}, status=status.HTTP_404_NOT_FOUND)
+            
             try:
-                df = pd.read_csv(file_obj)
-            except Exception as e:
-                logger.error(f"Error reading CSV: {str(e)}")
-                return Response({'error': f'Error reading CSV: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
-            try:
-                # Store customerID separately if it exists
-                customer_ids = None
-                if 'customerID' in df.columns:
-                    customer_ids = df['customerID'].tolist()
-                    df = df.drop(columns=['customerID'])
-
-                # Preprocess the remaining data
-                df = df.dropna()
-                for col in df.select_dtypes(include=['object']).columns:
-                    df[col] = df[col].astype('category').cat.codes
-                for col in df.select_dtypes(include=['float64', 'int64']).columns:
-                    df[col] = (df[col] - df[col].mean()) / df[col].std()
-
-                # Create preview with original customerID if available
-                preview_data = df.head(5).to_dict(orient='records')
-                if customer_ids is not None:
-                    preview = []
-                    for i, row in enumerate(preview_data):
-                        preview.append({
-                            'customerID': customer_ids[i],
-                            **row
-                        })
+                if self._use_streaming(request, file_obj):
+                    logger.info(f"Streaming upload {file_obj.name} ({file_obj.size} bytes)")
+                    ingested = ingest_csv_streaming(file_obj, settings.UPLOAD_CHUNK_ROWS)
                 else:
-                    preview = preview_data
-
-            except Exception as e:
-                logger.error(f"Error preprocessing data: {str(e)}")
-                return Response({'error': f'Error preprocessing data: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+                    ingested = ingest_csv(file_obj)
+            except DataIngestionError as e:
+                logger.error(str(e))
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except DatasetStorageError as e:
+                logger.error(f"Error saving uploaded dataset: {str(e)}")
+                return Response({'error': f'Error saving uploaded dataset: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             try:
-                # Log the data being saved
-                logger.info(f"Data being saved: {df.to_dict(orient='records')}")
+                # Rows are already in columnar storage; the database only keeps metadata
                 entry = UploadedDataset.objects.create(
                     staff=request.user,  # Link to staff
                     filename=file_obj.name,
-                    data={
-                        'processed_data': df.to_dict(orient='records'),
-                        'customer_ids': customer_ids
-                    }
+                    content_hash=content_hash,
+                    data_file=ingested['data_file'],
+                    row_count=ingested['row_count'],
+                    columns=ingested['columns'],
+                    has_customer_ids=ingested['has_customer_ids'],
                 )
-                logger.info(f"Saved upload: id={entry.id}, staff={request.user}, filename={file_obj.name}")
+                logger.info(f"Saved upload: id={entry.id}, staff={request.user}, filename={file_obj.name}, rows={entry.row_count}")
             except Exception as e:
+                storage.delete_file(ingested['data_file'])
                 logger.error(f"Error saving uploaded dataset: {str(e)}")
                 return Response({'error': f'Error saving uploaded dataset: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             return Response({
                 'upload_id': entry.id,
-                'preview': preview, 
-                'columns': list(df.columns),
-                'total_rows': len(df),
+                'preview': ingested['preview'], 
+                'columns': ingested['columns'],
+                'total_rows': ingested['row_count'],
                 'filename': file_obj.name,
-                'has_customer_ids': customer_ids is not None
+                'has_customer_ids': ingested['has_customer_ids'],
+                'sha256': content_hash,
+                'deduplicated': False
             }, status=status.HTTP_200_OK)
         except Exception as e:
             logger.error(f"Unexpected error in upload: {str(e)}")
             return Response({'error': f'Unexpected error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _reuse_upload(self, request, duplicate, filename):
+        """Create an upload sharing the stored data (and current predictions) of an identical one"""
+        try:
+            preview = stored_preview(duplicate.data_file, duplicate.columns, duplicate.has_customer_ids)
+        except DatasetStorageError as e:
+            logger.error(f"Error reading stored dataset: {str(e)}")
+            return Response({'error': f'Error reading stored dataset: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        entry = UploadedDataset(staff=request.user, filename=filename)
+        entry.reuse_stored_data(duplicate, model_version=model_registry.version)
+        entry.save()
+        logger.info(f"Saved upload: id={entry.id}, staff={request.user}, filename={filename}, reusing upload {duplicate.id}")
+        return Response({
+            'upload_id': entry.id,
+            'preview': preview,
+            'columns': entry.columns,
+            'total_rows': entry.row_count,
+            'filename': filename,
+            'has_customer_ids': entry.has_customer_ids,
+            'sha256': entry.content_hash,
+            'deduplicated': True,
+            'status': entry.status
+        }, status=status.HTTP_200_OK)
+
+    def _use_streaming(self, request, file_obj):
+        """Stream large files, or any file when the client asks for mode=stream"""
+        mode = request.query_params.get('mode') or request.data.get('mode')
+        if mode in ('stream', 'memory'):
+            return mode == 'stream'
+        return file_obj.size > settings.UPLOAD_STREAMING_THRESHOLD
+
+class UploadExistsView(APIView):
+    authentication_classes = [StaffJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Check whether a file was already uploaded, before sending its bytes.
+        Expects ?sha256=<hex digest of the raw file>
+        """
+        content_hash = request.query_params.get('sha256', '').lower()
+        if len(content_hash) != 64 or any(c not in '0123456789abcdef' for c in content_hash):
+            return Response({'error': 'sha256 must be a 64 character hex digest.'}, status=status.HTTP_400_BAD_REQUEST)
+        duplicate = UploadedDataset.find_duplicate(request.user, content_hash)
+        if duplicate is None:
+            return Response({'exists': False})
+        return Response({
+            'exists': True,
+            'upload_id': duplicate.id,
+            'filename': duplicate.filename,
+            'total_rows': duplicate.row_count,
+        })
+
 class PredictView(APIView):
     authentication_classes = [StaffJWTAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser, JSONParser)
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models', 'finalized_model.pkl')
-        self.predictor = None
-        
+
     def post(self, request, format=None):
         """
         Handle prediction by upload_id.
-        Expects JSON body: { "upload_id": <id> }
+        Expects JSON body: { "upload_id": <id>, "async": <bool, optional> }
+        With async the job is queued and 202 is returned with its job_id.
         """
         logger.info("Received prediction request")
         try:
@@ -187,77 +250,34 @@ class PredictView(APIView):
             except UploadedDataset.DoesNotExist:
                 return Response({'error': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Convert stored data back to DataFrame
-            df = pd.DataFrame(upload.data['processed_data'])
-            if df.empty:
+            if upload.row_count == 0:
                 return Response({'error': 'Stored dataset is empty.'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get customer IDs if they exist
-            customer_ids = upload.data.get('customer_ids')
+            # Queued for the prediction workers when the client sends async or PREDICTION_ASYNC is set
+            if self._run_async(request):
+                job = enqueue_prediction(upload)
+                return Response({
+                    **job_status(job),
+                    'status_url': reverse('staff-job-status', args=[job.id]),
+                }, status=status.HTTP_202_ACCEPTED)
             
-            # Initialize predictor if not already done
-            if self.predictor is None:
-                try:
-                    self.predictor = ChurnPredictor(self.model_path)
-                except ModelPredictionError as e:
-                    logger.error(f"Error initializing predictor: {str(e)}")
-                    return Response(
-                        {'error': f'Error initializing model: {str(e)}'}, 
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
+            # Get the process-wide predictor (loaded once, shared across requests)
+            try:
+                predictor = model_registry.get_predictor()
+            except ModelPredictionError as e:
+                logger.error(f"Error initializing predictor: {str(e)}")
+                return Response(
+                    {'error': f'Error initializing model: {str(e)}'}, 
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
             
             # Make predictions
             try:
-                results = self.predictor.predict(df)
+                results = run_prediction(upload, predictor)
                 logger.info("Successfully generated predictions")
-                
-                # Format output with customer IDs if available
-                output = []
-                for i in range(len(results['predictions'])):
-                    churn_probability = float(results['probabilities'][i]) * 100
-                    is_churn = int(results['predictions'][i]) == 1
-                    
-                    # Determine risk level
-                    if churn_probability >= 75:
-                        risk_level = "High Risk"
-                    elif churn_probability >= 50:
-                        risk_level = "Medium Risk"
-                    else:
-                        risk_level = "Low Risk"
-                    
-                    result_item = {
-                        'predicted_class': "Churn Risk" if is_churn else "Not Churning",
-                        'churn_probability': f"{round(churn_probability, 2)}%",
-                        'risk_level': risk_level,
-                        'recommendation': "Immediate action required" if is_churn and churn_probability >= 75 else 
-                                        "Monitor closely" if is_churn and churn_probability >= 50 else 
-                                        "Regular monitoring"
-                    }
-                    
-                    if customer_ids is not None:
-                        result_item['customerID'] = customer_ids[i]
-                    else:
-                        result_item['customerID'] = f"ID_{i}"
-                    
-                    output.append(result_item)
-                
-                # Update the status to 'processed' and save results
-                upload.status = 'processed'
-                upload.data = {
-                    'processed_data': upload.data['processed_data'],
-                    'customer_ids': customer_ids,
-                    'predictions': output
-                }
-                upload.save()
-                
                 return Response({
-                    'results': output,
-                    'summary': {
-                        'total_customers': len(output),
-                        'high_risk_count': sum(1 for r in output if r['risk_level'] == "High Risk"),
-                        'medium_risk_count': sum(1 for r in output if r['risk_level'] == "Medium Risk"),
-                        'low_risk_count': sum(1 for r in output if r['risk_level'] == "Low Risk")
-                    }
+                    'results': results.to_records(),
+                    'summary': results.summary()
                 }, status=status.HTTP_200_OK)
                 
             except (ModelPredictionError, DataPreprocessingError) as e:
@@ -273,73 +293,325 @@ class PredictView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class HistoryListView(APIView):
+    def _run_async(self, request):
+        """Queue the job when the client asks for it, or by default if PREDICTION_ASYNC is set"""
+        value = request.data.get('async', request.query_params.get('async'))
+        if value is None:
+            return settings.PREDICTION_ASYNC
+        return str(value).lower() in ('1', 'true', 'yes')
+
+class ScoreView(APIView):
     authentication_classes = [StaffJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    parser_classes = (JSONParser,)
 
-    def get(self, request):
-        uploads = UploadedDataset.objects.filter(staff=request.user).order_by('-upload_date')
-        data = [
-            {
-                'id': upload.id,
-                'filename': upload.filename,
-                'upload_date': upload.upload_date,
-                'status': upload.status
-            }
-            for upload in uploads
-        ]
+    def post(self, request, format=None):
+        """
+        Score customers in real time, without uploading or storing anything.
+        Expects JSON body: a single customer record, a list of records, or
+        { "records": [...], "threshold": <float, optional> }
+        """
+        try:
+            records, threshold = self._parse_body(request.data)
+            if isinstance(records, Response):
+                return records
+            
+            try:
+                predictor = model_registry.get_predictor()
+            except ModelPredictionError as e:
+                logger.error(f"Error initializing predictor: {str(e)}")
+                return Response({'error': f'Error initializing model: {str(e)}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            # Fitting the scaler on a handful of rows would give meaningless scores
+            if not predictor.preprocessor.is_fitted:
+                return Response(
+                    {'error': 'Real-time scoring requires a fitted preprocessor artifact.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            
+            missing = self._missing_columns(records, predictor.preprocessor.required_columns)
+            if missing:
+                return Response({'error': 'Missing required fields.', 'missing': missing}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Concurrent requests share model calls through the micro-batcher
+            scorer = get_score_batcher() if settings.SCORING_MICRO_BATCH else predictor
+            try:
+                results = score_records(records, scorer, threshold=threshold)
+            except (ModelPredictionError, DataPreprocessingError) as e:
+                logger.error(f"Error scoring records: {str(e)}")
+                return Response({'error': f'Error making predictions: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'results': results.to_records(),
+                'summary': results.summary()
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Unexpected error in scoring: {str(e)}")
+            return Response({'error': f'Unexpected error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _parse_body(self, data):
+        """Return (records, threshold), or an error Response as the first item"""
+        threshold = None
+        if isinstance(data, dict) and 'records' in data:
+            records = data['records']
+            threshold = data.get('threshold')
+        elif isinstance(data, dict):
+            records = [data]
+        else:
+            records = data
+        
+        if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+            return Response({'error': 'Provide one or more customer records.'}, status=status.HTTP_400_BAD_REQUEST), None
+        if len(records) > settings.SCORING_MAX_RECORDS:
+            return Response(
+                {'error': f'At most {settings.SCORING_MAX_RECORDS} records can be scored per request; upload a file instead.'},
+                status=status.HTTP_400_BAD_REQUEST
+            ), None
+        if threshold is not None:
+            try:
+                threshold = float(threshold)
+            except (TypeError, ValueError):
+                threshold = -1
+            if not 0 < threshold <= 1:
+                return Response({'error': 'threshold must be a number in (0, 1].'}, status=status.HTTP_400_BAD_REQUEST), None
+        return records, threshold
+
+    def _missing_columns(self, records, required_columns):
+        """Map record index to the required fields it lacks (null values are filled like in uploads)"""
+        missing = {}
+        for i, record in enumerate(records):
+            absent = [col for col in required_columns if col not in record]
+            if absent:
+                missing[i] = absent
+        return missing
+
+class PredictionJobStatusView(APIView):
+    authentication_classes = [StaffJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            job = PredictionJob.objects.get(id=job_id, upload__staff=request.user)
+        except PredictionJob.DoesNotExist:
+            return Response({'error': 'Job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        data = job_status(job)
+        if job.status == 'processed':
+            data['results_url'] = reverse('staff-history-detail', args=[job.upload_id])
         return Response(data)
 
-class HistoryDetailView(APIView):
+class ModelHealthView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """
+        Readiness probe for the prediction model.
+        Loads the model if it is not loaded yet and reports load/warm-up timings.
+        """
+        try:
+            model_registry.get_predictor()
+        except ModelPredictionError as e:
+            logger.error(f"Model not ready: {str(e)}")
+        model_status = model_registry.status()
+        if model_status['error']:
+            # This endpoint is public; the details (file paths) are in the log
+            model_status['error'] = "Model could not be loaded"
+        if settings.SCORING_MICRO_BATCH:
+            model_status['batching'] = get_score_batcher().metrics()
+        cache = get_prediction_cache()
+        if cache is not None:
+            model_status['prediction_cache'] = cache.stats()
+        http_status = status.HTTP_200_OK if model_status['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+        return Response(model_status, status=http_status)
+
+class HistoryListView(ReplicaReadMixin, APIView):
+    authentication_classes = [StaffJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        List the staff member's uploads, newest first.
+        Optional filters: ?status=processed,failed&date_from=<ISO>&date_to=<ISO>
+        With ?limit= or ?cursor= the response is a page,
+        { "results": [...], "next_cursor": <token or null> }.
+        Otherwise every matching upload is returned as a list.
+        """
+        try:
+            uploads = self._filter(request, UploadedDataset.objects.filter(staff=request.user))
+            # Only the listed columns; stored data never goes through the ORM
+            uploads = uploads.order_by('-upload_date', '-id').values('id', 'filename', 'upload_date', 'status')
+            
+            params = request.query_params
+            if 'limit' not in params and 'cursor' not in params:
+                return Response(list(uploads))
+            
+            limit = parse_limit(params.get('limit'))
+            if params.get('cursor'):
+                upload_date, upload_id = decode_cursor(params['cursor'], 2)
+                try:
+                    upload_date = parse_datetime(str(upload_date))
+                    upload_id = int(upload_id)
+                except (TypeError, ValueError):
+                    upload_date = None
+                if upload_date is None:
+                    raise PaginationError("Invalid cursor.")
+                uploads = uploads.filter(
+                    Q(upload_date__lt=upload_date) | Q(upload_date=upload_date, id__lt=upload_id)
+                )
+            page = list(uploads[:limit + 1])
+            next_cursor = None
+            if len(page) > limit:
+                page = page[:limit]
+                next_cursor = encode_cursor([page[-1]['upload_date'].isoformat(), page[-1]['id']])
+            return Response({'results': page, 'next_cursor': next_cursor})
+        except PaginationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def _filter(self, request, uploads):
+        params = request.query_params
+        if params.get('status'):
+            uploads = uploads.filter(status__in=params['status'].split(','))
+        for param, lookup in (('date_from', 'upload_date__gte'), ('date_to', 'upload_date__lte')):
+            value = params.get(param)
+            if not value:
+                continue
+            try:
+                day = parse_date(value)
+                moment = parse_datetime(value) if day is None else None
+            except ValueError:
+                day = moment = None
+            if day is not None:
+                # A bare date_to includes that whole day
+                moment = datetime.combine(day, time.max if param == 'date_to' else time.min)
+            if moment is None:
+                raise PaginationError(f"{param} must be an ISO date or datetime.")
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+            uploads = uploads.filter(**{lookup: moment})
+        return uploads
+
+class HistoryDetailView(ReplicaReadMixin, APIView):
     authentication_classes = [StaffJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    PAGE_PARAMS = ('limit', 'offset', 'cursor', 'risk_level', 'predicted_class', 'sort', 'fields')
 
     def get(self, request, id):
+        """
+        Return an upload with its stored rows and predictions.
+        Any of these query parameters returns one page of rows instead of all of them:
+        ?limit=50&offset=0 or ?cursor=<next_cursor>, ?risk_level=High Risk,Medium Risk,
+        ?predicted_class=Churn Risk, ?sort=-probability,
+        ?fields=predictions,customer_ids (default: processed_data,customer_ids,predictions)
+        """
         try:
             upload = UploadedDataset.objects.get(id=id, staff=request.user)
-            return Response({
+            response = {
                 'id': upload.id,
                 'filename': upload.filename,
                 'upload_date': upload.upload_date,
                 'status': upload.status,
-                'data': upload.data
-            })
+            }
+            if any(param in request.query_params for param in self.PAGE_PARAMS):
+                response.update(self._page(request, upload))
+                return Response(response)
+            
+            data = {
+                'processed_data': upload.read_data().to_dict(orient='records'),
+                'customer_ids': upload.read_customer_ids(),
+            }
+            if upload.has_results:
+                data['predictions'] = frame_to_records(upload.read_results())
+            response['data'] = data
+            return Response(response)
         except UploadedDataset.DoesNotExist:
             return Response({'error': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except PaginationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except DatasetStorageError as e:
+            logger.error(f"Error reading stored dataset: {str(e)}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _page(self, request, upload):
+        params = request.query_params
+        fields = self._list_param(params, 'fields') or list(DETAIL_FIELDS)
+        unknown = set(fields) - set(DETAIL_FIELDS)
+        if unknown:
+            raise PaginationError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+        limit = parse_limit(params.get('limit'))
+        offset = parse_offset(params.get('offset'))
+        sort = params.get('sort') or None
+        cursor = decode_cursor(params['cursor'], 2 if sort else 1) if params.get('cursor') else None
+        
+        rows, total, next_cursor = select_rows(
+            upload,
+            risk_levels=self._list_param(params, 'risk_level'),
+            predicted_classes=self._list_param(params, 'predicted_class'),
+            sort=sort, cursor=cursor, offset=offset, limit=limit,
+        )
+        return {
+            'data': read_page(upload, rows, fields),
+            'page': {
+                'total': total,
+                'count': len(rows),
+                'offset': offset,
+                'limit': limit,
+                'rows': rows.tolist(),
+                'next_cursor': encode_cursor(next_cursor) if next_cursor else None,
+            },
+        }
+
+    def _list_param(self, params, name):
+        return [value for value in params.get(name, '').split(',') if value]
+
+class ExportFormatNegotiation(DefaultContentNegotiation):
+    """Leave ?format= to ExportResultsView instead of treating it as a DRF renderer override"""
 
-class ExportResultsView(APIView):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        # Errors are always rendered as JSON; successful exports bypass renderers
+        return renderers[0], renderers[0].media_type
+
+class ExportResultsView(ReplicaReadMixin, APIView):
     authentication_classes = [StaffJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportFormatNegotiation
 
     def get(self, request, upload_id):
+        """
+        Stream the prediction results.
+        ?format=csv (default, formatted for people), ndjson, parquet or arrow
+        (typed columns for data pipelines).
+        Text formats are compressed with gzip when the client sends
+        Accept-Encoding: gzip, or as a .gz download with ?compress=gzip.
+        """
         try:
             # Get the uploaded dataset
             upload = UploadedDataset.objects.get(id=upload_id, staff=request.user)
             
-            # Check if the data has the expected structure
-            if not upload.data or 'predictions' not in upload.data:
+            # Check that predictions have been made
+            if not upload.has_results:
                 return Response({'error': 'No prediction results found.'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Create the response
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="predictions_{upload_id}.csv"'
-            
-            # Create CSV writer
-            writer = csv.writer(response)
-            
-            # Write header
-            writer.writerow(['Customer ID', 'Predicted Class', 'Churn Probability', 'Risk Level', 'Recommendation'])
-            
-            # Write data
-            for row in upload.data['predictions']:
-                writer.writerow([
-                    row.get('customerID', 'N/A'),
-                    row.get('predicted_class', 'N/A'),
-                    row.get('churn_probability', 'N/A'),
-                    row.get('risk_level', 'N/A'),
-                    row.get('recommendation', 'N/A')
-                ])
+            export_format = request.query_params.get('format', 'csv')
+            if export_format not in EXPORT_FORMATS:
+                return Response(
+                    {'error': f"format must be one of {', '.join(EXPORT_FORMATS)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            content_type, extension, compressed = EXPORT_FORMATS[export_format]
             
+            # Rows are read and written chunk by chunk while the response is sent
+            chunks = log_stream_errors(EXPORT_WRITERS[export_format](upload), upload.id)
+            filename = f"predictions_{upload_id}.{extension}"
+            if compressed:
+                response = StreamingHttpResponse(chunks, content_type=content_type)
+            elif request.query_params.get('compress') == 'gzip':
+                response = StreamingHttpResponse(gzip_stream(chunks), content_type='application/gzip')
+                filename += '.gz'
+            elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+                response = StreamingHttpResponse(gzip_stream(chunks), content_type=content_type)
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = StreamingHttpResponse(chunks, content_type=content_type)
+            response['Vary'] = 'Accept-Encoding'
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
             return response
         except UploadedDataset.DoesNotExist:
             return Response({'error': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
@@ -405,26 +677,26 @@ class StaffRegisterSerializer(serializers.Serializer):
             raise serializers.ValidationError('Staff ID already exists.')
         if not Client.objects.filter(company_id=data['client_id']).exists():
             raise serializers.ValidationError('Client does not exist.')
-        # Enforce staff limit
-        client = Client.objects.get(company_id=data['client_id'])
-        subscription = Subscription.objects.filter(company=client, active=True).first()
-        if subscription:
-            max_staff = subscription.max_staff_allowed()
-            staff_count = Staff.objects.filter(client=client).count()
-            if max_staff is not None and staff_count >= max_staff:
-                raise serializers.ValidationError(f"Staff limit reached for this subscription plan ({subscription.plan_type}).")
+        # Enforce staff limit (checked again under a lock when saving)
+        try:
+            ClientCounters.for_client(data['client_id']).check_staff_limit()
+        except StaffLimitError as e:
+            raise serializers.ValidationError(str(e))
         return data
 
     def create(self, validated_data):
         validated_data.pop('password2')
         client = Client.objects.get(company_id=validated_data['client_id'])
-        staff = Staff.objects.create(
-            staff_id=validated_data['staff_id'],
-            client=client,
-            name=validated_data['name'],
-            email=validated_data['email'],
-            password=make_password(validated_data['password'])
-        )
+        try:
+            staff = Staff.create_within_limit(
+                client,
+                staff_id=validated_data['staff_id'],
+                name=validated_data['name'],
+                email=validated_data['email'],
+                password=make_password(validated_data['password'])
+            )
+        except StaffLimitError as e:
+            raise serializers.ValidationError(str(e))
         return staff
 
     def to_representation(self, instance):
@@ -441,7 +713,7 @@ class StaffLoginSerializer(serializers.Serializer):
 
     def validate(self, data):
         try:
-            staff = Staff.objects.get(staff_id=data['staff_id'])
+            staff = Staff.objects.select_related('client').get(staff_id=data['staff_id'])
             if not check_password(data['password'], staff.password):
                 raise serializers.ValidationError('Invalid password.')
             return {"staff_id": staff.staff_id, "client_id": staff.client.company_id, "name": staff.name, "email": staff.email}
@@ -453,15 +725,8 @@ class StaffLoginSerializer(serializers.Serializer):
 def staff_login(request):
     serializer = StaffLoginSerializer(data=request.data)
     if serializer.is_valid():
-        staff = Staff.objects.get(staff_id=request.data['staff_id'])
-        payload = {
-            'staff_id': staff.staff_id,
-            'client_id': staff.client.company_id,
-            'name': staff.name,
-            'email': staff.email,
-        }
-        token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
-        return Response({'token': token, **payload}, status=200)
+        payload = serializer.validated_data
+        return Response({**issue_tokens('staff', payload), **payload}, status=200)
     return Response(serializer.errors, status=400)
 
 class ClientLoginSerializer(serializers.Serializer):
@@ -486,16 +751,51 @@ class ClientLoginSerializer(serializers.Serializer):
 def client_login(request):
     serializer = ClientLoginSerializer(data=request.data)
     if serializer.is_valid():
-        client = Client.objects.get(company_id=request.data['company_id'])
-        payload = {
-            'company_id': client.company_id,
-            'company_name': client.company_name,
-            'company_email': client.company_email,
-        }
-        token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
-        return Response({'token': token, **payload}, status=200)
+        payload = serializer.validated_data
+        return Response({**issue_tokens('client', payload), **payload}, status=200)
     return Response(serializer.errors, status=400)
 
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def token_refresh(request):
+    """
+    Exchange a staff/client refresh token for a new access and refresh token.
+    The password is not checked again; the refresh token can be used once.
+    """
+    refresh = request.data.get('refresh')
+    if not refresh:
+        return Response({'error': 'A refresh token is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        kind, claims, tokens = refresh_tokens(refresh)
+    except (jwt.InvalidTokenError, Staff.DoesNotExist, Client.DoesNotExist):
+        return Response({'error': 'Invalid or expired refresh token.'}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({**tokens, **claims}, status=200)
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def token_logout(request):
+    """
+    Revoke the refresh token in the body and the bearer access token, if any.
+    """
+    tokens = [(request.data.get('refresh'), REFRESH)]
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        tokens.append((auth_header.split(' ')[1], ACCESS))
+    revoked = 0
+    for token, token_type in tokens:
+        if not token:
+            continue
+        try:
+            payload = decode_token(token, token_type)
+        except jwt.InvalidTokenError:
+            continue
+        revoke(payload)
+        token_cache.discard(token)
+        revoked += 1
+    return Response({'revoked': revoked}, status=200)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def login_info(request):
@@ -520,21 +820,18 @@ class ClientAddStaffSerializer(serializers.Serializer):
         return data
 
     def create(self, validated_data, client):
-        # Enforce staff limit
-        subscription = Subscription.objects.filter(company=client, active=True).first()
-        if subscription:
-            max_staff = subscription.max_staff_allowed()
-            staff_count = Staff.objects.filter(client=client).count()
-            if max_staff is not None and staff_count >= max_staff:
-                raise serializers.ValidationError(f"Staff limit reached for this subscription plan ({subscription.plan_type}).")
         validated_data.pop('password2')
-        staff = Staff.objects.create(
-            staff_id=validated_data['staff_id'],
-            client=client,
-            name=validated_data['name'],
-            email=validated_data['email'],
-            password=make_password(validated_data['password'])
-        )
+        # Enforce staff limit
+        try:
+            staff = Staff.create_within_limit(
+                client,
+                staff_id=validated_data['staff_id'],
+                name=validated_data['name'],
+                email=validated_data['email'],
+                password=make_password(validated_data['password'])
+            )
+        except StaffLimitError as e:
+            raise serializers.ValidationError(str(e))
         return staff
 
     def to_representation(self, instance):
@@ -553,10 +850,8 @@ class ClientJWTAuthentication(BaseAuthentication):
         try:
             # Extract the token from the header
             token = auth_header.split(' ')[1]
-            # Decode the token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            # Get the client
-            client = Client.objects.get(company_id=payload['company_id'])
+            # Decode the token and get the client (cached per token)
+            client = get_token_principal('client', token)
             return (client, None)
         except (jwt.InvalidTokenError, Client.DoesNotExist, IndexError):
             return None
@@ -585,7 +880,11 @@ def client_add_staff(request):
         
         if serializer.is_valid():
             # Create staff member with the authenticated client
-            staff = serializer.create(serializer.validated_data, client)
+            try:
+                staff = serializer.create(serializer.validated_data, client)
+            except serializers.ValidationError as e:
+                logger.error(f"Validation errors: {e.detail}")
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
             logger.info(f"Successfully created staff member {staff.staff_id} for client {client.company_id}")
             return Response(ClientAddStaffSerializer(staff).data, status=status.HTTP_201_CREATED)
         
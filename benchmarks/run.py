@@ -0,0 +1,297 @@
+"""
+Benchmark suite for the prediction pipeline.
+
+Times DataPreprocessor.preprocess_data and ChurnPredictor.predict directly,
+and DataUploadView, PredictView, HistoryDetailView and ExportResultsView
+through the Django test client, on synthetic Telco data (see synthetic.py)
+at each requested size. Everything runs against a throwaway SQLite database
+and dataset directory, with the prediction cache disabled so every run
+really scores its data.
+
+models/finalized_model.pkl (or ML_MODEL_PATH) is used when it exists;
+otherwise a small stand-in model and preprocessor are fitted on synthetic
+data, so the numbers are comparable between runs of the same checkout but
+not with the production model.
+
+Results are JSON; pass a previous run to --compare to flag regressions.
+
+Usage:
+    python benchmarks/run.py [--sizes 1000,100000,1000000] [--repeat 3]
+        [--only preprocess_data,predict,...] [--output results.json]
+        [--compare baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from synthetic import generate_telco
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_PATH = os.path.join(REPO_ROOT, 'models', 'finalized_model.pkl')
+BENCHMARKS = [
+    'preprocess_data', 'predict',
+    'upload_view', 'predict_view', 'history_detail', 'history_detail_page', 'export_csv', 'export_parquet',
+]
+# The unpaginated history detail renders every row as JSON; skip it for bigger uploads
+FULL_DETAIL_MAX_ROWS = 100000
+STAND_IN_TRAINING_ROWS = 5000
+PASSWORD = 'benchmark-password'
+
+
+def build_stand_in_model(directory, seed):
+    """Fit a small model and its preprocessor artifact on synthetic data; returns the model path"""
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from ml_utils.predictor import PREPROCESSOR_FILENAME
+    from ml_utils.preprocessor import DataPreprocessor
+
+    training = generate_telco(STAND_IN_TRAINING_ROWS, seed=seed + 1000, with_churn=True)
+    preprocessor = DataPreprocessor().fit(training)
+    model = HistGradientBoostingClassifier(max_iter=50, random_state=seed)
+    model.fit(preprocessor.transform(training), (training['Churn'] == 'Yes').astype(int))
+
+    model_path = os.path.join(directory, 'stand_in_model.pkl')
+    with open(model_path, 'wb') as f:
+        pickle.dump(model, f)
+    preprocessor.save(os.path.join(directory, PREPROCESSOR_FILENAME))
+    return model_path
+
+
+def setup_django(workdir, model_path):
+    """Point the project at workdir and start Django (call before importing models)"""
+    sys.path.insert(0, REPO_ROOT)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'TeleChurn_Project.settings'
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.sqlite3')}"
+    os.environ['DATASET_STORAGE_ROOT'] = os.path.join(workdir, 'datasets')
+    os.environ['PREDICTION_CACHE_BACKEND'] = ''
+    os.environ['ML_PRELOAD_MODEL'] = 'False'
+    if model_path:
+        os.environ['ML_MODEL_PATH'] = model_path
+    import django
+    django.setup()
+
+
+def prepare_database():
+    """Create the schema and a staff member; returns a test client logged in as them"""
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from django.test import Client as HttpClient
+    from clients.models import Client, Staff
+
+    call_command('migrate', verbosity=0)
+    client = Client.objects.create(
+        company_id=1, company_name='Benchmark', company_address='-', company_contact_no='0',
+        company_email='bench@example.com', password=make_password(PASSWORD),
+    )
+    Staff.objects.create(
+        staff_id='bench', client=client, name='Benchmark', email='bench@example.com',
+        password=make_password(PASSWORD),
+    )
+    response = HttpClient(HTTP_HOST='localhost').post(
+        '/api/staff/login/', {'staff_id': 'bench', 'password': PASSWORD}, content_type='application/json'
+    )
+    return HttpClient(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f"Bearer {response.json()['token']}")
+
+
+def timed(fn):
+    """Run fn once; returns (seconds, result)"""
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def expect_ok(response, name):
+    if response.status_code != 200:
+        raise RuntimeError(f"{name} returned {response.status_code}: {response.content[:500]!r}")
+    return response
+
+
+def drain(response):
+    """Consume a (streaming) response the way a client would; returns the body size"""
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def run_size(http, predictor, rows, repeat, seed, selected):
+    """Time the selected benchmarks on `rows` rows; returns {benchmark: [seconds, ...]}"""
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    timings = {name: [] for name in selected}
+    preprocessor = predictor.preprocessor
+    for run in range(repeat):
+        # A fresh dataset per run, so uploads are never deduplicated against earlier ones
+        frame = generate_telco(rows, seed=seed + run)
+
+        if 'preprocess_data' in timings:
+            # The shared fitted preprocessor only transforms; without an artifact a new one fits per batch
+            target = preprocessor if preprocessor.is_fitted else type(preprocessor)()
+            timings['preprocess_data'].append(timed(lambda: target.preprocess_data(frame))[0])
+        if 'predict' in timings:
+            timings['predict'].append(timed(lambda: predictor.predict(frame))[0])
+
+        api = [name for name in timings if name not in ('preprocess_data', 'predict')]
+        if not api:
+            continue
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False)
+        upload_file = SimpleUploadedFile(f"bench_{rows}_{run}.csv", buffer.getvalue().encode(), 'text/csv')
+        del buffer
+
+        seconds, response = timed(lambda: http.post('/api/staff/upload/', {'file': upload_file}))
+        upload_id = expect_ok(response, 'upload').json()['upload_id']
+        if 'upload_view' in timings:
+            timings['upload_view'].append(seconds)
+
+        needs_results = {'predict_view', 'history_detail', 'history_detail_page', 'export_csv', 'export_parquet'}
+        if not needs_results & set(timings):
+            continue
+        seconds, response = timed(lambda: http.post(
+            '/api/staff/predict/', {'upload_id': upload_id}, content_type='application/json'
+        ))
+        expect_ok(response, 'predict')
+        if 'predict_view' in timings:
+            timings['predict_view'].append(seconds)
+
+        requests = {
+            'history_detail': f'/api/staff/history/{upload_id}/',
+            'history_detail_page': f'/api/staff/history/{upload_id}/?limit=100&sort=-probability',
+            'export_csv': f'/api/staff/export/{upload_id}/',
+            'export_parquet': f'/api/staff/export/{upload_id}/?format=parquet',
+        }
+        for name, url in requests.items():
+            if name not in timings or (name == 'history_detail' and rows > FULL_DETAIL_MAX_ROWS):
+                continue
+            timings[name].append(timed(lambda: drain(expect_ok(http.get(url), name)))[0])
+    return timings
+
+
+def summarize(name, rows, seconds):
+    median = statistics.median(seconds)
+    return {
+        'benchmark': name,
+        'rows': rows,
+        'repeat': len(seconds),
+        'min_seconds': round(min(seconds), 6),
+        'median_seconds': round(median, 6),
+        'mean_seconds': round(statistics.fmean(seconds), 6),
+        'rows_per_second': round(rows / median, 1) if median else None,
+    }
+
+
+def environment(model, preprocessor_fitted):
+    import numpy
+    import pandas
+    import sklearn
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+        'model': model,
+        # 'per-batch' means no preprocessor artifact: encoders and scaler are refitted on every call
+        'preprocessor': 'fitted' if preprocessor_fitted else 'per-batch',
+    }
+
+
+def compare(results, baseline_path, tolerance, out=sys.stdout):
+    """Print median ratios against a previous run; returns True if any benchmark regressed"""
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['rows']): r for r in json.load(f)['results']}
+    regressed = False
+    print(f"{'benchmark':<22} {'rows':>9} {'baseline s':>11} {'current s':>11} {'ratio':>7}", file=out)
+    for result in results:
+        previous = baseline.get((result['benchmark'], result['rows']))
+        if not previous or not previous['median_seconds']:
+            continue
+        ratio = result['median_seconds'] / previous['median_seconds']
+        flag = ' REGRESSION' if ratio > 1 + tolerance else ''
+        regressed = regressed or bool(flag)
+        print(f"{result['benchmark']:<22} {result['rows']:>9} {previous['median_seconds']:>11.4f} "
+              f"{result['median_seconds']:>11.4f} {ratio:>7.2f}{flag}", file=out)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='Comma-separated row counts')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark and size')
+    parser.add_argument('--only', help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results JSON to this file')
+    parser.add_argument('--json', action='store_true', help='Print the results JSON instead of a table')
+    parser.add_argument('--compare', help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Slowdown (0.2 = 20%%) of the median beyond which --compare fails')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    selected = args.only.split(',') if args.only else BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    # Per-row log lines would dominate the timings
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = os.environ.get('ML_MODEL_PATH', DEFAULT_MODEL_PATH)
+        if os.path.exists(model_path):
+            model = os.path.relpath(model_path, REPO_ROOT) if model_path.startswith(REPO_ROOT) else model_path
+            setup_django(workdir, model_path)
+        else:
+            sys.path.insert(0, REPO_ROOT)
+            model = 'stand-in'
+            setup_django(workdir, build_stand_in_model(workdir, args.seed))
+        from ml_utils.registry import model_registry
+
+        http = prepare_database()
+        predictor = model_registry.get_predictor()
+        results, skipped = [], []
+        for rows in sizes:
+            timings = run_size(http, predictor, rows, args.repeat, args.seed, selected)
+            results.extend(summarize(name, rows, seconds) for name, seconds in timings.items() if seconds)
+            skipped.extend({'benchmark': name, 'rows': rows} for name, seconds in timings.items() if not seconds)
+            if not args.json:
+                print(f"finished {rows} rows", file=sys.stderr)
+
+    report = {
+        'environment': environment(model, predictor.preprocessor.is_fitted),
+        'results': results,
+        'skipped': skipped,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'benchmark':<22} {'rows':>9} {'median s':>10} {'min s':>10} {'rows/s':>12}")
+        for result in results:
+            print(f"{result['benchmark']:<22} {result['rows']:>9} {result['median_seconds']:>10.4f} "
+                  f"{result['min_seconds']:>10.4f} {result['rows_per_second']:>12}")
+    # Keep stdout parseable with --json
+    if args.compare and compare(results, args.compare, args.tolerance, out=sys.stderr if args.json else sys.stdout):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
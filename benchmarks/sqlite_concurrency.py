@@ -0,0 +1,139 @@
+"""
+SQLite concurrency benchmark.
+
+Runs the upload bookkeeping the API does (insert an UploadedDataset, mark it
+processed, list the staff member's history) from several processes at once
+against a throwaway SQLite file, once with Django's defaults and once with
+SQLITE_TUNING, and reports throughput and "database is locked" failures.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--workers 8] [--seconds 10] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(db_path, tuned):
+    """Point the project at db_path and start Django (call before importing models)"""
+    sys.path.insert(0, REPO_ROOT)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'TeleChurn_Project.settings'
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ['SQLITE_TUNING'] = 'True' if tuned else 'False'
+    os.environ.setdefault('ML_PRELOAD_MODEL', 'False')
+    import django
+    django.setup()
+
+
+def prepare_database():
+    """Create the schema and one client with one staff member"""
+    from django.core.management import call_command
+    from clients.models import Client, Staff
+    call_command('migrate', verbosity=0)
+    client = Client.objects.create(
+        company_id=1, company_name='Bench', company_address='-',
+        company_contact_no='0', company_email='bench@example.com', password='-',
+    )
+    Staff.objects.create(staff_id='bench', client=client, name='Bench', email='bench@example.com', password='-')
+
+
+def worker(deadline, results):
+    """Repeat the upload workload until deadline; report (operations, lock errors, latencies)"""
+    from django.db import OperationalError, connection, transaction
+    from api.models import UploadedDataset
+
+    operations = errors = 0
+    latencies = []
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                # Read, then write in the same transaction, as the views do
+                UploadedDataset.objects.filter(staff_id='bench').order_by('-upload_date').first()
+                upload = UploadedDataset.objects.create(
+                    staff_id='bench', filename='bench.csv', row_count=1000,
+                    columns=[f"column_{i}" for i in range(20)],
+                )
+            UploadedDataset.objects.filter(pk=upload.pk).update(status='processed')
+            list(UploadedDataset.objects.filter(staff_id='bench')
+                 .order_by('-upload_date', '-id').values('id', 'filename', 'status')[:50])
+            operations += 1
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    connection.close()
+    results.put((operations, errors, latencies))
+
+
+def run(tuned, workers, seconds):
+    """Benchmark one configuration in this process and return its summary"""
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'), tuned)
+        from django.db import connection
+        prepare_database()
+        connection.close()  # Each forked worker opens its own connection
+
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        deadline = time.time() + seconds
+        processes = [context.Process(target=worker, args=(deadline, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    operations = sum(c[0] for c in collected)
+    latencies = sorted(latency for c in collected for latency in c[2])
+    percentile = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else None
+    return {
+        'config': 'tuned' if tuned else 'default',
+        'workers': workers,
+        'seconds': seconds,
+        'operations': operations,
+        'ops_per_second': round(operations / seconds, 1),
+        'lock_errors': sum(c[1] for c in collected),
+        'p50_ms': percentile(0.5),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    parser.add_argument('--config', choices=['default', 'tuned'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.config:
+        # Child run: settings are read once per process, so each configuration gets its own
+        print(json.dumps(run(args.config == 'tuned', args.workers, args.seconds)))
+        return
+
+    summaries = []
+    for config in ('default', 'tuned'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--config', config, '--workers', str(args.workers), '--seconds', str(args.seconds)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        summaries.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    print(f"{'config':<8} {'ops/s':>8} {'lock errors':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for summary in summaries:
+        print(f"{summary['config']:<8} {summary['ops_per_second']:>8} {summary['lock_errors']:>12} "
+              f"{summary['p50_ms']!s:>8} {summary['p99_ms']!s:>8}")
+
+
+if __name__ == '__main__':
+    main()
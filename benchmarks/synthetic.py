@@ -0,0 +1,92 @@
+"""
+Seeded synthetic Telco customer data for benchmarks.
+
+Columns follow the IBM Telco Customer Churn dataset the model was trained
+on, with the same quirks: TotalCharges is text with blanks for customers in
+their first month, and the add-on services read "No internet service" when
+there is no internet contract. Binary flags use the Yes/No spelling the
+upload path expects. Values are correlated (tenure with contract, charges
+with services, churn with all three) so they exercise realistic category
+mixes rather than uniform noise.
+"""
+import numpy as np
+import pandas as pd
+
+CONTRACTS = ['Month-to-month', 'One year', 'Two year']
+PAYMENT_METHODS = ['Electronic check', 'Mailed check', 'Bank transfer (automatic)', 'Credit card (automatic)']
+INTERNET_SERVICES = ['DSL', 'Fiber optic', 'No']
+ADDON_COLUMNS = ['OnlineSecurity', 'OnlineBackup', 'DeviceProtection', 'TechSupport', 'StreamingTV', 'StreamingMovies']
+
+
+def _pick(values, codes):
+    """Map integer codes to strings (object arrays, as read_csv would give)"""
+    return np.array(values, dtype=object)[codes]
+
+
+def _yes_no(flags):
+    return _pick(['No', 'Yes'], flags.astype(np.int8))
+
+
+def _customer_ids(rng, rows):
+    """IDs shaped like the dataset's, e.g. 7590-VHVEG"""
+    chars = np.empty((rows, 10), dtype=np.uint8)
+    chars[:, :4] = rng.integers(ord('0'), ord('9') + 1, size=(rows, 4))
+    chars[:, 4] = ord('-')
+    chars[:, 5:] = rng.integers(ord('A'), ord('Z') + 1, size=(rows, 5))
+    return chars.view('S10').ravel().astype('U10').astype(object)
+
+
+def generate_telco(rows, seed=0, with_churn=False):
+    """
+    Generate Telco customer records.
+
+    Args:
+        rows (int): Number of customers
+        seed (int): Random seed; the same seed always gives the same frame
+        with_churn (bool): Include the Churn label column (Yes/No)
+
+    Returns:
+        pd.DataFrame: One row per customer, starting with customerID
+    """
+    rng = np.random.default_rng(seed)
+
+    contract = rng.choice(3, size=rows, p=[0.55, 0.21, 0.24])
+    # Longer contracts go with longer-standing customers
+    tenure = np.clip(rng.gamma(shape=1.2 + contract * 1.5, scale=14.0), 1, 72).astype(np.int64)
+    tenure[rng.random(rows) < 0.0015] = 0  # New customers, with blank TotalCharges
+    internet = rng.choice(3, size=rows, p=[0.34, 0.44, 0.22])
+    has_internet = internet != 2
+
+    frame = {
+        'customerID': _customer_ids(rng, rows),
+        'gender': _pick(['Male', 'Female'], rng.integers(0, 2, rows)),
+        'SeniorCitizen': _yes_no(rng.random(rows) < 0.16),
+        'Partner': _yes_no(rng.random(rows) < 0.48),
+        'Dependents': _yes_no(rng.random(rows) < 0.30),
+        'tenure': tenure,
+        'PhoneService': _yes_no(rng.random(rows) < 0.90),
+    }
+    frame['MultipleLines'] = np.where(
+        frame['PhoneService'] == 'Yes', _yes_no(rng.random(rows) < 0.47), 'No phone service'
+    ).astype(object)
+    frame['InternetService'] = _pick(INTERNET_SERVICES, internet)
+
+    monthly = 20.0 + np.where(frame['PhoneService'] == 'Yes', 5.0, 0.0) + np.array([25.0, 50.0, 0.0])[internet]
+    for column in ADDON_COLUMNS:
+        subscribed = has_internet & (rng.random(rows) < 0.40)
+        frame[column] = np.where(has_internet, _yes_no(subscribed), 'No internet service').astype(object)
+        monthly += np.where(subscribed, 5.0, 0.0)
+
+    frame['Contract'] = _pick(CONTRACTS, contract)
+    frame['PaperlessBilling'] = _yes_no(rng.random(rows) < 0.59)
+    frame['PaymentMethod'] = _pick(PAYMENT_METHODS, rng.choice(4, size=rows, p=[0.34, 0.23, 0.22, 0.21]))
+    frame['MonthlyCharges'] = np.round(monthly + rng.normal(0, 2.5, rows), 2).clip(18.25, 118.75)
+    total = np.round(frame['MonthlyCharges'] * tenure * rng.uniform(0.95, 1.05, rows), 2)
+    frame['TotalCharges'] = pd.Series(total).astype(str).where(tenure > 0, ' ').to_numpy()
+
+    if with_churn:
+        logit = (-1.2 + 1.1 * (contract == 0) - 0.035 * tenure + 0.7 * (internet == 1)
+                 + 0.5 * (frame['PaymentMethod'] == 'Electronic check'))
+        frame['Churn'] = _yes_no(rng.random(rows) < 1 / (1 + np.exp(-logit)))
+
+    return pd.DataFrame(frame)
@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Client, Feedback, Subscription, Staff
+from django.contrib import admin, messages
+from django.db import transaction
+from django.db.models import Count
+from .cache import invalidate_profiles
+from .models import Client, ClientCounters, Feedback, Subscription, Staff, StaffLimitError
 from django.contrib.auth.hashers import make_password
 from django import forms
 from django.core.exceptions import ValidationError
@@ -48,10 +51,18 @@ class ClientAdmin(admin.ModelAdmin):
     form = ClientAdminForm
     list_display = ('company_id', 'company_name', 'company_email', 'staff_count')
     inlines = [SubscriptionInline]
+    list_per_page = 50
+    # Skip the unfiltered COUNT(*) on every changelist page
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Count staff in the changelist query instead of once per row
+        return super().get_queryset(request).annotate(staff_total=Count('staff'))
 
     def staff_count(self, obj):
-        return Staff.objects.filter(client=obj).count()
+        return obj.staff_total
     staff_count.short_description = 'Staff Count'
+    staff_count.admin_order_field = 'staff_total'
 
     def save_model(self, request, obj, form, change):
         # Hash the password if it's not already hashed
@@ -80,20 +91,20 @@ class StaffAdminForm(forms.ModelForm):
     def clean(self):
         cleaned_data = super().clean()
         client = cleaned_data.get('client')
-        if client:
-            from .models import Subscription
-            subscription = Subscription.objects.filter(company=client, active=True).first()
-            if subscription:
-                max_staff = subscription.max_staff_allowed()
-                staff_count = Staff.objects.filter(client=client).count()
-                # If adding a new staff (not editing existing)
-                if not self.instance.pk and max_staff is not None and staff_count >= max_staff:
-                    raise ValidationError(f"Staff limit reached for this subscription plan ({subscription.plan_type}).")
+        # If adding a new staff, or moving one to another client
+        if client and (self.instance._state.adding or client.pk != self.instance.client_id):
+            try:
+                ClientCounters.for_client(client.pk).check_staff_limit()
+            except StaffLimitError as e:
+                raise ValidationError(str(e))
         return cleaned_data
 
 class StaffAdmin(admin.ModelAdmin):
     form = StaffAdminForm
     list_display = ('staff_id', 'name', 'email', 'client')
+    list_select_related = ('client',)
+    list_per_page = 50
+    show_full_result_count = False
 
     def save_model(self, request, obj, form, change):
         raw_password = form.cleaned_data.get('password')
@@ -123,6 +134,9 @@ class SubscriptionAdmin(admin.ModelAdmin):
     form = SubscriptionAdminForm
     list_display = ('subscription_id', 'company', 'plan_type', 'active', 'plan_duration', 'monthly_rate', 'total_charges')
     list_filter = ('plan_type', 'active')
+    list_select_related = ('company',)
+    list_per_page = 50
+    show_full_result_count = False
     readonly_fields = ('plan_duration', 'monthly_rate', 'total_charges')
     actions = ['activate_subscriptions', 'deactivate_subscriptions']
 
@@ -140,19 +154,59 @@ class SubscriptionAdmin(admin.ModelAdmin):
 
     @admin.action(description="Activate selected subscriptions")
     def activate_subscriptions(self, request, queryset):
-        for subscription in queryset:
-            subscription.active = True
-            subscription.save()
-        self.message_user(request, "Selected subscriptions have been activated.")
+        """
+        Activate the selection with one UPDATE, or nothing at all if that
+        would leave a client with more than one active subscription.
+        """
+        queryset = queryset.order_by()
+        with transaction.atomic():
+            companies = queryset.values('company')
+            # Lock the subscriptions of the affected clients until the update is done
+            company_ids = set(
+                Subscription.objects.select_for_update().filter(company__in=companies)
+                .values_list('company_id', flat=True)
+            )
+            conflicts = set(
+                queryset.values('company').annotate(selected=Count('pk')).filter(selected__gt=1)
+                .values_list('company__company_name', flat=True)
+            )
+            conflicts.update(
+                Subscription.objects.filter(company__in=companies, active=True)
+                .exclude(pk__in=queryset.values('pk'))
+                .values_list('company__company_name', flat=True)
+            )
+            if conflicts:
+                self.message_user(
+                    request,
+                    "A client can only have one active subscription at a time. No subscriptions were activated; "
+                    f"check: {', '.join(sorted(conflicts))}.",
+                    level=messages.ERROR,
+                )
+                return
+            updated = queryset.update(active=True)
+        # update() sends no signals
+        invalidate_profiles(company_ids)
+        self.message_user(request, f"{updated} subscription(s) have been activated.")
 
     @admin.action(description="Deactivate selected subscriptions")
     def deactivate_subscriptions(self, request, queryset):
-        for subscription in queryset:
-            subscription.active = False
-            subscription.save()
-        self.message_user(request, "Selected subscriptions have been deactivated.")
+        company_ids = set(queryset.values_list('company_id', flat=True))
+        updated = queryset.update(active=False)
+        # update() sends no signals
+        invalidate_profiles(company_ids)
+        self.message_user(request, f"{updated} subscription(s) have been deactivated.")
+
+
+class FeedbackAdmin(admin.ModelAdmin):
+    list_display = ('feedback_id', 'company', 'feedback_date', 'feedback_score')
+    # Assigned from the feedback ID sequence on save
+    readonly_fields = ('feedback_id',)
+    list_filter = ('feedback_date',)
+    list_select_related = ('company',)
+    list_per_page = 50
+    show_full_result_count = False
 
 admin.site.register(Client, ClientAdmin)
-admin.site.register(Feedback)
+admin.site.register(Feedback, FeedbackAdmin)
 admin.site.register(Subscription, SubscriptionAdmin)
 admin.site.register(Staff, StaffAdmin)
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Per-client cache of the profile returned by /api/client/profile/.
+
+Entries are stored in the shared cache and dropped whenever the client,
+its staff, subscriptions or feedback change (see clients.signals). Without
+a shared cache backend profiles are built on every request, since an entry
+in one process could not be invalidated by a write in another. Bulk
+queryset updates do not send signals; callers must invalidate explicitly
+with invalidate_profiles().
+"""
+from django.conf import settings
+
+from TeleChurn_Project.caching import shared_cache
+
+
+def profile_cache_key(company_id):
+    return f"client-profile:{company_id}"
+
+
+def get_cached_profile(company_id, build):
+    """
+    Return the cached profile of a client, building and caching it on a miss.
+
+    Args:
+        company_id (int): Client primary key
+        build (callable): Returns the profile dict when it is not cached
+    """
+    cache = shared_cache()
+    if cache is None:
+        return build()
+    key = profile_cache_key(company_id)
+    profile = cache.get(key)
+    if profile is None:
+        profile = build()
+        cache.set(key, profile, settings.CLIENT_PROFILE_CACHE_TTL)
+    return profile
+
+
+def invalidate_profiles(company_ids):
+    cache = shared_cache()
+    if cache is not None:
+        cache.delete_many([profile_cache_key(company_id) for company_id in set(company_ids)])
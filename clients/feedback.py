@@ -0,0 +1,146 @@
+"""
+Bulk import of client feedback from a JSON array or a CSV file.
+
+All rows are validated column by column in one pandas pass; the import is
+all-or-nothing. IDs for the whole import are reserved with a single
+Feedback.allocate_ids() call and rows are inserted with bulk_create in
+batches of FEEDBACK_IMPORT_BATCH_SIZE; the rollups of the affected days and
+months are updated once per period.
+"""
+import logging
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .cache import invalidate_profiles
+from .models import ClientCounters, Feedback
+from .rollups import apply_feedback
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_COMPLAINT_LENGTH = Feedback._meta.get_field('client_complaints').max_length
+# Invalid rows listed in an error response
+MAX_REPORTED_ERRORS = 20
+
+
+class FeedbackImportError(Exception):
+    """Custom exception for feedback imports that cannot be read or fail validation"""
+
+    def __init__(self, message, rows=None):
+        super().__init__(message)
+        self.rows = rows or []
+
+
+def read_feedback_csv(file_obj):
+    """Read a CSV with a feedback_score column and optional client_complaints and feedback_date"""
+    try:
+        return pd.read_csv(file_obj, dtype=str, keep_default_na=False)
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise FeedbackImportError(f"Could not read CSV file: {str(e)}")
+
+
+def read_feedback_records(records):
+    """Turn a JSON array of feedback objects into a DataFrame"""
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise FeedbackImportError("Expected a JSON array of feedback objects.")
+    return pd.DataFrame.from_records(records)
+
+
+def _blank(values):
+    return values.isna() | values.astype(str).str.strip().eq('')
+
+
+def validate_feedback(frame):
+    """
+    Validate and normalize feedback rows.
+
+    Returns:
+        DataFrame: feedback_score (int), client_complaints (str) and
+            feedback_date (date, today when not given)
+
+    Raises:
+        FeedbackImportError: If any row is invalid; rows lists the first
+            MAX_REPORTED_ERRORS of them (1-based, header excluded)
+    """
+    if frame.empty:
+        raise FeedbackImportError("No feedback rows to import.")
+    if len(frame) > settings.FEEDBACK_IMPORT_MAX_ROWS:
+        raise FeedbackImportError(f"At most {settings.FEEDBACK_IMPORT_MAX_ROWS} feedback rows can be imported at once.")
+    if 'feedback_score' not in frame.columns:
+        raise FeedbackImportError("Missing required column: feedback_score")
+    frame = frame.reset_index(drop=True)
+
+    raw_scores = frame['feedback_score']
+    # Booleans would pass as 0/1
+    is_bool = raw_scores.map(lambda value: isinstance(value, (bool, np.bool_)))
+    scores = pd.to_numeric(raw_scores.where(~is_bool), errors='coerce')
+    problems = {
+        'Feedback score must be an integer between 1 and 5': (
+            scores.isna() | (scores % 1 != 0) | (scores < 1) | (scores > 5)
+        ).to_numpy(),
+    }
+
+    if 'client_complaints' in frame.columns:
+        complaints = frame['client_complaints'].where(~frame['client_complaints'].isna(), '').astype(str)
+    else:
+        complaints = pd.Series('', index=frame.index)
+    problems[f'Complaints must be at most {MAX_COMPLAINT_LENGTH} characters'] = (
+        complaints.str.len() > MAX_COMPLAINT_LENGTH
+    ).to_numpy()
+
+    dates = pd.Series(date.today(), index=frame.index, dtype=object)
+    if 'feedback_date' in frame.columns:
+        given = ~_blank(frame['feedback_date'])
+        parsed = pd.to_datetime(frame['feedback_date'].where(given).astype(object), format='%Y-%m-%d', errors='coerce')
+        problems['Feedback date must be YYYY-MM-DD'] = (given & parsed.isna()).to_numpy()
+        dates = dates.where(~given, parsed.dt.date)
+
+    invalid = np.logical_or.reduce(list(problems.values()))
+    if invalid.any():
+        rows = [
+            {'row': int(i) + 1, 'errors': [message for message, mask in problems.items() if mask[i]]}
+            for i in np.flatnonzero(invalid)[:MAX_REPORTED_ERRORS]
+        ]
+        raise FeedbackImportError(f"{int(invalid.sum())} of {len(frame)} feedback rows are invalid; nothing was imported.", rows)
+
+    return pd.DataFrame({
+        'feedback_score': scores.astype(int),
+        'client_complaints': complaints,
+        'feedback_date': dates,
+    })
+
+
+def import_feedback(client, frame):
+    """
+    Validate and insert feedback rows for a client.
+
+    Returns:
+        range: The feedback IDs of the imported rows
+
+    Raises:
+        FeedbackImportError: If any row is invalid
+    """
+    rows = validate_feedback(frame)
+    first_id = Feedback.allocate_ids(len(rows))
+    feedback = [
+        Feedback(feedback_id=first_id + i, company_id=client.pk, feedback_date=feedback_date,
+                 feedback_score=score, client_complaints=complaints)
+        for i, (score, complaints, feedback_date) in enumerate(zip(
+            rows['feedback_score'].tolist(), rows['client_complaints'].tolist(), rows['feedback_date'].tolist()
+        ))
+    ]
+    batch_size = settings.FEEDBACK_IMPORT_BATCH_SIZE
+    with transaction.atomic():
+        for start in range(0, len(feedback), batch_size):
+            Feedback.objects.bulk_create(feedback[start:start + batch_size])
+        # bulk_create sends no signals
+        ClientCounters.adjust(client.pk, feedback_count=len(feedback))
+        apply_feedback(entry.rollup_entry() for entry in feedback)
+    invalidate_profiles([client.pk])
+    logger.info(f"Imported {len(feedback)} feedback rows for client {client.pk}")
+    return range(first_id, first_id + len(feedback))
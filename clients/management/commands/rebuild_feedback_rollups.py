@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clients.models import Client
+from clients.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily and monthly feedback rollups from the raw feedback rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Only rebuild this company ID')
+
+    def handle(self, *args, **options):
+        company_id = options['company']
+        if company_id is not None and not Client.objects.filter(company_id=company_id).exists():
+            raise CommandError(f"Company {company_id} does not exist.")
+
+        written = rebuild_rollups(company_id)
+        scope = f"company {company_id}" if company_id is not None else "all companies"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} feedback rollups for {scope}."))
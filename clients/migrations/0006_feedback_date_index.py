@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clients", "0005_staff_password"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="feedback",
+            index=models.Index(fields=["company", "feedback_date", "feedback_id"], name="clients_feedback_date_idx"),
+        ),
+    ]
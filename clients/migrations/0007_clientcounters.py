@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clients", "0006_feedback_date_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClientCounters",
+            fields=[
+                ("client", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="counters", serialize=False, to="clients.client")),
+                ("staff_count", models.IntegerField(default=0)),
+                ("subscription_count", models.IntegerField(default=0)),
+                ("feedback_count", models.IntegerField(default=0)),
+                ("upload_count", models.IntegerField(default=0)),
+                ("prediction_count", models.IntegerField(default=0)),
+            ],
+        ),
+    ]
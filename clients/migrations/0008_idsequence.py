@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clients", "0007_clientcounters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdSequence",
+            fields=[
+                ("name", models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ("last_value", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
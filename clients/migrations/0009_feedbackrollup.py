@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_rollups(apps, schema_editor):
+    from clients.rollups import rebuild_rollups
+
+    rebuild_rollups(
+        feedback_model=apps.get_model("clients", "Feedback"),
+        rollup_model=apps.get_model("clients", "FeedbackRollup"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clients", "0008_idsequence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedbackRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("period", models.CharField(choices=[("day", "Day"), ("month", "Month")], max_length=5)),
+                ("period_start", models.DateField()),
+                ("count", models.IntegerField(default=0)),
+                ("score_sum", models.BigIntegerField(default=0)),
+                ("score_1", models.IntegerField(default=0)),
+                ("score_2", models.IntegerField(default=0)),
+                ("score_3", models.IntegerField(default=0)),
+                ("score_4", models.IntegerField(default=0)),
+                ("score_5", models.IntegerField(default=0)),
+                ("complaint_count", models.IntegerField(default=0)),
+                ("company", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="clients.client")),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("company", "period", "period_start"), name="clients_feedback_rollup_unique")],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
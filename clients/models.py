@@ -1,6 +1,7 @@
 from enum import unique
 from random import choice, choices
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 
 # Create your models here.
 class Client(models.Model):
@@ -40,6 +41,34 @@ class Staff(models.Model):
     def __str__(self):
         return f"{self.name} ({self.staff_id})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Client this row is counted under in ClientCounters, to move it there when reassigned
+        instance._counted_client_id = instance.__dict__.get('client_id')
+        return instance
+
+    @classmethod
+    def create_within_limit(cls, client, **fields):
+        """
+        Create a staff member unless the client's active subscription is full.
+
+        The client's counters row stays locked until the staff member is saved,
+        so concurrent registrations cannot both take the last seat. The lock
+        is taken with a write rather than SELECT ... FOR UPDATE, which SQLite
+        ignores: a no-op UPDATE of the row locks it on PostgreSQL and MySQL,
+        and on SQLite takes the database write lock before anything is read.
+
+        Raises:
+            StaffLimitError: If the subscription's staff limit is reached
+        """
+        with transaction.atomic():
+            if not ClientCounters.objects.filter(pk=client.pk).update(staff_count=F('staff_count')):
+                # First registration for this client: counting inserts the row
+                ClientCounters.rebuild(client.pk)
+            ClientCounters.objects.get(pk=client.pk).check_staff_limit()
+            return cls.objects.create(client=client, **fields)
+
 class Feedback(models.Model):
     feedback_id = models.IntegerField(primary_key=True)
     company = models.ForeignKey(Client, on_delete=models.CASCADE)
@@ -47,9 +76,40 @@ class Feedback(models.Model):
     feedback_score = models.IntegerField()
     client_complaints = models.CharField(max_length=200, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Serves a client's feedback history, newest first, and its cursor pages
+            models.Index(fields=['company', 'feedback_date', 'feedback_id'], name='clients_feedback_date_idx'),
+        ]
+
     def __str__(self):
         return f"Feedback from {self.company.company_name} on {self.feedback_date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this row contributed to FeedbackRollup, to move it there when edited
+        instance._rollup_entry = instance.rollup_entry()
+        instance._counted_client_id = instance.__dict__.get('company_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Rows added without an ID (e.g. from the admin) take the next one from the sequence
+        if self.feedback_id is None:
+            self.feedback_id = type(self).allocate_ids()
+        super().save(*args, **kwargs)
+
+    def rollup_entry(self):
+        """(company_id, feedback_date, feedback_score, has complaint) as counted by FeedbackRollup"""
+        return (self.company_id, self.feedback_date, self.feedback_score, bool(self.client_complaints))
+
+    @classmethod
+    def allocate_ids(cls, count=1):
+        """Reserve count consecutive feedback IDs; returns the first one"""
+        return IdSequence.allocate('feedback', count, start_after=lambda: (
+            cls.objects.aggregate(last=models.Max('feedback_id'))['last'] or 0
+        ))
+
 class Subscription(models.Model):
     plans = [
         ('basic', 'Basic'),
@@ -76,6 +136,13 @@ class Subscription(models.Model):
         'partner': 500.0,
     }
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Client this row is counted under in ClientCounters, to move it there when reassigned
+        instance._counted_client_id = instance.__dict__.get('company_id')
+        return instance
+
     def get_plan_duration(self):
         return self.PLAN_DURATIONS.get(self.plan_type, 0)
 
@@ -123,4 +190,146 @@ class Subscription(models.Model):
             self.monthly_charges = self.PLAN_PRICES[self.plan_type]
             self.total_charges = self.monthly_charges * duration
             if self.start_date:
-                self.end_date = self.start_date + timedelta(days=30*duration)
\ No newline at end of file
+                self.end_date = self.start_date + timedelta(days=30*duration)
+
+
+class StaffLimitError(Exception):
+    """Custom exception for adding staff beyond the subscription's limit"""
+    pass
+
+
+class ClientCounters(models.Model):
+    """
+    Denormalized per-client totals, adjusted with F() expressions by the
+    post_save/post_delete signals in clients.signals and api.signals.
+    """
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+    staff_count = models.IntegerField(default=0)
+    subscription_count = models.IntegerField(default=0)
+    feedback_count = models.IntegerField(default=0)
+    upload_count = models.IntegerField(default=0)
+    # Uploads with stored prediction results
+    prediction_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Counters for client {self.client_id}"
+
+    @classmethod
+    def for_client(cls, company_id):
+        """Return a client's counters, counting from scratch the first time"""
+        try:
+            return cls.objects.get(pk=company_id)
+        except cls.DoesNotExist:
+            return cls.rebuild(company_id)
+
+    @classmethod
+    def rebuild(cls, company_id):
+        """Recount every total of a client"""
+        from django.apps import apps
+        from TeleChurn_Project.database import read_from_primary
+        uploads = apps.get_model('api', 'UploadedDataset').objects.filter(staff__client_id=company_id)
+        # Count what the primary has, not a possibly lagging replica
+        with read_from_primary():
+            counters, _ = cls.objects.update_or_create(client_id=company_id, defaults={
+                'staff_count': Staff.objects.filter(client_id=company_id).count(),
+                'subscription_count': Subscription.objects.filter(company_id=company_id).count(),
+                'feedback_count': Feedback.objects.filter(company_id=company_id).count(),
+                'upload_count': uploads.count(),
+                'prediction_count': uploads.exclude(results_file='').count(),
+            })
+        return counters
+
+    @classmethod
+    def adjust(cls, company_id, **deltas):
+        """
+        Add to a client's counters with a single UPDATE.
+
+        Clients without a counters row are skipped; for_client() counts them
+        when they are first read.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            cls.objects.filter(pk=company_id).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+    def check_staff_limit(self):
+        """
+        Raises:
+            StaffLimitError: If the client's active subscription has no free seat
+        """
+        subscription = Subscription.objects.filter(company_id=self.client_id, active=True).first()
+        if subscription:
+            max_staff = subscription.max_staff_allowed()
+            if max_staff is not None and self.staff_count >= max_staff:
+                raise StaffLimitError(f"Staff limit reached for this subscription plan ({subscription.plan_type}).")
+
+
+class IdSequence(models.Model):
+    """
+    Named counter handing out primary keys for models with manually assigned
+    IDs. Allocation is a single UPDATE on one row, so concurrent callers
+    never get the same ID.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, name, count=1, start_after=None):
+        """
+        Reserve count consecutive values of a sequence.
+
+        Args:
+            name (str): Sequence name
+            count (int): Number of values to reserve
+            start_after (callable): Returns the last value already in use, to
+                initialize a sequence the first time it is used
+
+        Returns:
+            int: The first reserved value
+        """
+        with transaction.atomic():
+            updated = cls.objects.filter(name=name).update(last_value=F('last_value') + count)
+            if not updated:
+                cls.objects.get_or_create(name=name, defaults={'last_value': start_after() if start_after else 0})
+                cls.objects.filter(name=name).update(last_value=F('last_value') + count)
+            # Still holding the row's write lock, so this reads our own update
+            last_value = cls.objects.filter(name=name).values_list('last_value', flat=True).get()
+        return last_value - count + 1
+
+
+class FeedbackRollup(models.Model):
+    """
+    Per-company feedback totals for one day or month, maintained on every
+    insert, edit and delete by clients.rollups and rebuildable with
+    `python manage.py rebuild_feedback_rollups`.
+    """
+    PERIODS = [
+        ('day', 'Day'),
+        ('month', 'Month'),
+    ]
+    company = models.ForeignKey(Client, on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    count = models.IntegerField(default=0)
+    score_sum = models.BigIntegerField(default=0)
+    # Histogram of feedback scores
+    score_1 = models.IntegerField(default=0)
+    score_2 = models.IntegerField(default=0)
+    score_3 = models.IntegerField(default=0)
+    score_4 = models.IntegerField(default=0)
+    score_5 = models.IntegerField(default=0)
+    complaint_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'period', 'period_start'], name='clients_feedback_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.company_id} {self.period} {self.period_start}: {self.count}"
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.count if self.count else None
@@ -0,0 +1,118 @@
+"""
+Incremental maintenance of FeedbackRollup.
+
+Every feedback entry is counted in its day and its month. Changes are
+applied as F() updates on the affected rollup rows, so concurrent writers
+never lose counts; rebuild_rollups() recomputes everything from the raw
+rows with one aggregate query per period.
+"""
+import logging
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Feedback, FeedbackRollup
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCORES = range(1, 6)
+
+
+def period_start(period, day):
+    return day if period == 'day' else day.replace(day=1)
+
+
+def apply_feedback(entries, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) feedback entries from the rollups.
+
+    Args:
+        entries: Iterable of Feedback.rollup_entry() tuples
+        sign (int): 1 or -1
+    """
+    deltas = {}
+    for company_id, feedback_date, score, has_complaint in entries:
+        for period, _ in FeedbackRollup.PERIODS:
+            delta = deltas.setdefault((company_id, period, period_start(period, feedback_date)), Counter())
+            delta['count'] += sign
+            delta['score_sum'] += sign * score
+            if score in SCORES:
+                delta[f'score_{score}'] += sign
+            delta['complaint_count'] += sign * int(has_complaint)
+    deltas = {key: {field: value for field, value in delta.items() if value} for key, delta in deltas.items()}
+    if not deltas:
+        return
+
+    existing = set(
+        FeedbackRollup.objects.filter(
+            company_id__in={key[0] for key in deltas}, period_start__in={key[2] for key in deltas}
+        ).values_list('company_id', 'period', 'period_start')
+    )
+    new = {key: delta for key, delta in deltas.items() if key not in existing and delta.get('count', 0) > 0}
+    if new:
+        try:
+            with transaction.atomic():
+                FeedbackRollup.objects.bulk_create([
+                    FeedbackRollup(company_id=company_id, period=period, period_start=start, **delta)
+                    for (company_id, period, start), delta in new.items()
+                ])
+        except IntegrityError:
+            # Some were created concurrently; fall back to one upsert each
+            new = {}
+    for (company_id, period, start), delta in deltas.items():
+        if (company_id, period, start) not in new:
+            _apply(company_id, period, start, delta)
+
+
+def _apply(company_id, period, start, delta):
+    rollups = FeedbackRollup.objects.filter(company_id=company_id, period=period, period_start=start)
+    updates = {field: F(field) + value for field, value in delta.items()}
+    if rollups.update(**updates) or delta.get('count', 0) <= 0:
+        # Nothing to remove from a period that was never counted
+        return
+    try:
+        with transaction.atomic():
+            FeedbackRollup.objects.create(company_id=company_id, period=period, period_start=start, **delta)
+    except IntegrityError:
+        # Created concurrently
+        rollups.update(**updates)
+
+
+def rebuild_rollups(company_id=None, feedback_model=Feedback, rollup_model=FeedbackRollup):
+    """
+    Recompute the rollups of one company, or of all of them, from raw feedback.
+
+    Args:
+        company_id (int): Only rebuild this company's rollups
+        feedback_model, rollup_model: The models to use; migrations pass
+            their historical versions
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    feedback = feedback_model.objects.all()
+    rollups = rollup_model.objects.all()
+    if company_id is not None:
+        feedback = feedback.filter(company_id=company_id)
+        rollups = rollups.filter(company_id=company_id)
+    totals = {
+        'count': Count('pk'),
+        'score_sum': Sum('feedback_score'),
+        'complaint_count': Count('pk', filter=Q(client_complaints__gt='')),
+        **{f'score_{score}': Count('pk', filter=Q(feedback_score=score)) for score in SCORES},
+    }
+    rows = []
+    for period, start in (('day', F('feedback_date')), ('month', TruncMonth('feedback_date'))):
+        for row in feedback.order_by().annotate(start=start).values('company_id', 'start').annotate(**totals):
+            rows.append(rollup_model(
+                company_id=row.pop('company_id'), period=period, period_start=row.pop('start'), **row
+            ))
+    with transaction.atomic():
+        rollups.delete()
+        rollup_model.objects.bulk_create(rows, batch_size=1000)
+    logger.info(f"Rebuilt {len(rows)} feedback rollups")
+    return len(rows)
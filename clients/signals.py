@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_profiles
+from .rollups import apply_feedback
+from .models import Client, ClientCounters, Feedback, Staff, Subscription
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_client_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.pk])
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_staff_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.client_id])
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def invalidate_company_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.company_id])
+
+
+# Counter kept for each model in ClientCounters
+COUNTER_FIELDS = {Staff: 'staff_count', Subscription: 'subscription_count', Feedback: 'feedback_count'}
+
+
+def _owner_id(sender, instance):
+    return instance.client_id if sender is Staff else instance.company_id
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_save, sender=Subscription)
+@receiver(post_save, sender=Feedback)
+def count_saved(sender, instance, created, **kwargs):
+    field = COUNTER_FIELDS[sender]
+    owner_id = _owner_id(sender, instance)
+    previous = getattr(instance, '_counted_client_id', None)
+    if created:
+        ClientCounters.adjust(owner_id, **{field: 1})
+    elif previous is not None and previous != owner_id:
+        # Moved to another client
+        ClientCounters.adjust(previous, **{field: -1})
+        ClientCounters.adjust(owner_id, **{field: 1})
+    instance._counted_client_id = owner_id
+
+
+@receiver(post_delete, sender=Staff)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_delete, sender=Feedback)
+def count_deleted(sender, instance, **kwargs):
+    owner_id = getattr(instance, '_counted_client_id', None) or _owner_id(sender, instance)
+    ClientCounters.adjust(owner_id, **{COUNTER_FIELDS[sender]: -1})
+
+
+@receiver(pre_save, sender=Feedback)
+def load_rollup_entry(sender, instance, **kwargs):
+    # Instances not loaded from the database (e.g. built with the ID of an
+    # existing row) do not know what that row counted before this save
+    if getattr(instance, '_rollup_entry', None) is None and instance.pk is not None:
+        stored = sender.objects.filter(pk=instance.pk).first()
+        if stored is not None:
+            instance._rollup_entry = stored._rollup_entry
+
+
+@receiver(post_save, sender=Feedback)
+def roll_up_feedback(sender, instance, created, **kwargs):
+    entry = instance.rollup_entry()
+    previous = getattr(instance, '_rollup_entry', None)
+    if created:
+        apply_feedback([entry])
+    elif previous is not None and previous != entry:
+        apply_feedback([previous], sign=-1)
+        apply_feedback([entry])
+    instance._rollup_entry = entry
+
+
+@receiver(post_delete, sender=Feedback)
+def unroll_feedback(sender, instance, **kwargs):
+    apply_feedback([getattr(instance, '_rollup_entry', None) or instance.rollup_entry()], sign=-1)
@@ -1 +1,401 @@
-from django.test import TestCase
+import tempfile
+from datetime import date
+
+import pandas as pd
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .admin import StaffAdminForm
+from .cache import get_cached_profile
+from .feedback import import_feedback
+from .models import Client, ClientCounters, Feedback, FeedbackRollup, IdSequence, Staff, StaffLimitError, Subscription
+from .rollups import rebuild_rollups
+
+
+def make_client(company_id):
+    return Client.objects.create(
+        company_id=company_id, company_name=f"Client {company_id}", company_address='-',
+        company_contact_no='0', company_email=f"client{company_id}@example.com", password='-',
+    )
+
+
+def make_staff(client, staff_id):
+    return Staff.objects.create(
+        staff_id=staff_id, client=client, name=staff_id, email=f"{staff_id}@example.com", password='-',
+    )
+
+
+COUNTER_FIELDS = ['staff_count', 'subscription_count', 'feedback_count', 'upload_count', 'prediction_count']
+
+
+class ClientCountersTests(TestCase):
+    def setUp(self):
+        self.first = make_client(1)
+        self.second = make_client(2)
+        # Counters rows exist from the first read on; adjustments only apply to existing rows
+        ClientCounters.for_client(1)
+        ClientCounters.for_client(2)
+
+    def counters(self, company_id):
+        counters = ClientCounters.objects.get(pk=company_id)
+        return {field: getattr(counters, field) for field in COUNTER_FIELDS}
+
+    def assertMatchesRebuild(self, *company_ids):
+        for company_id in company_ids:
+            maintained = self.counters(company_id)
+            ClientCounters.rebuild(company_id)
+            self.assertEqual(maintained, self.counters(company_id))
+
+    def test_create_and_delete(self):
+        staff = make_staff(self.first, 's1')
+        Subscription.objects.create(subscription_id=1, company=self.first, plan_type='basic')
+        feedback = Feedback.objects.create(feedback_id=1, company=self.first, feedback_date=date(2026, 1, 1), feedback_score=4)
+        self.assertEqual(self.counters(1)['staff_count'], 1)
+        self.assertEqual(self.counters(1)['subscription_count'], 1)
+        self.assertEqual(self.counters(1)['feedback_count'], 1)
+
+        staff.delete()
+        feedback.delete()
+        self.assertEqual(self.counters(1)['staff_count'], 0)
+        self.assertEqual(self.counters(1)['feedback_count'], 0)
+        self.assertMatchesRebuild(1)
+
+    def test_saving_without_changes_does_not_count_again(self):
+        staff = make_staff(self.first, 's1')
+        staff.name = 'Renamed'
+        staff.save()
+        Staff.objects.get(pk='s1').save()
+        self.assertEqual(self.counters(1)['staff_count'], 1)
+
+    def test_reassigning_moves_counts_between_clients(self):
+        make_staff(self.first, 's1')
+        Subscription.objects.create(subscription_id=1, company=self.first, plan_type='basic')
+        Feedback.objects.create(feedback_id=1, company=self.first, feedback_date=date(2026, 1, 1), feedback_score=4)
+
+        staff = Staff.objects.get(pk='s1')
+        staff.client = self.second
+        staff.save()
+        subscription = Subscription.objects.get(pk=1)
+        subscription.company = self.second
+        subscription.save()
+        feedback = Feedback.objects.get(pk=1)
+        feedback.company = self.second
+        feedback.save()
+
+        self.assertEqual(self.counters(1)['staff_count'], 0)
+        self.assertEqual(self.counters(2)['staff_count'], 1)
+        self.assertMatchesRebuild(1, 2)
+
+    def test_deleting_after_reassignment_in_memory_uses_stored_client(self):
+        make_staff(self.first, 's1')
+        staff = Staff.objects.get(pk='s1')
+        staff.client = self.second
+        staff.delete()
+        self.assertMatchesRebuild(1, 2)
+
+    def test_staff_limit(self):
+        Subscription.objects.create(subscription_id=1, company=self.first, plan_type='basic', active=True)
+        for n in range(5):
+            Staff.create_within_limit(self.first, staff_id=f"s{n}", name='-', email='s@example.com', password='-')
+        with self.assertRaises(StaffLimitError):
+            Staff.create_within_limit(self.first, staff_id='s5', name='-', email='s@example.com', password='-')
+
+    def test_staff_limit_is_checked_under_a_write_lock(self):
+        Subscription.objects.create(subscription_id=1, company=self.first, plan_type='basic', active=True)
+        for n in range(4):
+            make_staff(self.first, f"s{n}")
+        with CaptureQueriesContext(connection) as queries:
+            Staff.create_within_limit(self.first, staff_id='s4', name='-', email='s@example.com', password='-')
+        # The counters row is written before the limit is read, which also locks on SQLite
+        statements = [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertTrue(statements[0].startswith('UPDATE "clients_clientcounters"'), statements[0])
+        with self.assertRaises(StaffLimitError):
+            Staff.create_within_limit(self.first, staff_id='s5', name='-', email='s@example.com', password='-')
+        self.assertEqual(self.counters(1)['staff_count'], 5)
+
+    def test_staff_limit_after_moving_staff_away(self):
+        Subscription.objects.create(subscription_id=1, company=self.first, plan_type='basic', active=True)
+        for n in range(5):
+            make_staff(self.first, f"s{n}")
+        staff = Staff.objects.get(pk='s0')
+        staff.client = self.second
+        staff.save()
+        # The seat freed by the move can be taken again
+        Staff.create_within_limit(self.first, staff_id='s5', name='-', email='s@example.com', password='-')
+        self.assertEqual(self.counters(1)['staff_count'], 5)
+
+
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        self.client_row = make_client(1)
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return {'builds': self.builds}
+
+    def test_process_local_cache_is_bypassed(self):
+        # The default LocMemCache could not be invalidated from other processes
+        get_cached_profile(1, self.build)
+        get_cached_profile(1, self.build)
+        self.assertEqual(self.builds, 2)
+
+    def test_shared_cache_until_invalidated(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            cache.clear()
+            self.assertEqual(get_cached_profile(1, self.build), {'builds': 1})
+            self.assertEqual(get_cached_profile(1, self.build), {'builds': 1})
+
+            make_staff(self.client_row, 's1')
+            self.assertEqual(get_cached_profile(1, self.build), {'builds': 2})
+            Feedback.objects.create(feedback_id=1, company=self.client_row, feedback_date=date(2026, 1, 1), feedback_score=3)
+            self.assertEqual(get_cached_profile(1, self.build), {'builds': 3})
+
+
+class IdSequenceTests(TestCase):
+    def setUp(self):
+        self.client_row = make_client(1)
+
+    def test_allocates_consecutive_ranges(self):
+        self.assertEqual(IdSequence.allocate('test'), 1)
+        self.assertEqual(IdSequence.allocate('test', 10), 2)
+        self.assertEqual(IdSequence.allocate('test'), 12)
+        self.assertEqual(IdSequence.allocate('other'), 1)
+
+    def test_first_allocation_starts_after_existing_feedback(self):
+        Feedback.objects.create(feedback_id=41, company=self.client_row, feedback_date=date(2026, 1, 1), feedback_score=4)
+        self.assertEqual(Feedback.allocate_ids(3), 42)
+        self.assertEqual(Feedback.allocate_ids(), 45)
+
+    def test_feedback_saved_without_id_takes_the_next_one(self):
+        first = Feedback.allocate_ids(2)
+        feedback = Feedback.objects.create(company=self.client_row, feedback_date=date(2026, 1, 1), feedback_score=4)
+        self.assertEqual(feedback.feedback_id, first + 2)
+
+    def test_admin_assigns_feedback_id_from_the_sequence(self):
+        Feedback.allocate_ids(5)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post('/admin/clients/feedback/add/', {
+            'feedback_id': 1, 'company': self.client_row.pk, 'feedback_date': '2026-01-01', 'feedback_score': 4,
+        })
+        self.assertEqual(response.status_code, 302)
+        # The submitted ID is ignored; the field is read-only
+        self.assertEqual(list(Feedback.objects.values_list('feedback_id', flat=True)), [6])
+
+
+ROLLUP_FIELDS = ['company_id', 'period', 'period_start', 'count', 'score_sum', 'complaint_count',
+                 'score_1', 'score_2', 'score_3', 'score_4', 'score_5']
+
+
+class FeedbackRollupTests(TestCase):
+    def setUp(self):
+        self.first = make_client(1)
+        self.second = make_client(2)
+
+    def rollups(self):
+        rows = list(FeedbackRollup.objects.order_by('company_id', 'period', 'period_start').values(*ROLLUP_FIELDS))
+        # Periods whose feedback was all removed keep an all-zero row; a rebuild drops it
+        emptied = [row for row in rows if not row['count']]
+        self.assertTrue(all(not any(row[field] for field in ROLLUP_FIELDS[3:]) for row in emptied))
+        return [row for row in rows if row['count']]
+
+    def assertMatchesRebuild(self):
+        maintained = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(maintained, self.rollups())
+
+    def feedback(self, company, day, score, complaint=''):
+        return Feedback.objects.create(company=company, feedback_date=day, feedback_score=score, client_complaints=complaint)
+
+    def test_inserts_edits_and_deletes(self):
+        kept = self.feedback(self.first, date(2026, 1, 5), 4)
+        moved = self.feedback(self.first, date(2026, 1, 5), 2, 'Slow support')
+        removed = self.feedback(self.first, date(2026, 2, 1), 5)
+        self.feedback(self.second, date(2026, 1, 5), 1)
+
+        moved = Feedback.objects.get(pk=moved.pk)
+        moved.feedback_date = date(2026, 3, 9)
+        moved.feedback_score = 3
+        moved.company = self.second
+        moved.save()
+        kept.client_complaints = 'Billing error'
+        kept.save()
+        removed.delete()
+        self.assertMatchesRebuild()
+
+        january = FeedbackRollup.objects.get(company=self.first, period='month', period_start=date(2026, 1, 1))
+        self.assertEqual((january.count, january.score_sum, january.score_4, january.complaint_count), (1, 4, 1, 1))
+
+    def test_bulk_import(self):
+        frame = pd.DataFrame({
+            'feedback_score': [1, 2, 5, 5],
+            'client_complaints': ['', 'Outage', '', ''],
+            'feedback_date': ['2026-01-01', '2026-01-01', '2026-01-31', '2026-02-01'],
+        })
+        import_feedback(self.first, frame)
+        self.feedback(self.first, date(2026, 1, 1), 3)
+        self.assertMatchesRebuild()
+        self.assertEqual(FeedbackRollup.objects.get(company=self.first, period='day', period_start=date(2026, 1, 1)).count, 3)
+
+    def test_queryset_delete(self):
+        for day in (1, 2, 2):
+            self.feedback(self.first, date(2026, 1, day), day)
+        Feedback.objects.filter(feedback_date=date(2026, 1, 2)).delete()
+        self.assertMatchesRebuild()
+
+    def test_update_through_an_instance_not_loaded_from_the_database(self):
+        original = self.feedback(self.first, date(2026, 1, 5), 2, 'Slow support')
+        Feedback(feedback_id=original.feedback_id, company=self.second,
+                 feedback_date=date(2026, 2, 7), feedback_score=5).save()
+        self.assertMatchesRebuild()
+        self.assertFalse(FeedbackRollup.objects.filter(company=self.first, count__gt=0).exists())
+
+
+class FeedbackRollupMigrationTests(TransactionTestCase):
+    before = [('clients', '0008_idsequence')]
+    after = [('clients', '0009_feedbackrollup')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_existing_feedback_is_rolled_up(self):
+        apps = self.migrate(self.before)
+        Client = apps.get_model('clients', 'Client')
+        Feedback = apps.get_model('clients', 'Feedback')
+        company = Client.objects.create(
+            company_id=1, company_name='Client 1', company_address='-', company_contact_no='0',
+            company_email='client1@example.com', password='-',
+        )
+        for feedback_id, day in enumerate((1, 1, 20), start=1):
+            Feedback.objects.create(feedback_id=feedback_id, company=company,
+                                    feedback_date=date(2026, 1, day), feedback_score=feedback_id)
+
+        FeedbackRollup = self.migrate(self.after).get_model('clients', 'FeedbackRollup')
+        rollups = FeedbackRollup.objects.order_by('period', 'period_start')
+        self.assertEqual(
+            [(row.period, row.period_start, row.count, row.score_sum) for row in rollups],
+            [('day', date(2026, 1, 1), 2, 3), ('day', date(2026, 1, 20), 1, 3), ('month', date(2026, 1, 1), 3, 6)],
+        )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class FeedbackHistoryTests(TestCase):
+    def setUp(self):
+        self.client_row = make_client(1)
+        Client.objects.filter(pk=1).update(password=make_password('pw123456'))
+        response = self.client.post('/api/client/login/', {'company_id': 1, 'password': 'pw123456'},
+                                    content_type='application/json', HTTP_HOST='localhost')
+        self.api = self.client_class(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f"Bearer {response.json()['token']}")
+        # Three entries a day, so pages end in the middle of a day
+        for n in range(25):
+            Feedback.objects.create(company=self.client_row, feedback_date=date(2026, 1, 1 + n // 3), feedback_score=1 + n % 5)
+        self.expected = list(Feedback.objects.order_by('-feedback_date', '-feedback_id').values_list('feedback_id', flat=True))
+
+    def walk(self, params):
+        ids = []
+        while True:
+            page = self.api.get('/api/client/feedback/', params).json()
+            ids += [row['feedback_id'] for row in page['results']]
+            if not page['next_cursor']:
+                return ids
+            params = dict(params, cursor=page['next_cursor'])
+
+    def test_cursor_pages_cover_every_entry_once(self):
+        self.assertEqual(self.walk({'limit': 4}), self.expected)
+
+    def test_profile_continues_into_the_feedback_pages(self):
+        profile = self.api.get('/api/client/profile/').json()
+        recent = [row['feedback_id'] for row in profile['feedback_history']]
+        self.assertEqual(recent, self.expected[:20])
+        older = self.walk({'cursor': profile['feedback_next_cursor']})
+        self.assertEqual(older, self.expected[20:])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.api.get('/api/client/feedback/', {'cursor': 'garbage'}).status_code, 400)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+        self.first = make_client(1)
+        self.second = make_client(2)
+
+    def changelist(self, **params):
+        response = self.client.get('/admin/clients/client/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_staff_count_column(self):
+        for n in range(3):
+            make_staff(self.first, f"s{n}")
+        make_staff(self.second, 's3')
+        changelist = self.changelist()
+        counts = {row.pk: changelist.model_admin.staff_count(row) for row in changelist.result_list}
+        self.assertEqual(counts, {1: 3, 2: 1})
+
+        # Counted in the changelist query: more clients, no more queries
+        with CaptureQueriesContext(connection) as before:
+            self.changelist()
+        for company_id in (3, 4):
+            make_staff(make_client(company_id), f"s{company_id + 10}")
+        with CaptureQueriesContext(connection) as after:
+            changelist = self.changelist(o='4')
+        self.assertEqual(len(after), len(before))
+        self.assertEqual([row.pk for row in changelist.result_list][-1], 1)
+
+    def activate(self, *subscription_ids):
+        return self.client.post('/admin/clients/subscription/', {
+            'action': 'activate_subscriptions', '_selected_action': subscription_ids,
+        }, follow=True)
+
+    def active(self):
+        return set(Subscription.objects.filter(active=True).values_list('pk', flat=True))
+
+    def test_activate_is_all_or_nothing(self):
+        Subscription.objects.create(subscription_id=1, company=self.first, plan_type='basic')
+        Subscription.objects.create(subscription_id=2, company=self.second, plan_type='basic')
+        Subscription.objects.create(subscription_id=3, company=self.second, plan_type='partner', active=True)
+
+        response = self.activate(1, 2)
+        self.assertContains(response, 'No subscriptions were activated; check: Client 2.')
+        self.assertEqual(self.active(), {3})
+
+        # Two subscriptions of the same client in one selection conflict as well
+        Subscription.objects.create(subscription_id=4, company=self.first, plan_type='standard')
+        response = self.activate(1, 4)
+        self.assertContains(response, 'check: Client 1.')
+        self.assertEqual(self.active(), {3})
+
+        response = self.activate(1)
+        self.assertContains(response, '1 subscription(s) have been activated.')
+        self.assertEqual(self.active(), {1, 3})
+
+    def test_staff_form_enforces_the_staff_limit(self):
+        Subscription.objects.create(subscription_id=1, company=self.first, plan_type='basic', active=True)
+        for n in range(5):
+            make_staff(self.first, f"s{n}")
+        data = {'staff_id': 's5', 'client': 1, 'name': 's5', 'email': 's5@example.com', 'password': 'pw'}
+        form = StaffAdminForm(data=data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('Staff limit reached for this subscription plan (basic).', form.non_field_errors())
+
+        # Editing a staff member who already holds a seat is not blocked
+        staff = Staff.objects.get(pk='s0')
+        form = StaffAdminForm(data={**data, 'staff_id': 's0', 'name': 'Renamed'}, instance=staff)
+        self.assertTrue(form.is_valid(), form.errors)
+        # Nor is moving one to a client with room
+        self.assertTrue(StaffAdminForm(data={**data, 'client': 2}).is_valid())
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import ClientHomeView, FeedbackSubmissionView, ClientProfileView
+from .views import ClientHomeView, FeedbackSubmissionView, FeedbackImportView, FeedbackAnalyticsView, ClientProfileView
 
 urlpatterns = [
     path('client/home/', ClientHomeView.as_view(), name='client-home'),
     path('client/feedback/', FeedbackSubmissionView.as_view(), name='client-feedback'),
+    path('client/feedback/import/', FeedbackImportView.as_view(), name='client-feedback-import'),
+    path('client/feedback/analytics/', FeedbackAnalyticsView.as_view(), name='client-feedback-analytics'),
     path('client/profile/', ClientProfileView.as_view(), name='client-profile'),
 ]
@@ -3,49 +3,61 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import Client, Staff, Subscription, Feedback
+from rest_framework.parsers import JSONParser, MultiPartParser
+from .models import Client, ClientCounters, Staff, StaffLimitError, Subscription, Feedback, FeedbackRollup
 from .serializers import ClientSerializer, StaffSerializer, SubscriptionSerializer, FeedbackSerializer
+from .cache import get_cached_profile
+from .feedback import FeedbackImportError, import_feedback, read_feedback_csv, read_feedback_records
 from api.authentication import ClientJWTAuthentication
+from api.pagination import PaginationError, decode_cursor, encode_cursor, parse_limit
+from TeleChurn_Project.database import ReplicaReadMixin, read_from_primary
 from django.contrib.auth.hashers import make_password
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.utils.dateparse import parse_date
 from datetime import date
 from api.views import SubscriptionSerializer
 
 # Create your views here.
 
-class ClientProfileView(APIView):
+# Newest first; feedback_id breaks ties within a day
+FEEDBACK_ORDER = ('-feedback_date', '-feedback_id')
+# Feedback rows embedded in the profile; older ones are paged via /api/client/feedback/
+PROFILE_FEEDBACK_LIMIT = 20
+
+
+def feedback_page(feedback, limit):
+    """
+    Serialize one page of feedback.
+
+    Args:
+        feedback: Feedback rows in FEEDBACK_ORDER, at most limit + 1 of them
+        limit (int): Page size
+
+    Returns:
+        tuple: (serialized rows, cursor of the next page or None)
+    """
+    rows = list(feedback)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].feedback_date.isoformat(), rows[-1].feedback_id])
+    return FeedbackSerializer(rows, many=True).data, next_cursor
+
+
+class ClientProfileView(ReplicaReadMixin, APIView):
     authentication_classes = [ClientJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        """
+        Return the client's details, staff, subscriptions and most recent
+        feedback. The profile is cached per client until any of them change;
+        feedback_next_cursor pages through older feedback via
+        GET /api/client/feedback/?cursor=.
+        """
         try:
             client = request.user
-            
-            # Get client's staff members
-            staff_members = Staff.objects.filter(client=client)
-            staff_data = StaffSerializer(staff_members, many=True).data
-            
-            # Get client's subscriptions
-            subscriptions = Subscription.objects.filter(company=client)
-            subscription_data = SubscriptionSerializer(subscriptions, many=True).data
-            
-            # Get client's feedback history
-            feedback_history = Feedback.objects.filter(company=client).order_by('-feedback_date')
-            feedback_data = FeedbackSerializer(feedback_history, many=True).data
-            
-            # Prepare response data
-            response_data = {
-                'client_info': {
-                    'company_id': client.company_id,
-                    'company_name': client.company_name,
-                    'company_email': client.company_email,
-                    'company_address': client.company_address,
-                    'company_contact_no': client.company_contact_no,
-                },
-                'staff_members': staff_data,
-                'subscriptions': subscription_data,
-                'feedback_history': feedback_data
-            }
-            
+            response_data = get_cached_profile(client.pk, lambda: self._build_profile(client))
             return Response(response_data, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -54,7 +66,38 @@ class ClientProfileView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class ClientHomeView(APIView):
+    @staticmethod
+    def _build_profile(client):
+        # The profile is cached until the next change, so build it from the
+        # primary rather than a replica that may not have that change yet.
+        # One query per relation, however many rows each has.
+        with read_from_primary():
+            prefetch_related_objects(
+                [client],
+                'staff_set',
+                'subscription_set',
+                Prefetch(
+                    'feedback_set',
+                    queryset=Feedback.objects.order_by(*FEEDBACK_ORDER)[:PROFILE_FEEDBACK_LIMIT + 1],
+                    to_attr='recent_feedback',
+                ),
+            )
+        feedback_data, next_cursor = feedback_page(client.recent_feedback, PROFILE_FEEDBACK_LIMIT)
+        return {
+            'client_info': {
+                'company_id': client.company_id,
+                'company_name': client.company_name,
+                'company_email': client.company_email,
+                'company_address': client.company_address,
+                'company_contact_no': client.company_contact_no,
+            },
+            'staff_members': StaffSerializer(client.staff_set.all(), many=True).data,
+            'subscriptions': SubscriptionSerializer(client.subscription_set.all(), many=True).data,
+            'feedback_history': feedback_data,
+            'feedback_next_cursor': next_cursor,
+        }
+
+class ClientHomeView(ReplicaReadMixin, APIView):
     authentication_classes = [ClientJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
@@ -62,17 +105,17 @@ class ClientHomeView(APIView):
         try:
             client = request.user
             
-            # Get summary counts
-            staff_count = Staff.objects.filter(client=client).count()
-            subscription_count = Subscription.objects.filter(company=client).count()
-            feedback_count = Feedback.objects.filter(company=client).count()
+            # Get summary counts (maintained by signals, one primary-key read)
+            counters = ClientCounters.for_client(client.pk)
             
             # Prepare response data with only shortcuts and summary
             response_data = {
                 'summary': {
-                    'total_staff': staff_count,
-                    'total_subscriptions': subscription_count,
-                    'total_feedback': feedback_count
+                    'total_staff': counters.staff_count,
+                    'total_subscriptions': counters.subscription_count,
+                    'total_feedback': counters.feedback_count,
+                    'total_uploads': counters.upload_count,
+                    'total_predictions': counters.prediction_count
                 },
                 'shortcuts': {
                     'add_staff': {
@@ -105,6 +148,38 @@ class FeedbackSubmissionView(APIView):
     authentication_classes = [ClientJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        """
+        Page through the client's feedback, newest first:
+        ?limit=50, then ?cursor=<next_cursor> for the following pages.
+        Returns { "results": [...], "next_cursor": <token or null> }.
+        """
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+            feedback = Feedback.objects.filter(company=request.user).order_by(*FEEDBACK_ORDER)
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                feedback_date, feedback_id = decode_cursor(cursor, 2)
+                try:
+                    feedback_date = parse_date(str(feedback_date))
+                    feedback_id = int(feedback_id)
+                except (TypeError, ValueError):
+                    feedback_date = None
+                if feedback_date is None:
+                    raise PaginationError("Invalid cursor.")
+                feedback = feedback.filter(
+                    Q(feedback_date__lt=feedback_date) | Q(feedback_date=feedback_date, feedback_id__lt=feedback_id)
+                )
+            results, next_cursor = feedback_page(feedback[:limit + 1], limit)
+            return Response({'results': results, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+        except PaginationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     def post(self, request):
         try:
             client = request.user
@@ -117,13 +192,9 @@ class FeedbackSubmissionView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Get the next feedback_id
-            last_feedback = Feedback.objects.order_by('-feedback_id').first()
-            next_id = (last_feedback.feedback_id + 1) if last_feedback else 1
-            
-            # Create new feedback
+            # Create new feedback under an ID reserved from the feedback sequence
             feedback = Feedback.objects.create(
-                feedback_id=next_id,
+                feedback_id=Feedback.allocate_ids(),
                 company=client,
                 feedback_date=date.today(),
                 feedback_score=feedback_score,
@@ -141,6 +212,98 @@ class FeedbackSubmissionView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class FeedbackImportView(APIView):
+    authentication_classes = [ClientJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = (JSONParser, MultiPartParser)
+
+    def post(self, request):
+        """
+        Import many feedback entries at once, either as a JSON array of
+        {feedback_score, client_complaints, feedback_date} objects or as a
+        CSV file (multipart field "file") with those columns. feedback_date
+        (YYYY-MM-DD) defaults to today. Nothing is imported if any row is invalid.
+        """
+        try:
+            file_obj = request.FILES.get('file')
+            if file_obj is not None:
+                frame = read_feedback_csv(file_obj)
+            else:
+                frame = read_feedback_records(request.data)
+            feedback_ids = import_feedback(request.user, frame)
+            return Response({
+                'message': 'Feedback imported successfully',
+                'imported': len(feedback_ids),
+                'first_feedback_id': feedback_ids.start,
+                'last_feedback_id': feedback_ids.stop - 1,
+            }, status=status.HTTP_201_CREATED)
+
+        except FeedbackImportError as e:
+            return Response({'error': str(e), 'rows': e.rows}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+def rollup_summary(rollups):
+    """Combine FeedbackRollup rows into count, mean score, score histogram and complaint count"""
+    count = sum(rollup.count for rollup in rollups)
+    score_sum = sum(rollup.score_sum for rollup in rollups)
+    return {
+        'count': count,
+        'mean_score': round(score_sum / count, 4) if count else None,
+        'histogram': {str(score): sum(getattr(rollup, f'score_{score}') for rollup in rollups) for score in range(1, 6)},
+        'complaint_count': sum(rollup.complaint_count for rollup in rollups),
+    }
+
+class FeedbackAnalyticsView(APIView):
+    authentication_classes = [ClientJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Feedback trend of the client from the precomputed rollups:
+        ?period=month (default) or day, optionally ?date_from= and
+        ?date_to= (YYYY-MM-DD). Returns one entry per period with feedback,
+        plus totals over the range.
+        """
+        try:
+            period = request.query_params.get('period', 'month')
+            if period not in dict(FeedbackRollup.PERIODS):
+                return Response({'error': 'period must be day or month.'}, status=status.HTTP_400_BAD_REQUEST)
+            rollups = FeedbackRollup.objects.filter(company=request.user, period=period)
+            for param, lookup in (('date_from', 'period_start__gte'), ('date_to', 'period_start__lte')):
+                value = request.query_params.get(param)
+                if not value:
+                    continue
+                try:
+                    day = parse_date(value)
+                except ValueError:
+                    day = None
+                if day is None:
+                    return Response({'error': f'{param} must be a date (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+                if period == 'month' and param == 'date_from':
+                    # Include the month date_from falls in
+                    day = day.replace(day=1)
+                rollups = rollups.filter(**{lookup: day})
+            rollups = list(rollups.order_by('period_start'))
+
+            return Response({
+                'period': period,
+                'series': [
+                    {'period_start': rollup.period_start, **rollup_summary([rollup])}
+                    for rollup in rollups
+                ],
+                'totals': rollup_summary(rollups),
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class StaffRegistrationView(APIView):
     authentication_classes = [ClientJWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -165,14 +328,17 @@ class StaffRegistrationView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Create new staff member
-            staff = Staff.objects.create(
-                staff_id=request.data['staff_id'],
-                client=client,
-                name=request.data['name'],
-                email=request.data['email'],
-                password=make_password(request.data['password'])
-            )
+            # Create new staff member within the subscription's staff limit
+            try:
+                staff = Staff.create_within_limit(
+                    client,
+                    staff_id=request.data['staff_id'],
+                    name=request.data['name'],
+                    email=request.data['email'],
+                    password=make_password(request.data['password'])
+                )
+            except StaffLimitError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             return Response({
                 'message': 'Staff registered successfully',
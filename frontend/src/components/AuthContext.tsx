@@ -5,10 +5,15 @@ interface AuthContextType {
   isAuthenticated: boolean;
   username: string | null;
   userType: string | null;
-  login: (token: string, userType: string, userId: string, username: string) => void;
+  login: (token: string, userType: string, userId: string, username: string, refreshToken?: string) => void;
   logout: () => void;
 }
 
+const REFRESH_URL = 'http://127.0.0.1:8000/api/auth/refresh/';
+const LOGOUT_URL = 'http://127.0.0.1:8000/api/auth/logout/';
+// Renew the access token this long before it expires
+const REFRESH_MARGIN_MS = 60 * 1000;
+
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
 
 function decodeJWT(token: string) {
@@ -50,8 +55,37 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
     setUsername(displayName);
   }, []);
 
-  const login = (token: string, userType: string, userId: string, username: string) => {
+  // Exchange the refresh token for a new access token shortly before the
+  // current one expires, so users are not sent back to the login page
+  useEffect(() => {
+    if (!isAuthenticated) return;
+    let timer: ReturnType<typeof setTimeout>;
+    const schedule = () => {
+      const decoded = decodeJWT(localStorage.getItem('authToken') || '');
+      if (!decoded || !decoded.exp || !localStorage.getItem('refreshToken')) return;
+      const delay = Math.max(decoded.exp * 1000 - Date.now() - REFRESH_MARGIN_MS, 0);
+      timer = setTimeout(async () => {
+        try {
+          const response = await axios.post(REFRESH_URL, { refresh: localStorage.getItem('refreshToken') });
+          localStorage.setItem('authToken', response.data.token);
+          localStorage.setItem('refreshToken', response.data.refresh);
+          axios.defaults.headers.common['Authorization'] = `Bearer ${response.data.token}`;
+          schedule();
+        } catch {
+          logout();
+        }
+      }, delay);
+    };
+    schedule();
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [isAuthenticated]);
+
+  const login = (token: string, userType: string, userId: string, username: string, refreshToken?: string) => {
     localStorage.setItem('authToken', token);
+    if (refreshToken) {
+      localStorage.setItem('refreshToken', refreshToken);
+    }
     localStorage.setItem('userType', userType);
     localStorage.setItem('userId', userId);
     localStorage.setItem('username', username);
@@ -61,7 +95,12 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      axios.post(LOGOUT_URL, { refresh: refreshToken }).catch(() => undefined);
+    }
     localStorage.removeItem('authToken');
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('username');
     localStorage.removeItem('userType');
     localStorage.removeItem('userId');
@@ -51,7 +51,7 @@ export default function LoginPage() {
             displayName = decoded.name;
           }
         }
-        login(token, userType, idInput, displayName);
+        login(token, userType, idInput, displayName, response.data.refresh);
         axios.defaults.headers.common['Authorization'] = `Bearer ${token}`;
         navigate("/");
       } else {
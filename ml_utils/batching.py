@@ -0,0 +1,210 @@
+"""
+Cross-request micro-batching for the TeleChurn prediction system.
+
+Every predict_proba call on the ensemble has a fixed overhead that dominates
+when requests carry only a few customers. The MicroBatcher queues concurrent
+scoring requests, runs them through the model as one batch and hands every
+caller its own slice of the probabilities.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from .predictor import ModelPredictionError, _validate_threshold
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of recent batches used for the percentile metrics
+METRICS_WINDOW = 1000
+
+
+class _Request:
+    __slots__ = ('records', 'threshold', 'future', 'enqueued_at')
+
+    def __init__(self, records, threshold):
+        self.records = records
+        self.threshold = threshold
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    def __init__(self, get_predictor, max_batch_size=64, max_wait_ms=5, timeout=30):
+        """
+        Initialize a batcher in front of a predictor.
+
+        Args:
+            get_predictor (callable): Returns the ChurnPredictor to use, e.g.
+                model_registry.get_predictor, so reloaded models are picked up
+            max_batch_size (int): Most records scored in one model call
+            max_wait_ms (float): Longest a request waits for others to join its batch
+            timeout (float): Seconds a caller waits for its result
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.get_predictor = get_predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        # Average requests per batch; waiting only pays off under concurrency
+        self._load = 1.0
+        self._reset_metrics()
+
+    def predict_records(self, records, threshold=None):
+        """
+        Score records as part of the next batch, blocking until they are done.
+
+        Has the same signature and return value as ChurnPredictor.predict_records,
+        so the two can be used interchangeably.
+
+        Raises:
+            ModelPredictionError: If prediction fails or times out
+            DataPreprocessingError: If these records cannot be preprocessed
+        """
+        if threshold is not None:
+            _validate_threshold(threshold)
+        request = _Request(list(records), threshold)
+        self._ensure_started().put(request)
+        try:
+            return request.future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise ModelPredictionError(f"Scoring timed out after {self.timeout}s")
+
+    def close(self):
+        """Stop the batching thread after it finishes the queued requests"""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                self._queue.put(None)
+                self._thread.join()
+            self._thread = None
+            self._queue = None
+
+    def metrics(self):
+        """Return a JSON-serializable snapshot of batch sizes and queue waits"""
+        with self._lock:
+            sizes = np.array(self._sizes) if self._sizes else np.zeros(1)
+            waits = np.array(self._waits) * 1000 if self._waits else np.zeros(1)
+            return {
+                'requests': self._requests,
+                'batches': self._batches,
+                'records': self._records,
+                'failed_batches': self._failed,
+                'batch_size': {
+                    'mean': round(float(sizes.mean()), 2),
+                    'p95': float(np.percentile(sizes, 95)),
+                    'max': int(self._max_size),
+                },
+                'queue_wait_ms': {
+                    'mean': round(float(waits.mean()), 3),
+                    'p50': round(float(np.percentile(waits, 50)), 3),
+                    'p95': round(float(np.percentile(waits, 95)), 3),
+                    'max': round(self._max_wait * 1000, 3),
+                },
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+            }
+
+    def _reset_metrics(self):
+        self._requests = 0
+        self._batches = 0
+        self._records = 0
+        self._failed = 0
+        self._max_size = 0
+        self._max_wait = 0.0
+        self._sizes = deque(maxlen=METRICS_WINDOW)
+        self._waits = deque(maxlen=METRICS_WINDOW)
+
+    def _ensure_started(self):
+        """Start the batching thread, again after a fork (threads do not survive it)"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name='micro-batcher', daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def _run(self, requests):
+        while True:
+            first = requests.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(requests, first)
+            self._score(batch)
+            self._load = 0.9 * self._load + 0.1 * len(batch)
+            if stopping:
+                return
+
+    def _collect(self, requests, first):
+        """Gather requests for one batch; returns (batch, stop_requested)"""
+        batch = [first]
+        size = len(first.records)
+        # Without concurrent traffic nobody will join, so do not wait for them
+        deadline = first.enqueued_at + (self.max_wait if self._load > 1.05 else 0)
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+            size += len(request.records)
+        return batch, False
+
+    def _score(self, batch):
+        """Run one model call for the batch and resolve every caller's future"""
+        started = time.perf_counter()
+        records = [record for request in batch for record in request.records]
+        try:
+            predictor = self.get_predictor()
+            probabilities = predictor.predict_records(records)['probabilities']
+        except Exception as e:
+            with self._lock:
+                self._failed += 1
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            # One bad request should not fail its neighbours; retry them one by one
+            logger.warning(f"Batch of {len(batch)} requests failed, scoring individually: {str(e)}")
+            for request in batch:
+                self._score([request])
+            return
+
+        offset = 0
+        for request in batch:
+            end = offset + len(request.records)
+            probs = probabilities[offset:end]
+            threshold = predictor.threshold if request.threshold is None else request.threshold
+            request.future.set_result({
+                'predictions': (probs >= threshold).astype(np.int8),
+                'probabilities': probs,
+            })
+            offset = end
+
+        with self._lock:
+            self._requests += len(batch)
+            self._batches += 1
+            self._records += len(records)
+            self._max_size = max(self._max_size, len(records))
+            self._sizes.append(len(records))
+            for request in batch:
+                wait = started - request.enqueued_at
+                self._waits.append(wait)
+                self._max_wait = max(self._max_wait, wait)
@@ -1,9 +1,11 @@
 """
 Prediction utilities for the TeleChurn prediction system.
 """
+import hashlib
 import pickle
 import logging
 import os
+import numpy as np
 from .preprocessor import DataPreprocessor, DataPreprocessingError
 
 # Configure logging
@@ -14,21 +16,41 @@ class ModelPredictionError(Exception):
     """Custom exception for model prediction errors"""
     pass
 
+PREPROCESSOR_FILENAME = 'preprocessor.json'
+DEFAULT_THRESHOLD = 0.5
+
+def _validate_threshold(threshold):
+    if not 0 < threshold <= 1:
+        raise ModelPredictionError(f"Decision threshold must be in (0, 1], got {threshold}")
+    return threshold
+
 class ChurnPredictor:
-    def __init__(self, model_path):
+    def __init__(self, model_path, preprocessor_path=None, threshold=DEFAULT_THRESHOLD):
         """
         Initialize the predictor with a trained model.
         
         Args:
             model_path (str): Path to the trained model file
+            preprocessor_path (str): Path to the fitted preprocessing artifact.
+                Defaults to preprocessor.json next to the model file.
+            threshold (float): Churn probability at or above which a customer
+                is predicted to churn
             
         Raises:
-            ModelPredictionError: If model loading fails
+            ModelPredictionError: If model or preprocessor loading fails
         """
+        self.threshold = _validate_threshold(threshold)
         self.model_path = model_path
+        self.preprocessor_path = preprocessor_path or os.path.join(
+            os.path.dirname(model_path), PREPROCESSOR_FILENAME
+        )
         self.model = None
         self.preprocessor = DataPreprocessor()
+        # Checksum of the model and preprocessor artifacts; changes on every deploy
+        self._checksum = hashlib.sha256()
         self._load_model()
+        self._load_preprocessor()
+        self.version = self._checksum.hexdigest()[:16]
         
     def _load_model(self):
         """Load the trained model from file"""
@@ -39,7 +61,9 @@ class ChurnPredictor:
                 raise ModelPredictionError(f"Model file not found at {self.model_path}")
                 
             with open(self.model_path, 'rb') as f:
-                self.model = pickle.load(f)
+                model_bytes = f.read()
+            self._checksum.update(model_bytes)
+            self.model = pickle.loads(model_bytes)
                 
             # Validate model interface
             if not hasattr(self.model, 'predict'):
@@ -53,50 +77,113 @@ class ChurnPredictor:
             logger.error(f"Error loading model: {str(e)}")
             raise ModelPredictionError(f"Error loading model: {str(e)}")
     
-    def predict(self, df):
+    def _load_preprocessor(self):
+        """Load the fitted preprocessing artifact if one is available"""
+        if not os.path.exists(self.preprocessor_path):
+            logger.warning(
+                f"No preprocessor artifact at {self.preprocessor_path}; "
+                "encoders and scaler will be fitted on each batch"
+            )
+            return
+
+        try:
+            self.preprocessor = DataPreprocessor.load(self.preprocessor_path)
+            with open(self.preprocessor_path, 'rb') as f:
+                self._checksum.update(f.read())
+        except (DataPreprocessingError, OSError) as e:
+            logger.error(f"Error loading preprocessor: {str(e)}")
+            raise ModelPredictionError(f"Error loading preprocessor: {str(e)}")
+
+    def predict(self, df, threshold=None, return_processed=False, preprocessed=False):
         """
         Make predictions on the input data.
         
+        The model is run once (predict_proba) and classes are derived from
+        the decision threshold.
+        
         Args:
             df (pd.DataFrame): Input dataframe
+            threshold (float): Overrides the predictor's decision threshold
+            return_processed (bool): Also return the preprocessed features
+            preprocessed (bool): df already holds preprocessed features (uploads
+                stored before ingestion kept the raw data), so it is scored as is
             
         Returns:
             dict: Dictionary containing:
-                - predictions: Binary predictions (0/1)
-                - probabilities: Probability scores for each prediction
-                - processed_data: The preprocessed input data
+                - predictions: Binary predictions (np.ndarray of 0/1)
+                - probabilities: Churn probability for each row (np.ndarray)
+                - processed_data: The preprocessed input DataFrame, only if
+                  return_processed is True
                 
         Raises:
             ModelPredictionError: If prediction fails
             DataPreprocessingError: If preprocessing fails
         """
         logger.info("Starting prediction process")
+        threshold = self.threshold if threshold is None else _validate_threshold(threshold)
         
         try:
-            # Preprocess the data
-            processed_data = self.preprocessor.preprocess_data(df)
+            # Preprocess the data. A fitted preprocessor only transforms and
+            # can be shared; without an artifact the encoders and scaler are
+            # refitted per batch, so use a fresh instance to keep a shared
+            # predictor safe across concurrent requests.
+            if preprocessed:
+                processed_data = df[self.preprocessor.required_columns]
+            elif self.preprocessor.is_fitted:
+                processed_data = self.preprocessor.transform(df)
+            else:
+                processed_data = DataPreprocessor().preprocess_data(df)
             
-            # Make predictions
-            predictions = self.model.predict(processed_data)
+            # Make predictions (a single pass through the model)
             probabilities = self.model.predict_proba(processed_data)[:, 1]
+            predictions = (probabilities >= threshold).astype(np.int8)
             
             # Validate prediction output
-            if len(predictions) != len(df):
-                raise ModelPredictionError("Number of predictions does not match input data length")
             if len(probabilities) != len(df):
                 raise ModelPredictionError("Number of probabilities does not match input data length")
                 
             logger.info(f"Successfully generated {len(predictions)} predictions")
             
-            return {
-                'predictions': predictions.tolist(),
-                'probabilities': probabilities.tolist(),
-                'processed_data': processed_data.to_dict(orient='records')
+            result = {
+                'predictions': predictions,
+                'probabilities': probabilities,
             }
+            if return_processed:
+                result['processed_data'] = processed_data
+            return result
             
         except DataPreprocessingError as e:
             logger.error(f"Data preprocessing error: {str(e)}")
             raise
         except Exception as e:
             logger.error(f"Prediction error: {str(e)}")
-            raise ModelPredictionError(f"Prediction error: {str(e)}") 
\ No newline at end of file
+            raise ModelPredictionError(f"Prediction error: {str(e)}")
+
+    def predict_records(self, records, threshold=None):
+        """
+        Score a few customer records with the low-latency preprocessing path.
+        
+        Requires a fitted preprocessor artifact; use predict() for batches.
+        
+        Args:
+            records (list): Customer feature dicts
+            threshold (float): Overrides the predictor's decision threshold
+            
+        Returns:
+            dict: predictions and probabilities as np.ndarray, like predict()
+            
+        Raises:
+            ModelPredictionError: If prediction fails
+            DataPreprocessingError: If preprocessing fails
+        """
+        threshold = self.threshold if threshold is None else _validate_threshold(threshold)
+        processed_data = self.preprocessor.transform_records(records)
+        try:
+            probabilities = self.model.predict_proba(processed_data)[:, 1]
+        except Exception as e:
+            logger.error(f"Prediction error: {str(e)}")
+            raise ModelPredictionError(f"Prediction error: {str(e)}")
+        return {
+            'predictions': (probabilities >= threshold).astype(np.int8),
+            'probabilities': probabilities,
+        }
@@ -1,6 +1,7 @@
 """
 Data preprocessing utilities for the TeleChurn prediction system.
 """
+import json
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, LabelEncoder
@@ -14,10 +15,26 @@ class DataPreprocessingError(Exception):
     """Custom exception for data preprocessing errors"""
     pass
 
+def _to_float(value):
+    """Parse a number the way pd.to_numeric(errors='coerce') would, giving NaN for junk"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
 class DataPreprocessor:
+    BINARY_COLUMNS = ['SeniorCitizen', 'Partner', 'Dependents', 'OnlineSecurity',
+                      'OnlineBackup', 'DeviceProtection', 'TechSupport', 'Contract',
+                      'PaperlessBilling']
+    CATEGORICAL_COLUMNS = ['PaymentMethod']
+    NUMERICAL_COLUMNS = ['tenure', 'MonthlyCharges', 'TotalCharges']
+    ARTIFACT_VERSION = 1
+
     def __init__(self):
         self.scaler = StandardScaler()
         self.label_encoders = {}
+        self.fill_values = {}
+        self.is_fitted = False
         self.required_columns = [
             'SeniorCitizen', 'Partner', 'Dependents', 'tenure',
             'OnlineSecurity', 'OnlineBackup', 'DeviceProtection', 'TechSupport',
@@ -29,6 +46,10 @@ class DataPreprocessor:
         """
         Preprocess the input data for prediction.
         
+        If the preprocessor has been fitted (or loaded from an artifact) this
+        only applies the stored transformation. Otherwise the encoders and
+        scaler are fitted on the batch itself, as before.
+        
         Args:
             df (pd.DataFrame): Input dataframe
             
@@ -38,20 +59,16 @@ class DataPreprocessor:
         Raises:
             DataPreprocessingError: If data validation or preprocessing fails
         """
+        if self.is_fitted:
+            return self.transform(df)
+
         try:
             logger.info("Starting data preprocessing")
             
             # Validate input data
             self._validate_input_data(df)
             
-            # Make a copy to avoid modifying the original
-            df = df.copy()
-            
-            # Drop any columns not in required_columns
-            df = df[self.required_columns]
-            
-            # Convert TotalCharges to numeric, handling any non-numeric values
-            df['TotalCharges'] = pd.to_numeric(df['TotalCharges'], errors='coerce')
+            df = self._select_columns(df)
             
             # Handle missing values
             df = self._handle_missing_values(df)
@@ -69,6 +86,256 @@ class DataPreprocessor:
             logger.error(f"Data preprocessing failed: {str(e)}")
             raise DataPreprocessingError(f"Data preprocessing failed: {str(e)}")
     
+    def fit(self, df):
+        """
+        Fit fill values, category vocabularies and scaler statistics on training data.
+        
+        Args:
+            df (pd.DataFrame): Training dataframe with the raw customer features
+            
+        Returns:
+            DataPreprocessor: self
+            
+        Raises:
+            DataPreprocessingError: If data validation or fitting fails
+        """
+        try:
+            logger.info("Fitting data preprocessor")
+            self.scaler = StandardScaler()
+            self.label_encoders = {}
+            self.is_fitted = False
+            self._validate_input_data(df)
+            df = self._select_columns(df)
+            
+            # Remember the training mode/median so inference never has to
+            # derive fill values from the (possibly single-row) batch
+            self.fill_values = {}
+            for col in df.columns:
+                if not pd.api.types.is_numeric_dtype(df[col]):
+                    self.fill_values[col] = df[col].mode()[0]
+                else:
+                    self.fill_values[col] = float(df[col].median())
+            df = df.fillna(self.fill_values)
+            
+            df = self._convert_categorical(df)
+            df = self._scale_numerical(df)
+            
+            self.is_fitted = True
+            logger.info("Data preprocessor fitted successfully")
+            return self
+            
+        except Exception as e:
+            logger.error(f"Fitting data preprocessor failed: {str(e)}")
+            raise DataPreprocessingError(f"Fitting data preprocessor failed: {str(e)}")
+    
+    def transform(self, df):
+        """
+        Apply the fitted preprocessing without refitting anything.
+        
+        Args:
+            df (pd.DataFrame): Input dataframe
+            
+        Returns:
+            pd.DataFrame: Preprocessed dataframe with columns in training order
+            
+        Raises:
+            DataPreprocessingError: If the preprocessor is not fitted or the data is invalid
+        """
+        if not self.is_fitted:
+            raise DataPreprocessingError("Preprocessor has not been fitted")
+
+        try:
+            self._validate_input_data(df)
+            df = self._select_columns(df)
+            df = df.fillna(self.fill_values)
+            
+            for col in self.BINARY_COLUMNS:
+                df[col] = (df[col] == 'Yes').astype(int)
+            
+            for col, encoder in self.label_encoders.items():
+                if not pd.api.types.is_numeric_dtype(df[col]):
+                    unique_values = set(df[col].unique())
+                    known_values = set(encoder.classes_)
+                    if not unique_values.issubset(known_values):
+                        raise DataPreprocessingError(
+                            f"New categories found in column {col}: {unique_values - known_values}"
+                        )
+                    df[col] = encoder.transform(df[col])
+                else:
+                    # Already category-coded; make sure the codes are in range
+                    codes = df[col].astype(int)
+                    if ((codes < 0) | (codes >= len(encoder.classes_))).any():
+                        raise DataPreprocessingError(f"Unknown category codes in column {col}")
+                    df[col] = codes
+            
+            if np.isinf(df[self.NUMERICAL_COLUMNS].to_numpy(dtype=float)).any():
+                raise DataPreprocessingError("Numerical columns contain infinite values")
+            df[self.NUMERICAL_COLUMNS] = self.scaler.transform(df[self.NUMERICAL_COLUMNS])
+            
+            return df
+            
+        except DataPreprocessingError:
+            raise
+        except Exception as e:
+            logger.error(f"Data preprocessing failed: {str(e)}")
+            raise DataPreprocessingError(f"Data preprocessing failed: {str(e)}")
+    
+    def transform_records(self, records):
+        """
+        Apply the fitted preprocessing to a few records without pandas overhead.
+        
+        Produces the same features as transform() for record dicts, but
+        builds each column directly, which is much faster for the handful
+        of rows sent to the real-time scoring endpoint.
+        
+        Args:
+            records (list): Customer feature dicts
+            
+        Returns:
+            pd.DataFrame: Preprocessed dataframe with columns in training order
+            
+        Raises:
+            DataPreprocessingError: If the preprocessor is not fitted or the data is invalid
+        """
+        if not self.is_fitted:
+            raise DataPreprocessingError("Preprocessor has not been fitted")
+        if not records:
+            raise DataPreprocessingError("No records to transform")
+        missing_cols = set(self.required_columns).difference(*[set(r) for r in records])
+        if missing_cols:
+            raise DataPreprocessingError(f"Missing required columns: {missing_cols}")
+        
+        columns = {}
+        for col in self.required_columns:
+            values = [self._fill(col, record.get(col)) for record in records]
+            if col in self.NUMERICAL_COLUMNS:
+                columns[col] = np.array([self._fill(col, _to_float(v)) for v in values], dtype=float)
+            elif col in self.label_encoders:
+                columns[col] = self._encode(col, values)
+            else:
+                columns[col] = np.array([v == 'Yes' for v in values], dtype=int)
+        
+        numerical = np.column_stack([columns[col] for col in self.NUMERICAL_COLUMNS])
+        if np.isinf(numerical).any():
+            raise DataPreprocessingError("Numerical columns contain infinite values")
+        numerical = (numerical - self.scaler.mean_) / self.scaler.scale_
+        for i, col in enumerate(self.NUMERICAL_COLUMNS):
+            columns[col] = numerical[:, i]
+        return pd.DataFrame(columns, columns=self.required_columns)
+    
+    def _fill(self, col, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return self.fill_values.get(col, value)
+        return value
+    
+    def _encode(self, col, values):
+        """Map category labels (or already-encoded codes) to their codes"""
+        classes = self.label_encoders[col].classes_
+        lookup = {label: code for code, label in enumerate(classes)}
+        codes = []
+        for value in values:
+            if isinstance(value, str):
+                if value not in lookup:
+                    raise DataPreprocessingError(f"New categories found in column {col}: {{'{value}'}}")
+                codes.append(lookup[value])
+            else:
+                code = int(value)
+                if not 0 <= code < len(classes):
+                    raise DataPreprocessingError(f"Unknown category codes in column {col}")
+                codes.append(code)
+        return np.array(codes, dtype=int)
+    
+    def to_dict(self):
+        """Return the fitted state as a JSON-serializable dictionary"""
+        if not self.is_fitted:
+            raise DataPreprocessingError("Preprocessor has not been fitted")
+        return {
+            'version': self.ARTIFACT_VERSION,
+            'columns': list(self.required_columns),
+            'fill_values': {col: (value.item() if hasattr(value, 'item') else value)
+                            for col, value in self.fill_values.items()},
+            'categories': {col: [str(c) for c in encoder.classes_]
+                           for col, encoder in self.label_encoders.items()},
+            'scaler': {
+                'columns': list(self.NUMERICAL_COLUMNS),
+                'mean': self.scaler.mean_.tolist(),
+                'scale': self.scaler.scale_.tolist(),
+                'var': self.scaler.var_.tolist(),
+                'n_samples_seen': int(self.scaler.n_samples_seen_),
+            },
+        }
+    
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuild a fitted preprocessor from to_dict() output.
+        
+        Raises:
+            DataPreprocessingError: If the state is malformed or from an unsupported version
+        """
+        try:
+            if state.get('version') != cls.ARTIFACT_VERSION:
+                raise DataPreprocessingError(
+                    f"Unsupported preprocessor artifact version: {state.get('version')}"
+                )
+            preprocessor = cls()
+            preprocessor.required_columns = list(state['columns'])
+            preprocessor.fill_values = dict(state['fill_values'])
+            
+            for col, classes in state['categories'].items():
+                encoder = LabelEncoder()
+                encoder.classes_ = np.array(classes, dtype=object)
+                preprocessor.label_encoders[col] = encoder
+            
+            scaler_state = state['scaler']
+            scaler = preprocessor.scaler
+            scaler.mean_ = np.array(scaler_state['mean'], dtype=float)
+            scaler.scale_ = np.array(scaler_state['scale'], dtype=float)
+            scaler.var_ = np.array(scaler_state['var'], dtype=float)
+            scaler.n_samples_seen_ = scaler_state['n_samples_seen']
+            scaler.n_features_in_ = len(scaler_state['columns'])
+            scaler.feature_names_in_ = np.array(scaler_state['columns'], dtype=object)
+            
+            preprocessor.is_fitted = True
+            return preprocessor
+        except DataPreprocessingError:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            raise DataPreprocessingError(f"Invalid preprocessor artifact: {str(e)}")
+    
+    def save(self, path):
+        """Write the fitted state to a JSON artifact"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logger.info(f"Saved preprocessor artifact to {path}")
+    
+    @classmethod
+    def load(cls, path):
+        """
+        Load a fitted preprocessor from a JSON artifact.
+        
+        Raises:
+            DataPreprocessingError: If the artifact cannot be read
+        """
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            raise DataPreprocessingError(f"Error reading preprocessor artifact: {str(e)}")
+        logger.info(f"Loaded preprocessor artifact from {path}")
+        return cls.from_dict(state)
+    
+    def _select_columns(self, df):
+        """Keep the required columns in training order and coerce numerical columns"""
+        # Make a copy to avoid modifying the original
+        df = df[self.required_columns].copy()
+        
+        # Convert TotalCharges (and any numbers sent as strings) to numeric,
+        # handling any non-numeric values
+        for col in self.NUMERICAL_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
+    
     def _validate_input_data(self, df):
         """Validate input data structure and content"""
         logger.info("Validating input data")
@@ -85,10 +352,11 @@ class DataPreprocessor:
         if df.empty:
             raise DataPreprocessingError("Input DataFrame is empty")
             
-        # Check for all-null columns
-        null_cols = df.columns[df.isnull().all()].tolist()
-        if null_cols:
-            raise DataPreprocessingError(f"Columns with all null values: {null_cols}")
+        # Check for all-null columns; a fitted preprocessor fills them from training data
+        if not self.is_fitted:
+            null_cols = df.columns[df.isnull().all()].tolist()
+            if null_cols:
+                raise DataPreprocessingError(f"Columns with all null values: {null_cols}")
             
         logger.info("Input data validation passed")
     
@@ -125,18 +393,13 @@ class DataPreprocessor:
         
         try:
             # Binary categorical variables
-            binary_cols = ['SeniorCitizen', 'Partner', 'Dependents', 'OnlineSecurity',
-                          'OnlineBackup', 'DeviceProtection', 'TechSupport', 'Contract',
-                          'PaperlessBilling']
-            for col in binary_cols:
+            for col in self.BINARY_COLUMNS:
                 if col in df.columns:
                     df[col] = (df[col] == 'Yes').astype(int)
                     logger.info(f"Converted {col} to binary")
             
             # Categorical variables with multiple categories
-            categorical_cols = ['PaymentMethod']
-            
-            for col in categorical_cols:
+            for col in self.CATEGORICAL_COLUMNS:
                 if col in df.columns:
                     if col not in self.label_encoders:
                         self.label_encoders[col] = LabelEncoder()
@@ -163,7 +426,7 @@ class DataPreprocessor:
         logger.info("Scaling numerical features")
         
         try:
-            numerical_cols = ['tenure', 'MonthlyCharges', 'TotalCharges']
+            numerical_cols = self.NUMERICAL_COLUMNS
             
             if len(numerical_cols) > 0:
                 # Check for infinite values
@@ -0,0 +1,189 @@
+"""
+Process-wide model registry for the TeleChurn prediction system.
+
+Loading the pickled ensemble is by far the most expensive step of a prediction
+request, so the registry loads and validates it once per process and shares the
+resulting ChurnPredictor across requests.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from .predictor import DEFAULT_THRESHOLD, ChurnPredictor, ModelPredictionError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A single representative customer used to exercise the full predict path
+WARMUP_RECORD = {
+    'SeniorCitizen': 'No',
+    'Partner': 'Yes',
+    'Dependents': 'No',
+    'tenure': 12,
+    'OnlineSecurity': 'No',
+    'OnlineBackup': 'Yes',
+    'DeviceProtection': 'No',
+    'TechSupport': 'No',
+    'Contract': 'Month-to-month',
+    'PaperlessBilling': 'Yes',
+    'PaymentMethod': 'Electronic check',
+    'MonthlyCharges': 70.35,
+    'TotalCharges': '844.2',
+}
+
+
+class ModelRegistry:
+    def __init__(self, model_path=None, threshold=DEFAULT_THRESHOLD):
+        """
+        Initialize an empty registry.
+
+        Args:
+            model_path (str): Path to the trained model file. Can also be set
+                later with configure().
+            threshold (float): Decision threshold passed to the predictor
+        """
+        self.model_path = model_path
+        self.threshold = threshold
+        self._predictor = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.loaded_at = None
+        self.last_error = None
+        self._listeners = []
+
+    def configure(self, model_path, threshold=DEFAULT_THRESHOLD):
+        """Point the registry at a model file, dropping any loaded model if the settings changed"""
+        with self._lock:
+            if model_path != self.model_path or threshold != self.threshold:
+                self.model_path = model_path
+                self.threshold = threshold
+                self._predictor = None
+
+    def add_load_listener(self, callback):
+        """Call callback(predictor) every time a model is loaded or reloaded"""
+        self._listeners.append(callback)
+
+    @property
+    def is_ready(self):
+        return self._predictor is not None
+
+    @property
+    def version(self):
+        """Version of the loaded model, or None if nothing is loaded yet"""
+        predictor = self._predictor
+        return predictor.version if predictor is not None else None
+
+    def get_predictor(self):
+        """
+        Return the shared predictor, loading it on first use.
+
+        Returns:
+            ChurnPredictor: The process-wide predictor
+
+        Raises:
+            ModelPredictionError: If the model cannot be loaded or fails warm-up
+        """
+        predictor = self._predictor
+        if predictor is not None:
+            return predictor
+
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            if self._predictor is None:
+                self._predictor = self._load()
+            return self._predictor
+
+    def reload(self):
+        """
+        Load the model again from disk and swap it in atomically.
+
+        Requests already holding the previous predictor finish with it, and
+        the previous predictor stays in place if the new one fails to load.
+        Prediction workers call this on SIGHUP (see api.jobs.run_worker).
+
+        Returns:
+            ChurnPredictor: The newly loaded predictor
+        """
+        with self._lock:
+            self._predictor = self._load()
+            return self._predictor
+
+    def preload(self):
+        """
+        Load the model eagerly, e.g. from AppConfig.ready().
+
+        Failures are logged rather than raised so the process can still start;
+        the next call to get_predictor() will retry.
+
+        Returns:
+            bool: True if the model is loaded
+        """
+        try:
+            self.get_predictor()
+            return True
+        except ModelPredictionError as e:
+            logger.warning(f"Model preload failed, will retry on first use: {str(e)}")
+            return False
+
+    def status(self):
+        """Return a JSON-serializable description of the registry state"""
+        return {
+            'ready': self.is_ready,
+            'threshold': self.threshold,
+            'model_version': self.version,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'error': self.last_error,
+        }
+
+    def _load(self):
+        """Load, validate and warm up a predictor. Must be called with the lock held."""
+        if not self.model_path:
+            self.last_error = "No model path configured"
+            raise ModelPredictionError(self.last_error)
+
+        try:
+            start = time.perf_counter()
+            predictor = ChurnPredictor(self.model_path, threshold=self.threshold)
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self._warm_up(predictor)
+            warmup_seconds = time.perf_counter() - start
+        except ModelPredictionError as e:
+            self.last_error = str(e)
+            raise
+
+        self.load_seconds = round(load_seconds, 4)
+        self.warmup_seconds = round(warmup_seconds, 4)
+        self.loaded_at = datetime.now(timezone.utc)
+        self.last_error = None
+        logger.info(
+            f"Model registry ready: version={predictor.version} "
+            f"load={self.load_seconds}s warmup={self.warmup_seconds}s"
+        )
+        for callback in self._listeners:
+            try:
+                callback(predictor)
+            except Exception as e:
+                logger.warning(f"Model load listener failed: {str(e)}")
+        return predictor
+
+    def _warm_up(self, predictor):
+        """Run a single-row inference so the first real request does not pay for lazy initialization"""
+        try:
+            results = predictor.predict(pd.DataFrame([WARMUP_RECORD]))
+        except Exception as e:
+            raise ModelPredictionError(f"Model warm-up failed: {str(e)}")
+        if len(results['predictions']) != 1:
+            raise ModelPredictionError("Model warm-up returned an unexpected number of predictions")
+
+
+# Shared by every request handled in this process
+model_registry = ModelRegistry()